@@ -0,0 +1,6 @@
+import sys
+
+from .batch import main
+
+
+sys.exit(main())
@@ -1,26 +1,227 @@
+import threading
 from itertools import combinations
-from typing import List, Optional, Dict
+from typing import Any, Iterable, Iterator, List, Optional, Dict, Sequence
 from collections import namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 
-from scipy.spatial.distance import cosine
+import numpy as np
 
-from .processing import DatabaseManager
+from .data_io import _generate_column_names
+from .cache import ResultCache
+from .decorators import instrument
+from .instrumentation import count, gauge
+from .neighbours import Neighbours
+from .processing import DatabaseManager, EncodedResponses, WordVectors
 
 
 DatResult = namedtuple("DatResult", ["distances", "score"])
 
+# largest number of participants whose word vectors are gathered in one
+# batch, the memory budget can only lower it
+SCORING_BATCH_SIZE = 4096
+
+# bytes available to the work buffers of a scoring call
+DEFAULT_MEMORY_BUDGET = 64 * 2 ** 20
+
+# smallest batch given to a scoring thread, so that each task does enough
+# NumPy work with the GIL released to outweigh the thread overhead
+MIN_THREAD_BATCH_SIZE = 256
+
+
+class DatResults(Mapping):
+    def __init__(self, ids: Sequence, distances: np.ndarray,
+                 scores: np.ndarray, fingerprint: Optional[str] = None):
+        """
+        Initialize DatResults instance - computed DAT results stored in columns.
+
+        Participants without a score have a row of NaN distances and a NaN score.
+        Indexing by participant ID returns a DatResult named tuple, so the
+        container can be used in place of a dictionary of DatResults.
+
+        :param ids: Participant IDs.
+        :type ids: Sequence
+        :param distances: An (N x pairs) float32 array of distances between word pairs.
+        :type distances: numpy.ndarray
+        :param scores: An array of N DAT scores.
+        :type scores: numpy.ndarray
+        :param fingerprint: Fingerprint of the vector database the results were computed with. Defaults to None, unknown.
+        :type fingerprint: str, optional
+
+        :raises ValueError: If the number of IDs, distance rows and scores differ.
+        """
+        self.ids = np.asarray(ids, dtype=object)
+        self.distances = distances
+        self.scores = scores
+        self.fingerprint = fingerprint
+        if not len(self.ids) == len(distances) == len(scores):
+            raise ValueError('ids, distances and scores must have '
+                             'the same length')
+        self._positions = None
+
+    @classmethod
+    def from_dict(cls, results: Dict[str, DatResult],
+                  pairs: int) -> 'DatResults':
+        """
+        Convert a dictionary of DatResult named tuples into columns.
+
+        :param results: A dictionary of DatResult named tuples.
+        :type results: Dict[str, DatResult]
+        :param pairs: Number of word pairs, i.e. distance columns.
+        :type pairs: int
+
+        :return: The results stored in columns.
+        :rtype: DatResults
+        """
+        distances = np.full((len(results), pairs), np.nan, dtype=np.float32)
+        scores = np.full(len(results), np.nan)
+        for row, result in enumerate(results.values()):
+            if result.score is not None:
+                distances[row] = result.distances
+                scores[row] = result.score
+        return cls(list(results), distances, scores)
+
+    @classmethod
+    def concat(cls, parts: Sequence['DatResults']) -> 'DatResults':
+        """
+        Join results computed for consecutive parts of a dataset.
+
+        :param parts: The results to join, at least one.
+        :type parts: Sequence[DatResults]
+
+        :return: The joined results.
+        :rtype: DatResults
+        """
+        fingerprints = {part.fingerprint for part in parts}
+        return cls(np.concatenate([part.ids for part in parts]),
+                   np.concatenate([part.distances for part in parts]),
+                   np.concatenate([part.scores for part in parts]),
+                   # parts computed with different vectors are not stamped
+                   fingerprints.pop() if len(fingerprints) == 1 else None)
+
+    @property
+    def minimum_words(self) -> int:
+        """
+        Get the number of words the distances were computed for.
+
+        :return: The minimum number of words used to compute DAT scores.
+        :rtype: int
+        """
+        pairs = self.distances.shape[1]
+        return int(round((1 + np.sqrt(1 + 8 * pairs)) / 2))
+
+    def __getitem__(self, p_id: Any) -> DatResult:
+        if self._positions is None:
+            self._positions = {key: row for row, key in enumerate(self.ids)}
+        return self._row(self._positions[p_id])
+
+    def __iter__(self) -> Iterator:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _row(self, row: int) -> DatResult:
+        score = self.scores[row]
+        if np.isnan(score):
+            return DatResult(distances=[], score=None)
+        return DatResult(distances=self.distances[row].tolist(),
+                         score=float(score))
+
+    def to_dataframe(self, columns: Optional[List[str]] = None):
+        """
+        Convert the results to a pandas DataFrame without copying the distances.
+
+        :param columns: Column names: the ID column, one per word pair and the score column. Defaults to ID, W1-W2, ..., DAT.
+        :type columns: List[str], optional
+
+        :return: One row per participant.
+        :rtype: pandas.DataFrame
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        columns = columns or _generate_column_names(self.minimum_words)
+        df = pd.DataFrame(self.distances, columns=columns[1:-1], copy=False)
+        df.insert(0, columns[0], self.ids)
+        df[columns[-1]] = self.scores
+        return df
+
+    def to_arrow(self):
+        """
+        Convert the results to a pyarrow Table without copying the distances.
+
+        The distances are stored as a fixed-size list column.
+
+        :raises ImportError: If pyarrow is not installed.
+
+        :return: A table with the ID, distances and DAT columns.
+        :rtype: pyarrow.Table
+        """
+        try:
+            import pyarrow as pa  # pylint: disable=import-outside-toplevel
+        except ImportError as exc:
+            raise ImportError('Converting results to Arrow requires '
+                              'pyarrow.') from exc
+
+        pairs = self.distances.shape[1]
+        flat = pa.array(np.ascontiguousarray(self.distances).reshape(-1))
+        return pa.table({
+            'ID': pa.array(self.ids.tolist()),
+            'distances': pa.FixedSizeListArray.from_arrays(flat, pairs),
+            'DAT': pa.array(self.scores, from_pandas=True)})
+
+
+class DatVariants:
+    def __init__(self, ids: Sequence, columns: Dict[str, np.ndarray]):
+        """
+        Initialize DatVariants instance - several scorings of the same dataset.
+
+        :param ids: Participant IDs.
+        :type ids: Sequence
+        :param columns: Column name mapped to an array with one value per participant.
+        :type columns: Dict[str, numpy.ndarray]
+        """
+        self.ids = np.asarray(ids, dtype=object)
+        self.columns = columns
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_dataframe(self):
+        """
+        Convert the variants to a pandas DataFrame with one row per participant.
+
+        :return: The ID column followed by one column per variant.
+        :rtype: pandas.DataFrame
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        return pd.DataFrame({'ID': self.ids, **self.columns})
+
 
 class DatComputer:
-    def __init__(self, database_manager: DatabaseManager):
+    def __init__(self, database_manager: DatabaseManager, workers: int = 1,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET):
         """
         Initialize DatComputer instance.
 
         :param database_manager: An instance of DatabaseManager for database interaction.
         :type database_manager: DatabaseManager
+        :param workers: Number of threads scoring batches of participants. Defaults to 1.
+        :type workers: int, optional
+        :param memory_budget: Bytes available to the work buffers of batched scoring, shared by the threads. Defaults to 64 MiB.
+        :type memory_budget: int, optional
         """
         self.db = database_manager
 
         self._minimum_words = 7
+        self.workers = workers
+        self.memory_budget = memory_budget
+        # work buffers of batched scoring, kept per calling thread
+        self._local = threading.local()
 
     @property
     def minimum_words(self) -> int:
@@ -48,6 +249,127 @@ class DatComputer:
             raise ValueError('minimum value must be greater than 1')
         self._minimum_words = value
 
+    @property
+    def workers(self) -> int:
+        """
+        Get the number of threads scoring batches of participants.
+
+        :return: The number of threads.
+        :rtype: int
+        """
+        return self._workers
+
+    @workers.setter
+    def workers(self, value: int):
+        """
+        Set the number of threads scoring batches of participants.
+
+        NumPy releases the GIL while it gathers the vectors and multiplies the
+        batches, so threads can score batches on several cores at once.
+
+        :param value: The number of threads (must be an integer of at least 1).
+        :type value: int
+
+        :raises ValueError: If the provided value is not an integer or is less than 1.
+        """
+        if not isinstance(value, int):
+            raise ValueError('workers must be of type int')
+        if value < 1:
+            raise ValueError('workers must be at least 1')
+        self._workers = value
+
+    @property
+    def memory_budget(self) -> int:
+        """
+        Get the number of bytes available to the work buffers of batched scoring.
+
+        :return: The memory budget in bytes.
+        :rtype: int
+        """
+        return self._memory_budget
+
+    @memory_budget.setter
+    def memory_budget(self, value: int):
+        """
+        Set the number of bytes available to the work buffers of batched scoring.
+
+        :param value: The memory budget in bytes (must be a positive integer).
+        :type value: int
+
+        :raises ValueError: If the provided value is not an integer or is not positive.
+        """
+        if not isinstance(value, int):
+            raise ValueError('memory budget must be of type int')
+        if value <= 0:
+            raise ValueError('memory budget must be positive')
+        self._memory_budget = value
+
+    def batch_size(self, words: int, dimension: int, itemsize: int = 8,
+                   square_arrays: int = 1) -> int:
+        """
+        Compute how many participants fit in one batch under the memory budget.
+
+        A batch holds the gathered (words x dimension) vectors, the given
+        number of (words x words) matrices and the pairwise distances of each
+        participant. The budget is split evenly between the threads.
+
+        :param words: Number of words scored per participant.
+        :type words: int
+        :param dimension: Length of the word vectors.
+        :type dimension: int
+        :param itemsize: Size of one vector element in bytes. Defaults to 8 (float64).
+        :type itemsize: int, optional
+        :param square_arrays: Number of (words x words) work arrays. Defaults to 1.
+        :type square_arrays: int, optional
+
+        :return: Number of participants per batch, between 1 and SCORING_BATCH_SIZE.
+        :rtype: int
+        """
+        pairs = words * (words - 1) // 2
+        per_participant = itemsize * (words * dimension
+                                      + square_arrays * words * words
+                                      + pairs + 1)
+        budget = self.memory_budget // self.workers
+        return max(1, min(SCORING_BATCH_SIZE, budget // per_participant))
+
+    def _work_buffers(self, name: str, batch_size: int,
+                      shapes: Dict[str, tuple],
+                      dtype: np.dtype) -> Dict[str, np.ndarray]:
+        """
+        Get work buffers for batches of up to batch_size participants.
+
+        The buffers are kept on the calling thread and reused by later calls
+        with the same shapes and dtype while they still fit in the memory
+        budget, so scoring a dataset in chunks does not allocate them again for
+        every chunk. Only the last set of each name is kept.
+
+        :param name: Name of the buffer set, e.g. of the worker using it.
+        :type name: str
+        :param batch_size: Number of participants the buffers must hold.
+        :type batch_size: int
+        :param shapes: Shape of one participant's slice of each buffer, by buffer name.
+        :type shapes: Dict[str, tuple]
+        :param dtype: The data type of the buffers.
+        :type dtype: np.dtype
+
+        :return: The buffers by name, with the participants along the first axis.
+        :rtype: Dict[str, np.ndarray]
+        """
+        held = self._local.__dict__.setdefault('buffers', {})
+        key = (tuple(shapes.items()), np.dtype(dtype))
+        if name in held:
+            held_key, capacity, buffers = held[name]
+            nbytes = sum(buffer.nbytes for buffer in buffers.values())
+            if held_key == key and (
+                    capacity == batch_size or capacity > batch_size
+                    and nbytes <= self.memory_budget // self.workers):
+                return buffers
+
+        buffers = {buffer: np.empty((batch_size,) + shape, dtype=dtype)
+                   for buffer, shape in shapes.items()}
+        held[name] = (key, batch_size, buffers)
+        return buffers
+
     def distance(self, word1: str, word2: str) -> float:
         """
         Calculate the cosine distance between two words using their word vectors.
@@ -60,6 +382,8 @@ class DatComputer:
         :return: The cosine distance between the two words (a value between 0 and 2).
         :rtype: float
         """
+        from scipy.spatial.distance import cosine  # pylint: disable=import-outside-toplevel
+
         return cosine(self.db.get_word_vector(word1),
                       self.db.get_word_vector(word2))
 
@@ -97,21 +421,328 @@ class DatComputer:
             return (sum(distances) / len(distances)) * 100
         return None
 
-    def dataset_compute_dat_score(self, data: Dict) -> Dict[str, DatResult]:
+    @instrument('dataset_compute_dat_score')
+    def dataset_compute_dat_score(self, data: Dict,
+                                  cache: Optional[ResultCache] = None,
+                                  vectors: Optional[WordVectors] = None
+                                  ) -> DatResults:
         """
         Compute DAT scores for a dataset of participants' answers.
 
+        Distances are computed in batches: the vectors of the first 'n' words of
+        each participant are gathered into one array and all pairwise distances
+        of a batch are computed together. The vectors of all words used in the
+        dataset are read in one bulk read into a compact matrix, unless a
+        vocabulary subset is given. With a result cache, only responses missing
+        from the cache are scored and the new results are added to it.
+
+        :param data: A dictionary of participants' answers, where each answer is a list of words.
+        :type data: Dict[str, List[str]]
+        :param cache: A persistent cache of computed results. Defaults to None.
+        :type cache: ResultCache, optional
+        :param vectors: Vectors of the words used in the dataset, e.g. from vocabulary_vectors. Defaults to None (read from the database).
+        :type vectors: WordVectors, optional
+
+        :return: The results of all participants, indexable by participant ID like a dictionary of DatResult named tuples, each containing computed distances and DAT score.
+        :rtype: DatResults
+        """
+        size = self.minimum_words
+        answers = list(data.values())
+        distances = np.full((len(answers), size * (size - 1) // 2), np.nan,
+                            dtype=np.float32)
+        scores = np.full(len(answers), np.nan)
+
+        rows = [row for row, answer in enumerate(answers)
+                if len(answer) >= size]
+
+        if cache is not None:
+            keys = {row: cache.key(answers[row], size) for row in rows}
+            cached = cache.get_many(keys.values())
+            count('result_cache.hits', len(cached))
+            count('result_cache.misses', len(rows) - len(cached))
+
+            missing = []
+            for row in rows:
+                if keys[row] in cached:
+                    distances[row], scores[row] = cached[keys[row]]
+                else:
+                    missing.append(row)
+            rows = missing
+
+        self._score_rows(answers, rows, distances, scores, vectors)
+
+        if cache is not None and rows:
+            cache.put_many((keys[row], distances[row], scores[row])
+                           for row in rows)
+
+        return DatResults(list(data), distances, scores,
+                          self.db.fingerprint())
+
+    def _score_rows(self, answers: List[List[str]], rows: List[int],
+                    distances: np.ndarray, scores: np.ndarray,
+                    vectors: Optional[WordVectors] = None):
+        """Compute the distances and scores of the given rows in place."""
+        if not rows:
+            return
+
+        size = self.minimum_words
+        if vectors is None:
+            vectors = self.vocabulary_vectors(
+                word for row in rows for word in answers[row][:size])
+        word_ids = vectors.ids(
+            [word for row in rows for word in answers[row][:size]]
+        ).reshape(len(rows), size)
+
+        self._score_batches(vectors.normalized().matrix, word_ids,
+                            np.array(rows), distances, scores)
+
+    @instrument('dataset_compute_dat_score_encoded')
+    def dataset_compute_dat_score_encoded(
+            self, encoded: EncodedResponses) -> DatResults:
+        """
+        Compute DAT scores for responses encoded with DataProcessor.encode_dataset.
+
+        The IDs of the first 'n' words of each participant are gathered with
+        fancy indexing, without decoding the responses into strings.
+
+        :param encoded: The encoded valid words of the participants.
+        :type encoded: EncodedResponses
+
+        :raises ValueError: If a scored word has no vector in the database.
+
+        :return: The results of all participants, indexable by participant ID.
+        :rtype: DatResults
+        """
+        size = self.minimum_words
+        distances = np.full((len(encoded), size * (size - 1) // 2), np.nan,
+                            dtype=np.float32)
+        scores = np.full(len(encoded), np.nan)
+
+        rows = np.flatnonzero(encoded.counts >= size)
+        if len(rows):
+            positions = encoded.offsets[rows, None] + np.arange(size)
+            used, word_ids = np.unique(encoded.word_ids[positions],
+                                       return_inverse=True)
+            vectors = self.vocabulary_vectors(
+                encoded.vocabulary[word_id] for word_id in used)
+            if len(vectors) != len(used):
+                raise ValueError('Some encoded words have no vector in '
+                                 'the database.')
+            # the subset keeps the order of `used`, so the inverse
+            # indices of np.unique are row numbers in the subset
+            self._score_batches(vectors.normalized().matrix,
+                                word_ids.reshape(len(rows), size),
+                                rows, distances, scores)
+
+        return DatResults(encoded.ids, distances, scores,
+                          self.db.fingerprint())
+
+    def _score_batches(self, unit_vectors: np.ndarray, word_ids: np.ndarray,
+                       rows: np.ndarray, distances: np.ndarray,
+                       scores: np.ndarray):
+        """Score the responses given as rows of word IDs into unit_vectors."""
+        size = word_ids.shape[1]
+        dimension = unit_vectors.shape[1]
+        first_word, second_word = np.triu_indices(size, 1)
+        # positions of the word pairs in a flattened (size x size) matrix
+        pair_positions = first_word * size + second_word
+
+        batch_size = self.batch_size(size, dimension,
+                                     unit_vectors.dtype.itemsize)
+        if self.workers > 1:
+            # split smaller inputs so that every thread gets a batch
+            batch_size = min(batch_size, max(
+                MIN_THREAD_BATCH_SIZE, -(-len(rows) // self.workers)))
+        batch_size = max(1, min(batch_size, len(rows)))
+        starts = range(0, len(rows), batch_size)
+        workers = min(self.workers, len(starts))
+
+        # the buffers are taken on the calling thread, one set per worker,
+        # and kept for the next call
+        shapes = {'gathered': (size, dimension), 'similarity': (size, size),
+                  'distances': (len(pair_positions),), 'scores': ()}
+        worker_buffers = [
+            self._work_buffers(f'score_{i}', batch_size, shapes,
+                               unit_vectors.dtype)
+            for i in range(max(1, workers))]
+
+        def score_batches(batch_starts, buffers):
+            gathered = buffers['gathered']
+            similarity = buffers['similarity']
+            batch_distances = buffers['distances']
+            batch_scores = buffers['scores']
+
+            for start in batch_starts:
+                batch = slice(start, start + batch_size)
+                n = len(rows[batch])
+                np.take(unit_vectors, word_ids[batch], axis=0,
+                        out=gathered[:n], mode='clip')
+                np.matmul(gathered[:n], gathered[:n].transpose(0, 2, 1),
+                          out=similarity[:n])
+                np.take(similarity[:n].reshape(n, size * size),
+                        pair_positions, axis=1, out=batch_distances[:n],
+                        mode='clip')
+                np.subtract(1, batch_distances[:n], out=batch_distances[:n])
+                np.mean(batch_distances[:n], axis=1, out=batch_scores[:n])
+                distances[rows[batch]] = batch_distances[:n]
+                scores[rows[batch]] = batch_scores[:n] * 100
+
+            return sum(buffer.nbytes for buffer in buffers.values())
+
+        gauge('scoring.batch_size', batch_size)
+        count('scoring.batches', len(starts))
+        if workers <= 1:
+            buffer_bytes = (score_batches(starts, worker_buffers[0])
+                            if len(starts) else 0)
+        else:
+            # each thread takes every n-th batch and keeps its own buffers,
+            # every batch writes its own rows of the output arrays
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                buffer_bytes = sum(pool.map(
+                    score_batches,
+                    [starts[i::workers] for i in range(workers)],
+                    worker_buffers))
+        gauge('scoring.buffer_bytes.peak', buffer_bytes)
+
+    @instrument('dataset_compute_dat_variants')
+    def dataset_compute_dat_variants(self, data: Dict,
+                                     cutoffs: Optional[Sequence[int]] = None
+                                     ) -> DatVariants:
+        """
+        Compute several variants of the DAT score in a single pass.
+
+        One distance matrix over all valid words is computed per participant.
+        From it the following columns are derived:
+            - 'DAT_<n>' for each cutoff: the score of the first 'n' words,
+              equal to the regular score with minimum_words set to 'n',
+            - 'DAT_all': the score of all valid words,
+            - 'words': the number of valid words,
+            - 'distance_min', 'distance_median', 'distance_std': summary
+              statistics of the distances between all pairs of valid words.
+
+        Values that cannot be computed (too few words) are NaN.
+
         :param data: A dictionary of participants' answers, where each answer is a list of words.
         :type data: Dict[str, List[str]]
+        :param cutoffs: Numbers of first words to score. Defaults to the minimum value set.
+        :type cutoffs: Sequence[int], optional
+
+        :raises ValueError: If a cutoff is smaller than 2.
 
-        :return: A dictionary containing participant IDs as keys and DatResult named tuples as values, each containing computed distances and DAT score.
-        :rtype: Dict[str, DatResult]
+        :return: The variants of all participants, in columns.
+        :rtype: DatVariants
         """
-        scored_dataset = {}
+        cutoffs = sorted(set(cutoffs or [self.minimum_words]))
+        if cutoffs[0] < 2:
+            raise ValueError('cutoffs must be greater than 1')
 
-        for i, answer in data.items():
-            distances = self.dat(answer)
-            score = self.compute_dat_score(distances)
-            scored_dataset[i] = DatResult(distances=distances, score=score)
+        answers = [list(answer) for answer in data.values()]
+        counts = np.array([len(answer) for answer in answers], dtype=np.intp)
+        names = ([f'DAT_{n}' for n in cutoffs]
+                 + ['DAT_all', 'distance_min', 'distance_median',
+                    'distance_std'])
+        columns = {name: np.full(len(answers), np.nan) for name in names}
 
-        return scored_dataset
+        vectors = self.vocabulary_vectors(
+            word for answer in answers for word in answer)
+        unit_vectors = vectors.normalized().matrix
+
+        # participants are grouped by the number of valid words,
+        # so each group forms a dense (participants x words x dim) array
+        dimension = unit_vectors.shape[1]
+        for size in np.unique(counts[counts >= 2]):
+            rows = np.flatnonzero(counts == size)
+            first_word, second_word = np.triu_indices(size, 1)
+            pair_positions = first_word * size + second_word
+            upper = np.zeros((size, size), dtype=unit_vectors.dtype)
+            upper[first_word, second_word] = 1
+
+            # the distances, the masked copy and its two prefix sums
+            # are (size x size) arrays
+            batch_size = self.batch_size(size, dimension,
+                                         unit_vectors.dtype.itemsize,
+                                         square_arrays=4)
+            batch_size = min(batch_size, len(rows))
+            buffers = self._work_buffers(
+                'variants', batch_size,
+                {'gathered': (size, dimension), 'distance': (size, size),
+                 'masked': (size, size), 'row_sums': (size, size),
+                 'prefix_sums': (size, size),
+                 'pairs': (len(pair_positions),)},
+                unit_vectors.dtype)
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                n = len(batch)
+                word_ids = vectors.ids(
+                    [word for row in batch for word in answers[row]]
+                ).reshape(n, size)
+                gathered = buffers['gathered'][:n]
+                distance = buffers['distance'][:n]
+                np.take(unit_vectors, word_ids, axis=0, out=gathered,
+                        mode='clip')
+                np.matmul(gathered, gathered.transpose(0, 2, 1), out=distance)
+                np.subtract(1, distance, out=distance)
+
+                # sums of distances among the first n words, for every n
+                masked = np.multiply(distance, upper,
+                                     out=buffers['masked'][:n])
+                row_sums = np.cumsum(masked, axis=1,
+                                     out=buffers['row_sums'][:n])
+                prefix_sums = np.cumsum(row_sums, axis=2,
+                                        out=buffers['prefix_sums'][:n])
+                for words in cutoffs:
+                    if words <= size:
+                        columns[f'DAT_{words}'][batch] = (
+                            prefix_sums[:, words - 1, words - 1]
+                            / (words * (words - 1) / 2) * 100)
+                columns['DAT_all'][batch] = (
+                    prefix_sums[:, -1, -1] / len(first_word) * 100)
+
+                pairs = np.take(distance.reshape(n, size * size),
+                                pair_positions, axis=1,
+                                out=buffers['pairs'][:n], mode='clip')
+                columns['distance_min'][batch] = pairs.min(axis=1)
+                columns['distance_median'][batch] = np.median(pairs, axis=1)
+                columns['distance_std'][batch] = pairs.std(axis=1)
+
+        columns['words'] = counts
+        return DatVariants(list(data), columns)
+
+    def vocabulary_vectors(self, words: Iterable[str]) -> WordVectors:
+        """
+        Read the vectors of the distinct given words into a compact store.
+
+        Responses are then scored by integer indexing into its small dense
+        matrix. The store is a pair of a word list and a NumPy array, so it is
+        cheap to pass to worker processes.
+
+        :param words: The words used in a dataset, e.g. from DataProcessor.collect_vocabulary.
+        :type words: Iterable[str]
+
+        :return: The vectors of the words, with integer word IDs given by their order.
+        :rtype: WordVectors
+        """
+        return self.db.get_word_vectors(list(dict.fromkeys(words)))
+
+    @instrument('nearest_neighbours')
+    def nearest_neighbours(self, words: List[str],
+                           k: int = 5) -> Dict[str, Neighbours]:
+        """
+        List the closest words in the vector store for each word of a response.
+
+        Uses the nearest-neighbour index of the database, loading it on first use.
+
+        :param words: The words of a response.
+        :type words: List[str]
+        :param k: Number of neighbours listed for each word. Defaults to 5.
+        :type k: int, optional
+
+        :raises FileNotFoundError: If the database has no neighbour index.
+
+        :return: A dictionary mapping each word to pairs of (neighbour, cosine distance), closest first. Words missing from the index map to an empty list.
+        :rtype: Dict[str, List[Tuple[str, float]]]
+        """
+        index = self.db.neighbour_index
+        if index is None:
+            index = self.db.load_neighbour_index()
+        return {word: index.query_word(word, k=k) for word in words}
@@ -0,0 +1,322 @@
+"""Command-line batch runner scoring many data files in parallel.
+
+    python -m datpl data/*.xlsx extra/responses.csv --workers 4
+
+The vector store is loaded once in the parent process. On Linux the workers
+are started with fork and inherit it instead of loading their own copy;
+elsewhere each worker loads it once when the pool starts. macOS keeps its
+default spawn start method, since fork is unsafe there.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import pathlib
+import sys
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+from .config import read_config
+from .data_io import read_data, save_results
+from .instrumentation import profile_run
+from .pipeline import DatPipeline
+
+
+FileReport = namedtuple(
+    "FileReport",
+    ["input_path", "output_path", "participants", "seconds", "error"],
+    defaults=[None])
+
+# pipeline shared by the tasks run in the current process
+_PIPELINE: Optional[DatPipeline] = None
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """
+    Expand file names and glob patterns into a list of unique files.
+
+    An existing file is taken as is, even if its name contains glob
+    characters, e.g. 'wave[1].csv'.
+
+    :param patterns: File names or glob patterns.
+    :type patterns: List[str]
+
+    :raises FileNotFoundError: If a pattern does not match any file.
+
+    :return: The matched files, in the order the patterns were given.
+    :rtype: List[str]
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isfile(pattern):
+            files.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f'No files match: {pattern}')
+        files.extend(match for match in matches if os.path.isfile(match))
+    return list(dict.fromkeys(files))
+
+
+def output_path_for(input_path: str, output_dir: str) -> str:
+    """
+    Build the path of the results file for a given input file.
+
+    :param input_path: Path to the data file.
+    :type input_path: str
+    :param output_dir: Directory for the results files.
+    :type output_dir: str
+
+    :return: Path to the results CSV file.
+    :rtype: str
+    """
+    return os.path.join(output_dir,
+                        f'{pathlib.Path(input_path).stem}_dat_distances.csv')
+
+
+def output_paths_for(input_files: List[str], output_dir: str) -> List[str]:
+    """
+    Build unique paths of the results files for many input files.
+
+    Inputs with the same file name stem, e.g. 'a/x.csv' and 'b/x.xlsx', would
+    share a results file. The first of them keeps the name from
+    output_path_for, the others get a numbered suffix.
+
+    :param input_files: Paths to the data files.
+    :type input_files: List[str]
+    :param output_dir: Directory for the results files.
+    :type output_dir: str
+
+    :return: Paths to the results CSV files, in the order of the inputs.
+    :rtype: List[str]
+    """
+    paths = []
+    taken = set()
+    for input_path in input_files:
+        path = output_path_for(input_path, output_dir)
+        stem = pathlib.Path(input_path).stem
+        suffix = 1
+        while os.path.normcase(path) in taken:
+            suffix += 1
+            path = os.path.join(output_dir,
+                                f'{stem}_{suffix}_dat_distances.csv')
+        taken.add(os.path.normcase(path))
+        paths.append(path)
+    return paths
+
+
+def _init_worker(database_path: str, minimum_words: int,
+                 use_cache: bool = False, threads: int = 1):
+    global _PIPELINE  # pylint: disable=global-statement
+    if (_PIPELINE is None or _PIPELINE.db.db_path != database_path
+            or (_PIPELINE.cache is not None) != use_cache):
+        _PIPELINE = DatPipeline(database_path, minimum_words=minimum_words,
+                                use_cache=use_cache, threads=threads)
+    else:
+        _PIPELINE.computer.minimum_words = minimum_words
+        _PIPELINE.computer.workers = threads
+
+
+def _score_file(input_path: str, output_path: str,
+                csv_separator: str, id_column,
+                xlsx_cache: bool = False) -> FileReport:
+    start = time.perf_counter()
+    dataset = read_data(input_path, csv_separator=csv_separator,
+                        id_column=id_column, use_cache=xlsx_cache)
+    results = _PIPELINE.score(dataset)
+    save_results(results, minimum_words=_PIPELINE.minimum_words,
+                 output_path=output_path,
+                 fingerprint=_PIPELINE.db.fingerprint())
+    return FileReport(input_path, output_path, len(dataset),
+                      time.perf_counter() - start)
+
+
+def _failed(task, exc: Exception) -> FileReport:
+    input_path, output_path = task[:2]
+    return FileReport(input_path, output_path, 0, 0.0,
+                      f'{type(exc).__name__}: {exc}')
+
+
+def _print_progress(done: int, total: int, report: FileReport):
+    if report.error is not None:
+        print(f'[{done}/{total}] {report.input_path}: failed: {report.error}',
+              flush=True)
+        return
+    rate = report.participants / report.seconds if report.seconds else 0.0
+    print(f'[{done}/{total}] {report.input_path}: '
+          f'{report.participants} participants in {report.seconds:.2f} s '
+          f'({rate:.0f} participants/s) -> {report.output_path}', flush=True)
+
+
+def run_batch(input_files: List[str], database_path: str,
+              output_dir: str = 'results', workers: int = 1,
+              minimum_words: int = 7, csv_separator: str = ';',
+              id_column=0, progress: bool = True,
+              use_cache: bool = False,
+              threads: int = 1,
+              xlsx_cache: bool = False) -> List[FileReport]:
+    """
+    Score many data files, writing one results file per input.
+
+    A file that cannot be read or scored does not stop the batch, it is
+    reported with its error instead.
+
+    :param input_files: Data files to score.
+    :type input_files: List[str]
+    :param database_path: Path to the vectors.db database file.
+    :type database_path: str
+    :param output_dir: Directory for the results files. Defaults to 'results'.
+    :type output_dir: str, optional
+    :param workers: Number of worker processes, 1 scores in the current process. Defaults to 1.
+    :type workers: int, optional
+    :param minimum_words: The minimum number of words used to compute DAT scores. Defaults to 7.
+    :type minimum_words: int, optional
+    :param csv_separator: Separator for CSV files. Defaults to ';'.
+    :type csv_separator: str, optional
+    :param id_column: The name or index of the column containing unique IDs. Defaults to 0.
+    :type id_column: str or int, optional
+    :param progress: Whether to print a line after each finished file. Defaults to True.
+    :type progress: bool, optional
+    :param use_cache: Whether to reuse results stored in the result cache. Defaults to False.
+    :type use_cache: bool, optional
+    :param threads: Number of scoring threads in each worker process. Defaults to 1.
+    :type threads: int, optional
+    :param xlsx_cache: Whether to keep a parsed copy of XLSX inputs in the workbook cache. Defaults to False.
+    :type xlsx_cache: bool, optional
+
+    :return: One report per input file, in order of completion. Reports of failed files have the error set.
+    :rtype: List[FileReport]
+    """
+    _init_worker(database_path, minimum_words, use_cache, threads)
+
+    tasks = [(path, output_path, csv_separator, id_column, xlsx_cache)
+             for path, output_path in zip(
+                 input_files, output_paths_for(input_files, output_dir))]
+    reports = []
+
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            try:
+                reports.append(_score_file(*task))
+            except Exception as exc:  # pylint: disable=broad-except
+                reports.append(_failed(task, exc))
+            if progress:
+                _print_progress(len(reports), len(tasks), reports[-1])
+        return reports
+
+    context = multiprocessing.get_context(
+        'fork' if sys.platform.startswith('linux') else None)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                             mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(database_path, minimum_words,
+                                       use_cache, threads)) as pool:
+        futures = {pool.submit(_score_file, *task): task for task in tasks}
+        for future in as_completed(futures):
+            try:
+                reports.append(future.result())
+            except Exception as exc:  # pylint: disable=broad-except
+                reports.append(_failed(futures[future], exc))
+            if progress:
+                _print_progress(len(reports), len(tasks), reports[-1])
+
+    return reports
+
+
+def _parse_args(argv=None):
+    config = read_config()
+
+    parser = argparse.ArgumentParser(
+        prog='python -m datpl',
+        description='Compute DAT scores for many data files.')
+    parser.add_argument('inputs', nargs='*',
+                        help='Data files or glob patterns. Defaults to '
+                             'data_file_path from config.ini.')
+    parser.add_argument('--database-path', type=str,
+                        default=config.get('Database', 'database_path',
+                                           fallback=None))
+    parser.add_argument('--output-dir', type=str,
+                        default=config.get('Batch', 'output_dir',
+                                           fallback='results'))
+    parser.add_argument('--workers', type=int,
+                        default=config.getint('Batch', 'workers',
+                                              fallback=os.cpu_count() or 1))
+    parser.add_argument('--threads', type=int,
+                        default=config.getint('Batch', 'threads', fallback=1),
+                        help='Scoring threads in each worker process. Useful '
+                             'for a few large files.')
+    parser.add_argument('--minimum-words', type=int, default=7)
+    parser.add_argument('--csv-separator', type=str, default=';')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse results of responses scored in earlier '
+                             'runs, kept next to the vector database.')
+    parser.add_argument('--xlsx-cache', action=argparse.BooleanOptionalAction,
+                        default=config.getboolean('Data', 'xlsx_cache',
+                                                  fallback=False),
+                        help='Keep a parsed copy of XLSX inputs in the '
+                             'workbook cache, so unchanged files are read '
+                             'faster next time.')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Do not report progress.')
+    parser.add_argument('--profile-json', type=str,
+                        help='Write a JSON report with per-stage timings, '
+                             'call counts and cache hit rates.')
+    parser.add_argument('--profile-pstats', type=str,
+                        help='Write a cProfile dump readable with pstats.')
+
+    args = parser.parse_args(argv)
+    if not args.inputs:
+        data_file = config.get('Data', 'data_file_path', fallback=None)
+        args.inputs = [data_file] if data_file else []
+    return parser, args
+
+
+def main(argv=None) -> int:
+    parser, args = _parse_args(argv)
+
+    if not args.inputs:
+        parser.error('no input files given')
+    if not args.database_path:
+        parser.error('no database path given')
+
+    try:
+        input_files = expand_inputs(args.inputs)
+    except FileNotFoundError as exc:
+        parser.error(str(exc))
+
+    profiling = args.profile_json or args.profile_pstats
+    if profiling and args.workers > 1:
+        # stages are recorded in the process that runs them
+        print('Profiling runs in a single process.', file=sys.stderr)
+        args.workers = 1
+
+    start = time.perf_counter()
+    with (profile_run(args.profile_json, args.profile_pstats)
+          if profiling else nullcontext()):
+        reports = run_batch(input_files, args.database_path,
+                            output_dir=args.output_dir,
+                            workers=args.workers,
+                            minimum_words=args.minimum_words,
+                            csv_separator=args.csv_separator,
+                            progress=not args.quiet,
+                            use_cache=args.cache,
+                            threads=args.threads,
+                            xlsx_cache=args.xlsx_cache)
+    elapsed = time.perf_counter() - start
+
+    scored = [report for report in reports if report.error is None]
+    participants = sum(report.participants for report in scored)
+    print(f'Scored {participants} participants from {len(scored)} files '
+          f'in {elapsed:.2f} s ({participants / elapsed:.0f} participants/s).')
+    if len(scored) < len(reports):
+        print(f'{len(reports) - len(scored)} files failed.', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
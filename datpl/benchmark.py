@@ -0,0 +1,457 @@
+"""Reproducible performance benchmarks on synthetic data.
+
+    python -m datpl.benchmark --participants 1000 100000 1000000 \\
+        --words 7 10 20 --output bench.json
+    python -m datpl.benchmark --participants 1000 --compare bench.json
+
+A synthetic vector database and synthetic datasets are generated from a fixed
+seed in a temporary directory, so runs on different versions or machines time
+exactly the same work. Results are written as JSON, one record per benchmark,
+with the wall time, throughput and peak traced memory.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+
+from .analysis import DatComputer
+from .data_io import read_data, save_results
+from .processing import DatabaseManager, DataProcessor
+
+
+DEFAULT_PARTICIPANTS = [1000, 100000, 1000000]
+DEFAULT_WORDS = [7, 10, 20]
+VECTOR_LOOKUPS = 10000
+
+# the synthetic vocabulary uses ASCII letters only,
+# so words made of Polish letters are never valid
+INVALID_LETTERS = 'ąćęłńóśźż'
+
+
+def synthetic_words(count: int) -> List[str]:
+    """
+    Generate distinct lowercase words that pass DataProcessor.clean.
+
+    :param count: Number of words to generate.
+    :type count: int
+
+    :return: The generated words.
+    :rtype: List[str]
+    """
+    words = []
+    for length in itertools.count(3):
+        for letters in itertools.product(string.ascii_lowercase,
+                                         repeat=length):
+            if len(words) == count:
+                return words
+            words.append(''.join(letters))
+    return words
+
+
+def make_synthetic_database(database_path: str, vocabulary_size: int,
+                            dimension: int = 100, seed: int = 0) -> List[str]:
+    """
+    Create a vector database with random vectors and the schema of vectors.db.
+
+    :param database_path: Target path to the database file.
+    :type database_path: str
+    :param vocabulary_size: Number of words in the database.
+    :type vocabulary_size: int
+    :param dimension: Length of the word vectors. Defaults to 100.
+    :type dimension: int, optional
+    :param seed: Seed of the random generator. Defaults to 0.
+    :type seed: int, optional
+
+    :return: The words stored in the database.
+    :rtype: List[str]
+    """
+    rng = np.random.default_rng(seed)
+    words = synthetic_words(vocabulary_size)
+    vectors = rng.standard_normal((vocabulary_size, dimension))
+
+    conn = sqlite3.connect(database_path)
+    conn.execute('CREATE TABLE '
+                 'vectors (word VARCHAR(40) PRIMARY KEY, vector BLOB)')
+    conn.executemany('INSERT INTO vectors (word, vector) VALUES (?, ?)',
+                     zip(words, (vector.tobytes() for vector in vectors)))
+    conn.commit()
+    conn.close()
+    return words
+
+
+def make_synthetic_dataset(words: List[str], participants: int,
+                           words_per_response: int,
+                           invalid_rate: float = 0.1,
+                           seed: int = 0) -> Dict[str, List[str]]:
+    """
+    Create a dataset of responses drawn from the vocabulary.
+
+    A share of the words is replaced with words outside the vocabulary, and
+    words are randomly capitalized, so validation does real work.
+
+    :param words: The vocabulary to draw valid words from.
+    :type words: List[str]
+    :param participants: Number of participants.
+    :type participants: int
+    :param words_per_response: Number of words given by each participant.
+    :type words_per_response: int
+    :param invalid_rate: Share of words outside the vocabulary. Defaults to 0.1.
+    :type invalid_rate: float, optional
+    :param seed: Seed of the random generator. Defaults to 0.
+    :type seed: int, optional
+
+    :return: A dictionary of participants' word sequences.
+    :rtype: Dict[str, List[str]]
+    """
+    rng = np.random.default_rng(seed)
+    shape = (participants, words_per_response)
+    vocabulary = np.array(words, dtype=object)
+
+    responses = vocabulary[rng.integers(0, len(words), size=shape)]
+    invalid = rng.random(shape) < invalid_rate
+    invalid_letters = np.array(list(INVALID_LETTERS), dtype=object)
+    responses[invalid] = (
+        invalid_letters[rng.integers(0, len(INVALID_LETTERS),
+                                     size=invalid.sum())] * 3)
+    capitalized = rng.random(shape) < 0.2
+    responses[capitalized] = [word.capitalize()
+                              for word in responses[capitalized]]
+
+    width = len(str(participants))
+    return {f'P{i:0{width}d}': list(response)
+            for i, response in enumerate(responses)}
+
+
+def _write_dataset_csv(dataset: Dict[str, List[str]], path: str):
+    with open(path, 'w', encoding='utf-8') as csv_file:
+        width = len(next(iter(dataset.values()), []))
+        csv_file.write(';'.join(['ID'] + [f'W{n}' for n in
+                                          range(1, width + 1)]) + '\n')
+        for p_id, response in dataset.items():
+            csv_file.write(';'.join([p_id] + response) + '\n')
+
+
+def _write_dataset_xlsx(dataset: Dict[str, List[str]], path: str):
+    """Write a minimal workbook with inline strings, much faster than pandas."""
+    width = len(next(iter(dataset.values()), []))
+    main_ns = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    rel_ns = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+              'relationships')
+
+    def row(values):
+        return '<row>' + ''.join(
+            f'<c t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+            for value in values) + '</row>'
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('xl/workbook.xml', (
+            f'<workbook xmlns="{main_ns}" xmlns:r="{rel_ns}"><sheets>'
+            f'<sheet name="data" sheetId="1" r:id="rId1"/></sheets>'
+            f'</workbook>'))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/'
+            f'package/2006/relationships"><Relationship Id="rId1" '
+            f'Type="{rel_ns}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'</Relationships>'))
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(f'<worksheet xmlns="{main_ns}"><sheetData>'.encode())
+            sheet.write(row(['ID'] + [f'W{n}' for n in
+                                      range(1, width + 1)]).encode())
+            for p_id, response in dataset.items():
+                sheet.write(row([p_id] + response).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+
+
+def _measure(function: Callable, repeat: int, memory: bool) -> Dict:
+    """Return the best wall time of `repeat` runs and the peak traced memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def _record(name: str, participants: int, words: int, items: int,
+            unit: str, measurement: Dict) -> Dict:
+    seconds = measurement['seconds']
+    return {'benchmark': name,
+            'participants': participants,
+            'words': words,
+            'seconds': seconds,
+            'throughput': items / seconds if seconds else None,
+            'unit': unit,
+            'peak_bytes': measurement['peak_bytes']}
+
+
+def run_benchmarks(participants: List[int], words: List[int],
+                   vocabulary_size: int = 20000, dimension: int = 100,
+                   minimum_words: int = 7, repeat: int = 1,
+                   memory: bool = True, seed: int = 0,
+                   threads: Optional[int] = None,
+                   progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Run every benchmark for each combination of dataset size and response length.
+
+    :param participants: Dataset sizes to benchmark.
+    :type participants: List[int]
+    :param words: Numbers of words per response to benchmark.
+    :type words: List[int]
+    :param vocabulary_size: Number of words in the synthetic database. Defaults to 20000.
+    :type vocabulary_size: int, optional
+    :param dimension: Length of the synthetic word vectors. Defaults to 100.
+    :type dimension: int, optional
+    :param minimum_words: The minimum number of words used to compute DAT scores. Defaults to 7.
+    :type minimum_words: int, optional
+    :param repeat: Number of timed runs, the best one is reported. Defaults to 1.
+    :type repeat: int, optional
+    :param memory: Whether to measure peak memory in an extra traced run. Defaults to True.
+    :type memory: bool, optional
+    :param seed: Seed of the random generator. Defaults to 0.
+    :type seed: int, optional
+    :param threads: Number of threads of the threaded scoring benchmark. Defaults to the number of CPUs.
+    :type threads: int, optional
+    :param progress: Called with each record as soon as it is measured. Defaults to None.
+    :type progress: Callable[[Dict], None], optional
+
+    :return: The environment description and the list of benchmark records.
+    :rtype: Dict
+    """
+    # pandas and SciPy are imported on first use,
+    # load them up front so the first records do not include the import
+    import pandas  # pylint: disable=import-outside-toplevel,unused-import
+    import scipy.spatial.distance  # pylint: disable=import-outside-toplevel,unused-import
+
+    records = []
+
+    def add(record):
+        records.append(record)
+        if progress is not None:
+            progress(record)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = os.path.join(tmp_dir, 'vectors.db')
+        vocabulary = make_synthetic_database(
+            database_path, vocabulary_size, dimension, seed)
+        rng = np.random.default_rng(seed)
+        lookups = [vocabulary[i] for i in
+                   rng.integers(0, len(vocabulary), size=VECTOR_LOOKUPS)]
+
+        sql_db = DatabaseManager(database_path)
+        memory_db = DatabaseManager(database_path)
+        memory_db.load_vectors()
+
+        for name, db_manager in [('get_word_vector[sqlite]', sql_db),
+                                 ('get_word_vector[memory]', memory_db)]:
+            measurement = _measure(
+                lambda db=db_manager: [db.get_word_vector(word)
+                                       for word in lookups],
+                repeat, memory)
+            add(_record(name, 0, 0, len(lookups), 'lookups/s', measurement))
+        sql_db.disconnect()
+
+        processor = DataProcessor(words=memory_db.get_words())
+        computer = DatComputer(memory_db)
+        computer.minimum_words = minimum_words
+
+        for size, length in itertools.product(participants, words):
+            dataset = make_synthetic_dataset(vocabulary, size, length,
+                                             seed=seed)
+            csv_path = os.path.join(tmp_dir, 'dataset.csv')
+            _write_dataset_csv(dataset, csv_path)
+
+            measurement = _measure(
+                lambda: read_data(csv_path, csv_separator=';'),
+                repeat, memory)
+            add(_record('read_data[csv]', size, length, size,
+                        'participants/s', measurement))
+
+            xlsx_path = os.path.join(tmp_dir, 'dataset.xlsx')
+            _write_dataset_xlsx(dataset, xlsx_path)
+            cache_dir = os.path.join(tmp_dir, 'xlsx_cache')
+            with mock.patch.dict(os.environ, {'DATPL_CACHE_DIR': cache_dir}):
+                measurement = _measure(
+                    lambda: read_data(xlsx_path, use_cache=False),
+                    repeat, memory)
+                add(_record('read_data[xlsx]', size, length, size,
+                            'participants/s', measurement))
+
+                read_data(xlsx_path, use_cache=True)
+                measurement = _measure(
+                    lambda: read_data(xlsx_path, use_cache=True),
+                    repeat, memory)
+                add(_record('read_data[xlsx,cached]', size, length, size,
+                            'participants/s', measurement))
+
+            measurement = _measure(
+                lambda: processor.process_dataset(dataset), repeat, memory)
+            add(_record('process_dataset', size, length, size,
+                        'participants/s', measurement))
+
+            measurement = _measure(
+                lambda: processor.encode_dataset(dataset), repeat, memory)
+            add(_record('encode_dataset', size, length, size,
+                        'participants/s', measurement))
+
+            valid_responses = processor.extract_valid_words(
+                processor.process_dataset(dataset))
+            measurement = _measure(
+                lambda: computer.dataset_compute_dat_score(valid_responses),
+                repeat, memory)
+            add(_record('dataset_compute_dat_score', size, length, size,
+                        'participants/s', measurement))
+
+            encoded = processor.encode_dataset(dataset)
+            for workers in sorted({1, threads or os.cpu_count() or 1}):
+                computer.workers = workers
+                measurement = _measure(
+                    lambda: computer.dataset_compute_dat_score_encoded(
+                        encoded), repeat, memory)
+                add(_record(f'dataset_compute_dat_score_encoded'
+                            f'[threads={workers}]', size, length, size,
+                            'participants/s', measurement))
+            computer.workers = 1
+
+            results = computer.dataset_compute_dat_score(valid_responses)
+            output_path = os.path.join(tmp_dir, 'results.csv')
+            with contextlib.redirect_stdout(io.StringIO()):
+                measurement = _measure(
+                    lambda: save_results(results, minimum_words,
+                                         output_path=output_path),
+                    repeat, memory)
+            add(_record('save_results', size, length, size,
+                        'participants/s', measurement))
+
+            del dataset, encoded, valid_responses, results
+
+        memory_db.disconnect()
+
+    return {'environment': {'python': platform.python_version(),
+                            'numpy': np.__version__,
+                            'platform': platform.platform(),
+                            'processor': platform.processor(),
+                            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'parameters': {'vocabulary_size': vocabulary_size,
+                           'threads': threads or os.cpu_count() or 1,
+                           'dimension': dimension,
+                           'minimum_words': minimum_words,
+                           'repeat': repeat,
+                           'seed': seed},
+            'results': records}
+
+
+def compare(baseline: Dict, current: Dict) -> List[Dict]:
+    """
+    Pair up records of two runs and compute the speed-up of the current run.
+
+    :param baseline: Output of run_benchmarks for the reference version.
+    :type baseline: Dict
+    :param current: Output of run_benchmarks for the version under test.
+    :type current: Dict
+
+    :return: One entry per benchmark found in both runs, with the speed-up (baseline time / current time).
+    :rtype: List[Dict]
+    """
+    def key(record):
+        return record['benchmark'], record['participants'], record['words']
+
+    reference = {key(record): record for record in baseline['results']}
+    comparison = []
+    for record in current['results']:
+        if key(record) in reference and record['seconds']:
+            comparison.append({
+                'benchmark': record['benchmark'],
+                'participants': record['participants'],
+                'words': record['words'],
+                'speedup': reference[key(record)]['seconds'] / record['seconds']})
+    return comparison
+
+
+def _format_record(record: Dict) -> str:
+    peak = record['peak_bytes']
+    peak = f'{peak / 2 ** 20:8.1f} MiB' if peak is not None else '       - MiB'
+    throughput = record['throughput'] or 0.0
+    return (f'{record["benchmark"]:<26} {record["participants"]:>8} '
+            f'{record["words"]:>3} {record["seconds"]:9.3f} s '
+            f'{throughput:14.0f} {record["unit"]:<15} {peak}')
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m datpl.benchmark',
+        description='Benchmark the DAT pipeline on synthetic data.')
+    parser.add_argument('--participants', type=int, nargs='+',
+                        default=DEFAULT_PARTICIPANTS)
+    parser.add_argument('--words', type=int, nargs='+',
+                        default=DEFAULT_WORDS,
+                        help='Numbers of words per response.')
+    parser.add_argument('--vocabulary-size', type=int, default=20000)
+    parser.add_argument('--dimension', type=int, default=100)
+    parser.add_argument('--minimum-words', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', type=int,
+                        help='Threads of the threaded scoring benchmark. '
+                             'Defaults to the number of CPUs.')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the traced run measuring peak memory.')
+    parser.add_argument('--output', type=str,
+                        help='Write the results to a JSON file.')
+    parser.add_argument('--compare', type=str,
+                        help='JSON results of an earlier run to compare with.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+
+    report = run_benchmarks(args.participants, args.words,
+                            vocabulary_size=args.vocabulary_size,
+                            dimension=args.dimension,
+                            minimum_words=args.minimum_words,
+                            repeat=args.repeat,
+                            memory=not args.no_memory,
+                            seed=args.seed,
+                            threads=args.threads,
+                            progress=lambda r: print(_format_record(r),
+                                                     flush=True))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as json_file:
+            baseline = json.load(json_file)
+        for entry in compare(baseline, report):
+            print(f'{entry["benchmark"]:<26} {entry["participants"]:>8} '
+                  f'{entry["words"]:>3} {entry["speedup"]:6.2f}x')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
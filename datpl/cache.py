@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .processing import QUERY_BATCH_SIZE
+
+CachedResult = Tuple[np.ndarray, float]
+
+
+def cache_path(database_path: str) -> str:
+    """
+    Return the path of the result cache stored next to a vector database.
+
+    :param database_path: Path to the vectors.db database file.
+    :type database_path: str
+
+    :return: Path to the cache file.
+    :rtype: str
+    """
+    return os.path.splitext(database_path)[0] + '.results.db'
+
+
+class ResultCache:
+    def __init__(self, path: str, fingerprint: str):
+        """
+        Initialize ResultCache instance - a persistent store of computed results.
+
+        Results are keyed by a hash of the scored words, the minimum number of
+        words and the fingerprint of the vector store. The cache is emptied when
+        it is opened with a different fingerprint, i.e. after the vector
+        database was rebuilt.
+
+        :param path: Path to the SQLite cache file, created if missing.
+        :type path: str
+        :param fingerprint: Fingerprint of the vector store the results are computed with.
+        :type fingerprint: str
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the connection of the current process, opening it on first use.
+
+        :raises ConnectionError: If there is an error opening the cache.
+
+        :return: The connection to the cache file.
+        :rtype: sqlite3.Connection
+        """
+        # a connection inherited through fork must not be reused
+        if self._connection is None or self._pid != os.getpid():
+            try:
+                self._connection = sqlite3.connect(self.path, timeout=30)
+            except sqlite3.Error as exc:
+                raise ConnectionError(
+                    f"Error opening the result cache: {str(exc)}") from exc
+            self._pid = os.getpid()
+            self._prepare()
+        return self._connection
+
+    def _prepare(self):
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS '
+                'meta (name TEXT PRIMARY KEY, value TEXT)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS '
+                'results (key BLOB PRIMARY KEY, distances BLOB, score REAL)')
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE name='fingerprint'").fetchone()
+            if row is None or row[0] != self.fingerprint:
+                self._connection.execute('DELETE FROM results')
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) "
+                    "VALUES ('fingerprint', ?)", (self.fingerprint,))
+
+    def key(self, words: List[str], minimum_words: int) -> bytes:
+        """
+        Compute the cache key of a response.
+
+        :param words: The valid words of the response.
+        :type words: List[str]
+        :param minimum_words: The minimum number of words used to compute DAT scores.
+        :type minimum_words: int
+
+        :return: The cache key.
+        :rtype: bytes
+        """
+        scored = '\x1f'.join(words[:minimum_words])
+        return hashlib.sha256(
+            f'{self.fingerprint}\x1e{minimum_words}\x1e{scored}'.encode(
+                'utf-8')).digest()
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, CachedResult]:
+        """
+        Look up cached results.
+
+        :param keys: Cache keys computed with `key`.
+        :type keys: Iterable[bytes]
+
+        :return: The cached distances and score for each key found in the cache.
+        :rtype: Dict[bytes, Tuple[numpy.ndarray, float]]
+        """
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), QUERY_BATCH_SIZE):
+            batch = keys[start:start + QUERY_BATCH_SIZE]
+            rows = self.connection.execute(
+                f'SELECT key, distances, score FROM results '
+                f'WHERE key IN ({",".join("?" * len(batch))})', batch)
+            for key, distances, score in rows:
+                # SQLite stores NaN as NULL
+                found[key] = (np.frombuffer(distances, dtype=np.float32),
+                              np.nan if score is None else score)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray, float]]):
+        """
+        Store computed results.
+
+        :param items: Tuples of (key, distances, score).
+        :type items: Iterable[Tuple[bytes, numpy.ndarray, float]]
+        """
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO results (key, distances, score) '
+                'VALUES (?, ?, ?)',
+                ((key, np.asarray(distances, dtype=np.float32).tobytes(),
+                  float(score)) for key, distances, score in items))
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        """
+        Close the connection to the cache file.
+        """
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
+
+
+def open_result_cache(database_manager,
+                      path: Optional[str] = None) -> ResultCache:
+    """
+    Open the result cache of a vector database.
+
+    :param database_manager: The DatabaseManager of the vector database.
+    :type database_manager: DatabaseManager
+    :param path: Path to the cache file. Defaults to the '.results.db' file next to the database.
+    :type path: str, optional
+
+    :return: The result cache.
+    :rtype: ResultCache
+    """
+    return ResultCache(path or cache_path(database_manager.db_path),
+                       database_manager.fingerprint())
@@ -0,0 +1,21 @@
+import configparser
+
+DEFAULT_CONFIG_PATH = 'config.ini'
+
+
+def read_config(path: str = DEFAULT_CONFIG_PATH) -> configparser.ConfigParser:
+    """
+    Read the project configuration file.
+
+    A missing file is not an error - the returned parser is simply empty
+    and callers fall back to their own defaults.
+
+    :param path: Path to the configuration file. Defaults to 'config.ini'.
+    :type path: str
+
+    :return: The parsed configuration.
+    :rtype: configparser.ConfigParser
+    """
+    config = configparser.ConfigParser()
+    config.read(path, encoding='utf-8')
+    return config
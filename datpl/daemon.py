@@ -0,0 +1,263 @@
+"""Long-lived scoring daemon and its command-line client.
+
+The daemon loads the vocabulary and the word vectors once and then accepts
+scoring jobs over a local TCP socket, so consecutive runs skip the import and
+database start-up cost. Each job is a single line of JSON, answered with a
+single line of JSON. Paths are resolved in the daemon's working directory, so
+the client sends absolute paths, and the daemon answers with one:
+
+    {"path": "/data/dat-data.xlsx", "csv_separator": ";", "id_column": 0,
+     "output_path": "/results/dat-data_dat_distances.csv"}
+    {"responses": {"p1": ["word", ...], ...}}
+    {"action": "ping"}
+    {"action": "shutdown"}
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, TYPE_CHECKING
+
+from .config import read_config
+
+if TYPE_CHECKING:
+    from .pipeline import DatPipeline
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class DatRequestHandler(socketserver.StreamRequestHandler):
+    """Handle a single JSON job sent to the daemon."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        start = time.perf_counter()
+        try:
+            response = self.server.run_job(json.loads(line))
+            response['status'] = 'ok'
+        except Exception as exc:  # reported back to the client
+            response = {'status': 'error', 'message': str(exc)}
+        response['elapsed_ms'] = (time.perf_counter() - start) * 1000
+
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class DatDaemon(socketserver.TCPServer):
+    allow_reuse_address = True
+
+    def __init__(self, pipeline: 'DatPipeline',
+                 host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        Initialize DatDaemon instance.
+
+        :param pipeline: A loaded pipeline used to score incoming jobs.
+        :type pipeline: DatPipeline
+        :param host: Address to listen on. Defaults to 127.0.0.1.
+        :type host: str, optional
+        :param port: Port to listen on, 0 picks a free port. Defaults to 8765.
+        :type port: int, optional
+        """
+        super().__init__((host, port), DatRequestHandler)
+        self.pipeline = pipeline
+
+    def run_job(self, job: Dict) -> Dict:
+        """
+        Run a single job and return its JSON-serializable response.
+
+        :param job: The decoded job sent by the client.
+        :type job: Dict
+
+        :raises ValueError: If the job is not recognized.
+
+        :return: The response to send back to the client.
+        :rtype: Dict
+        """
+        action = job.get('action', 'score')
+
+        if action == 'ping':
+            return {'words': len(self.pipeline.processor.words),
+                    'fingerprint': self.pipeline.db.fingerprint()}
+
+        if action == 'shutdown':
+            # shutdown() blocks until serve_forever() returns,
+            # so it has to be called from another thread
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {}
+
+        if action != 'score':
+            raise ValueError(f'Unknown action: {action}')
+
+        if 'path' in job:
+            output_path = self.pipeline.score_file(
+                job['path'],
+                csv_separator=job.get('csv_separator', ';'),
+                id_column=job.get('id_column', 0),
+                output_path=job.get('output_path'))
+            return {'output_path': os.path.abspath(output_path)}
+
+        if 'responses' in job:
+            results = self.pipeline.score(job['responses'])
+            return {'results': {
+                p_id: {'distances': [float(d) for d in result.distances],
+                       'score': result.score}
+                for p_id, result in results.items()},
+                'fingerprint': self.pipeline.db.fingerprint()}
+
+        raise ValueError('Score job requires either "path" or "responses".')
+
+    def server_close(self):
+        super().server_close()
+        self.pipeline.close()
+
+
+def send_job(job: Dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+             timeout: float = None) -> Dict:
+    """
+    Send a job to a running daemon and return its decoded response.
+
+    The round-trip time measured on the client side is added to the
+    response under 'roundtrip_ms'.
+
+    :param job: The job to send.
+    :type job: Dict
+    :param host: Address of the daemon. Defaults to 127.0.0.1.
+    :type host: str, optional
+    :param port: Port of the daemon. Defaults to 8765.
+    :type port: int, optional
+    :param timeout: Socket timeout in seconds. Defaults to None (no timeout).
+    :type timeout: float, optional
+
+    :raises ConnectionError: If the daemon is not reachable.
+
+    :return: The decoded response.
+    :rtype: Dict
+    """
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(json.dumps(job).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as stream:
+                line = stream.readline()
+    except OSError as exc:
+        raise ConnectionError(
+            f'Could not reach the DAT daemon at {host}:{port}: {exc}') from exc
+
+    response = json.loads(line)
+    response['roundtrip_ms'] = (time.perf_counter() - start) * 1000
+    return response
+
+
+def _output_paths(args):
+    if args.output_dir is None:
+        return [None] * len(args.files)
+    from .batch import output_paths_for  # pylint: disable=import-outside-toplevel
+    return output_paths_for(args.files, os.path.abspath(args.output_dir))
+
+
+def _parse_args(argv=None):
+    config = read_config()
+
+    parser = argparse.ArgumentParser(
+        prog='python -m datpl.daemon',
+        description='Keep the DAT vector store loaded and score jobs.')
+    parser.add_argument('--host', type=str,
+                        default=config.get('Daemon', 'host',
+                                           fallback=DEFAULT_HOST))
+    parser.add_argument('--port', type=int,
+                        default=config.getint('Daemon', 'port',
+                                              fallback=DEFAULT_PORT))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Start the daemon.')
+    serve.add_argument('--database-path', type=str,
+                       default=config.get('Database', 'database_path',
+                                          fallback=None))
+    serve.add_argument('--minimum-words', type=int, default=7)
+
+    score = commands.add_parser('score', help='Score data files.')
+    score.add_argument('files', nargs='*', help='Data files to score.')
+    score.add_argument('--json', type=str, dest='json_file',
+                       help='JSON file with a mapping of IDs to word lists.')
+    score.add_argument('--csv-separator', type=str, default=';')
+    score.add_argument('--output-dir', type=str,
+                       help='Directory for the results files. Defaults to a '
+                            'time-stamped file in the daemon\'s results '
+                            'folder.')
+
+    commands.add_parser('ping', help='Check that the daemon is running.')
+    commands.add_parser('stop', help='Stop the daemon.')
+
+    return parser.parse_args(argv)
+
+
+def _report(response: Dict, label: str):
+    if response['status'] != 'ok':
+        print(f'{label}: error: {response["message"]}', file=sys.stderr)
+        return False
+
+    print(f'{label}: {response["elapsed_ms"]:.1f} ms on the daemon, '
+          f'{response["roundtrip_ms"]:.1f} ms round trip')
+    return True
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+
+    if args.command == 'serve':
+        if not args.database_path:
+            print('No database path given.', file=sys.stderr)
+            return 2
+        # the client commands never touch the vectors, so only the
+        # server pays for importing NumPy and the scoring code
+        from .pipeline import DatPipeline  # pylint: disable=import-outside-toplevel
+
+        start = time.perf_counter()
+        pipeline = DatPipeline(args.database_path,
+                               minimum_words=args.minimum_words)
+        with DatDaemon(pipeline, host=args.host, port=args.port) as daemon:
+            print(f'Vector store loaded in {time.perf_counter() - start:.2f} s. '
+                  f'Listening on {args.host}:{daemon.server_address[1]}.')
+            daemon.serve_forever()
+        return 0
+
+    if args.command == 'ping':
+        return 0 if _report(send_job({'action': 'ping'}, args.host, args.port),
+                            'ping') else 1
+
+    if args.command == 'stop':
+        return 0 if _report(send_job({'action': 'shutdown'},
+                                     args.host, args.port), 'stop') else 1
+
+    success = True
+    for path, output_path in zip(args.files, _output_paths(args)):
+        job = {'path': os.path.abspath(path),
+               'csv_separator': args.csv_separator}
+        if output_path is not None:
+            job['output_path'] = output_path
+        response = send_job(job, args.host, args.port)
+        success &= _report(response, path)
+        if response['status'] == 'ok':
+            print(f'CSV file saved in {response["output_path"]}.')
+
+    if args.json_file:
+        with open(args.json_file, 'r', encoding='utf-8') as json_file:
+            responses = json.load(json_file)
+        response = send_job({'responses': responses}, args.host, args.port)
+        success &= _report(response, args.json_file)
+        if response['status'] == 'ok':
+            print(json.dumps(response['results'], ensure_ascii=False))
+
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,22 +3,32 @@ import time
 import pathlib
 import uuid
 from itertools import combinations
-from typing import List, Dict
+from typing import List, Dict, Optional, Union, TYPE_CHECKING
 
-import pandas as pd
+from . import xlsx
+from .decorators import instrument
 
-from .analysis import DatResult
+if TYPE_CHECKING:
+    from .analysis import DatResult, DatResults
 
 
 SUPPORTED_FILE_TYPES = ['.xlsx', '.csv']
 
+FINGERPRINT_COLUMN = 'vectors_fingerprint'
 
+
+@instrument('read_data')
 def read_data(
         path_to_file,
         csv_separator=';',
-        id_column=0) -> Dict[str, List[str]]:
+        id_column=0,
+        use_cache=False) -> Dict[str, List[str]]:
     """
-    Read data from the specified file using Pandas.
+    Read data from the specified file.
+
+    CSV files are read with Pandas. XLSX files are parsed with a streaming
+    reader. With use_cache, a columnar copy of the workbook is kept on disk
+    so that later reads of an unchanged workbook skip the parse.
 
     :param path_to_file: path to file containing the data.
     :type path_to_file: str
@@ -26,6 +36,8 @@ def read_data(
     :type csv_separator: str, optional
     :param id_column: The name or index of the column containing unique IDs. Defaults to 0.
     :type id_column: str or int, optional
+    :param use_cache: Whether to use the cache of parsed XLSX files, see datpl.xlsx.default_cache_dir. Defaults to False.
+    :type use_cache: bool, optional
 
     :return: The data read from the file.
     :rtype: Dict[str, List[str]]
@@ -37,6 +49,11 @@ def read_data(
             f'Unsupported file type. Supported types are '
             f'{", ".join(SUPPORTED_FILE_TYPES)}')
 
+    if file_extension == '.xlsx':
+        header, columns = xlsx.read_columns(
+            path_to_file, xlsx.default_cache_dir() if use_cache else None)
+        return _dataset_from_columns(header, columns, id_column)
+
     df = _read_data_from_file(path_to_file, file_extension, csv_separator)
     df = _set_unique_id_column(df, id_column)
 
@@ -44,23 +61,35 @@ def read_data(
     return dict(zip(df.index.tolist(), word_list))
 
 
-def save_results(results: Dict[str, DatResult], minimum_words: int):
+@instrument('save_results')
+def save_results(results: Union['DatResults', Dict[str, 'DatResult']],
+                 minimum_words: int,
+                 output_path: Optional[str] = None,
+                 fingerprint: Optional[str] = None):
     """
     Save computed distances to a CSV file in the 'results' folder.
 
-    :param results: A dictionary of DatResult named tuples, each containing distances and scores.
-    :type results: Dict[str, DatResult]
+    :param results: Computed results, or a dictionary of DatResult named tuples, each containing distances and scores.
+    :type results: Union[DatResults, Dict[str, DatResult]]
     :param minimum_words: The minimum number of words used to compute DAT scores.
     :type minimum_words: int
+    :param output_path: Path to the CSV file. Defaults to a time-stamped file in the 'results' folder.
+    :type output_path: str, optional
+    :param fingerprint: Fingerprint of the vector database, written to a 'vectors_fingerprint' column. Defaults to None, the fingerprint carried by DatResults computed by DatComputer.
+    :type fingerprint: str, optional
 
     :return: The path to the saved CSV file.
     :rtype: str
     """
-    output_path = _create_output_directory(_generate_file_name())
+    if output_path is None:
+        output_path = _create_output_directory(_generate_file_name())
+    elif os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     column_names = _generate_column_names(minimum_words)
 
-    _save_csv_file(output_path, results=results, columns=column_names)
+    _save_csv_file(output_path, results=results, columns=column_names,
+                   fingerprint=fingerprint)
 
     print(f'CSV file saved in {output_path}.')
 
@@ -68,6 +97,8 @@ def save_results(results: Dict[str, DatResult], minimum_words: int):
 
 
 def _read_data_from_file(file_path, file_extension, csv_separator=';'):
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
     if file_extension == '.xlsx':
         return pd.read_excel(file_path, dtype=str)
 
@@ -93,6 +124,31 @@ def _set_unique_id_column(df, id_column):
     return df
 
 
+def _dataset_from_columns(header: List[str], columns: List[List[str]],
+                          id_column) -> Dict[str, List[str]]:
+    """Build the participants' word sequences from columns of strings."""
+    if id_column is None:
+        ids = [str(uuid.uuid4()) for _ in range(len(columns[0]) if columns
+                                                else 0)]
+        word_columns = columns
+    else:
+        if isinstance(id_column, int):
+            position = range(len(header))[id_column]
+        elif isinstance(id_column, str):
+            if id_column not in header:
+                raise ValueError(
+                    f'Unique ID column "{id_column}" not found in the data.')
+            position = header.index(id_column)
+        else:
+            raise ValueError(f'Invalid value for id_column: {id_column}')
+        ids = columns[position]
+        word_columns = columns[:position] + columns[position + 1:]
+
+    if not word_columns:
+        return {p_id: [] for p_id in ids}
+    return dict(zip(ids, map(list, zip(*word_columns))))
+
+
 def _generate_file_name() -> str:
     """Generate a unique file name based on the current date and time."""
     date = time.strftime('%Y-%b-%d__%H_%M_%S', time.localtime())
@@ -112,10 +168,19 @@ def _generate_column_names(minimum_words: int):
     return ['ID'] + word_pairs_columns + ['DAT']
 
 
-def _save_csv_file(output_path: str, results, columns):
+def _save_csv_file(output_path: str, results, columns, fingerprint=None):
     """Save the computed distances to a CSV file."""
-    data = [[key] + result.distances + [result.score]
-            for key, result in results.items()]
+    from .analysis import DatResults  # pylint: disable=import-outside-toplevel
 
-    df = pd.DataFrame(data, columns=columns)
-    df.to_csv(output_path, index=False)
+    if not isinstance(results, DatResults):
+        results = DatResults.from_dict(results, pairs=len(columns) - 2)
+
+    _stamp(results.to_dataframe(columns),
+           fingerprint or results.fingerprint).to_csv(output_path, index=False)
+
+
+def _stamp(df, fingerprint):
+    """Add the fingerprint of the vector database as the last column."""
+    if fingerprint is not None:
+        df[FINGERPRINT_COLUMN] = fingerprint
+    return df
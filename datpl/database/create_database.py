@@ -4,6 +4,9 @@ import argparse
 from typing import Set, Dict
 import numpy as np
 
+from datpl.integrity import build_metadata, file_hash, write_metadata
+from datpl.neighbours import NeighbourIndex, index_path
+
 
 class ModelProcessor:
     def __init__(self, lang_dictionary: str, model: str):
@@ -62,7 +65,8 @@ class ModelProcessor:
 
 def create_vectors_database(database_path: str,
                             dict_path: str,
-                            model_path: str):
+                            model_path: str,
+                            neighbour_index: bool = True):
 
     if not os.path.exists(database_path):
 
@@ -84,8 +88,19 @@ def create_vectors_database(database_path: str,
                     (valid_word, vector_data))
 
             conn.commit()
+            write_metadata(conn, build_metadata(
+                ((word, vector.tobytes())
+                 for word, vector in validator.vectors.items()),
+                model_sha256=file_hash(model_path),
+                dictionary_sha256=file_hash(dict_path)))
             conn.close()
 
+            if neighbour_index:
+                words = list(validator.vectors)
+                NeighbourIndex.build(
+                    words, np.stack([validator.vectors[w] for w in words])
+                ).save(index_path(database_path))
+
         except Exception as exc:
             raise RuntimeError(f'Error creating the database: {exc}') from exc
     else:
@@ -104,9 +119,13 @@ if __name__ == "__main__":
     parser.add_argument("--model-path",
                         type=str, required=True,
                         help="Path to the GloVe model file")
+    parser.add_argument("--no-neighbour-index",
+                        action="store_true",
+                        help="Skip building the nearest-neighbour index")
 
     args = parser.parse_args()
     create_vectors_database(
         database_path=args.database_path,
         dict_path=args.dict_path,
-        model_path=args.model_path)
+        model_path=args.model_path,
+        neighbour_index=not args.no_neighbour_index)
@@ -1,4 +1,7 @@
 from functools import wraps
+from time import perf_counter
+
+from .instrumentation import INSTRUMENTATION
 
 
 def format_dict_output(method):
@@ -33,3 +36,28 @@ def round_output(method):
                           else value for value in method_output]
         print(*rounded_output, sep='\n')
     return wrapper
+
+
+def instrument(stage):
+    """
+    Records wall time and call count of the method under the given stage name.
+
+    Recording happens only while instrumentation is enabled
+    (see datpl.instrumentation.profile_run); otherwise the wrapper
+    just calls the method.
+
+    Parameters:
+        stage (str): Name of the pipeline stage reported for the method.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*method_args, **method_kwargs):
+            if not INSTRUMENTATION.enabled:
+                return method(*method_args, **method_kwargs)
+            start = perf_counter()
+            try:
+                return method(*method_args, **method_kwargs)
+            finally:
+                INSTRUMENTATION.record(stage, perf_counter() - start)
+        return wrapper
+    return decorator
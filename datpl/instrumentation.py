@@ -0,0 +1,195 @@
+"""Run-time instrumentation of the scoring pipeline.
+
+Instrumentation is off by default. While it is off, the `instrument`
+decorator and `count` only check a single flag. Enable it for a run with
+`profile_run`, which collects per-stage wall time and call counts, event
+counters (such as SQL queries and cache hits) and, optionally, a cProfile dump.
+"""
+import cProfile
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class Instrumentation:
+    def __init__(self):
+        """
+        Initialize Instrumentation instance.
+        """
+        self.enabled = False
+        self.stages: Dict[str, list] = {}
+        self.counters: Counter = Counter()
+        self.gauges: Dict[str, float] = {}
+        self._started = None
+        self._stopped = None
+        # stages may run in several threads
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Discard everything recorded so far and start recording.
+        """
+        self.stages = {}
+        self.counters = Counter()
+        self.gauges = {}
+        self._started = time.perf_counter()
+        self._stopped = None
+        self.enabled = True
+
+    def stop(self):
+        """
+        Stop recording, keeping the recorded data for the report.
+        """
+        self.enabled = False
+        self._stopped = time.perf_counter()
+
+    def record(self, stage: str, seconds: float):
+        """
+        Record a single call of a pipeline stage.
+
+        :param stage: Name of the stage.
+        :type stage: str
+        :param seconds: Wall time of the call in seconds.
+        :type seconds: float
+        """
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def count(self, name: str, n: int = 1):
+        """
+        Increase an event counter.
+
+        :param name: Name of the counter, e.g. 'sql.queries'.
+        :type name: str
+        :param n: Value to add. Defaults to 1.
+        :type n: int, optional
+        """
+        with self._lock:
+            self.counters[name] += n
+
+    def gauge(self, name: str, value: float):
+        """
+        Record the latest value of a measurement, keeping the maximum
+        for names ending in '.peak'.
+
+        :param name: Name of the gauge.
+        :type name: str
+        :param value: The measured value.
+        :type value: float
+        """
+        with self._lock:
+            if name.endswith('.peak'):
+                value = max(value, self.gauges.get(name, value))
+            self.gauges[name] = value
+
+    def report(self) -> Dict:
+        """
+        Summarize the recorded data.
+
+        Counter pairs named '<cache>.hits' and '<cache>.misses' are
+        summarized as a hit rate of that cache, None if both are 0.
+
+        :return: A JSON-serializable report.
+        :rtype: Dict
+        """
+        stages = {
+            stage: {'calls': calls,
+                    'total_s': total,
+                    'mean_ms': total / calls * 1000}
+            for stage, (calls, total) in sorted(
+                self.stages.items(), key=lambda item: -item[1][1])}
+
+        caches = {}
+        for name in self.counters:
+            cache, _, event = name.rpartition('.')
+            if event in ('hits', 'misses') and cache not in caches:
+                hits = self.counters.get(f'{cache}.hits', 0)
+                misses = self.counters.get(f'{cache}.misses', 0)
+                # counters may be increased by 0, e.g. for an empty chunk
+                total = hits + misses
+                caches[cache] = {'hits': hits, 'misses': misses,
+                                 'hit_rate': hits / total if total else None}
+
+        wall_time = None
+        if self._started is not None:
+            wall_time = (self._stopped or time.perf_counter()) - self._started
+
+        return {'wall_time_s': wall_time,
+                'stages': stages,
+                'counters': dict(self.counters),
+                'caches': caches,
+                'gauges': dict(self.gauges)}
+
+    def save_json(self, path: str):
+        """
+        Write the report to a JSON file.
+
+        :param path: Path to the JSON file.
+        :type path: str
+        """
+        with open(path, 'w', encoding='utf-8') as json_file:
+            json.dump(self.report(), json_file, indent=2)
+
+
+INSTRUMENTATION = Instrumentation()
+
+
+def count(name: str, n: int = 1):
+    """
+    Increase an event counter when instrumentation is enabled.
+
+    :param name: Name of the counter.
+    :type name: str
+    :param n: Value to add. Defaults to 1.
+    :type n: int, optional
+    """
+    if INSTRUMENTATION.enabled:
+        INSTRUMENTATION.count(name, n)
+
+
+def gauge(name: str, value: float):
+    """
+    Record a measurement when instrumentation is enabled.
+
+    :param name: Name of the gauge.
+    :type name: str
+    :param value: The measured value.
+    :type value: float
+    """
+    if INSTRUMENTATION.enabled:
+        INSTRUMENTATION.gauge(name, value)
+
+
+@contextmanager
+def profile_run(json_path: Optional[str] = None,
+                pstats_path: Optional[str] = None):
+    """
+    Enable instrumentation for the duration of a block.
+
+    :param json_path: Where to write the JSON report. Defaults to None (not written).
+    :type json_path: str, optional
+    :param pstats_path: Where to write a cProfile dump readable with pstats. Defaults to None (no profiling).
+    :type pstats_path: str, optional
+
+    :return: The instrumentation collecting the data of the run.
+    :rtype: Instrumentation
+    """
+    INSTRUMENTATION.start()
+    profiler = cProfile.Profile() if pstats_path else None
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield INSTRUMENTATION
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(pstats_path)
+        INSTRUMENTATION.stop()
+        if json_path:
+            INSTRUMENTATION.save_json(json_path)
@@ -0,0 +1,303 @@
+"""Integrity metadata of the vector database.
+
+The database build writes a `metadata` table next to `vectors`. It holds the
+hashes of the model and dictionary files the vectors were extracted from, the
+dtype, dimension and normalization of the vectors, the number of rows, and an
+order-independent checksum of the rows. A fingerprint over all of these
+identifies the vectors results were computed with.
+
+Opening a database checks only the cheap fields (row count, vector size); the
+checksum is recomputed on request:
+
+    python -m datpl.integrity verify --full
+    python -m datpl.integrity stamp
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+METADATA_VERSION = '1'
+
+# vectors are stored as extracted from the model
+NORMALIZATION = 'none'
+
+Metadata = Dict[str, str]
+
+
+def file_hash(path_to_file: str) -> str:
+    """
+    Compute the SHA-256 hash of a file's content.
+
+    :param path_to_file: Path to the file.
+    :type path_to_file: str
+
+    :return: The hex digest.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path_to_file, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class VectorChecksum:
+    def __init__(self):
+        """
+        Initialize VectorChecksum instance - a checksum of the rows of the vectors table.
+
+        Each row is hashed on its own and the hashes are combined with XOR, so
+        the checksum is updated one row at a time, in any order, while the
+        rows are inserted.
+        """
+        self.rows = 0
+        self._value = 0
+
+    def update(self, word: str, vector: bytes):
+        """
+        Add a row to the checksum.
+
+        :param word: The word.
+        :type word: str
+        :param vector: The stored vector blob.
+        :type vector: bytes
+        """
+        digest = hashlib.sha256(
+            word.encode('utf-8') + b'\x00' + vector).digest()
+        self._value ^= int.from_bytes(digest[:16], 'big')
+        self.rows += 1
+
+    def hexdigest(self) -> str:
+        """
+        Return the checksum of the rows added so far.
+
+        :return: A hexadecimal digest.
+        :rtype: str
+        """
+        return f'{self._value:032x}'
+
+
+def compute_fingerprint(metadata: Metadata) -> str:
+    """
+    Compute the fingerprint of the vectors described by the metadata.
+
+    :param metadata: The metadata fields, the 'fingerprint' field is ignored.
+    :type metadata: Dict[str, str]
+
+    :return: A hexadecimal digest.
+    :rtype: str
+    """
+    fields = {name: value for name, value in metadata.items()
+              if name != 'fingerprint'}
+    return hashlib.sha256(
+        json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def build_metadata(rows: Iterable[Tuple[str, bytes]],
+                   model_sha256: str = '', dictionary_sha256: str = '',
+                   dtype: str = 'float64') -> Metadata:
+    """
+    Describe the rows of a vectors table.
+
+    :param rows: Pairs of (word, vector blob).
+    :type rows: Iterable[Tuple[str, bytes]]
+    :param model_sha256: Hash of the model file. Defaults to '', unknown.
+    :type model_sha256: str, optional
+    :param dictionary_sha256: Hash of the dictionary file. Defaults to '', unknown.
+    :type dictionary_sha256: str, optional
+    :param dtype: NumPy dtype of the stored vectors. Defaults to 'float64'.
+    :type dtype: str, optional
+
+    :raises ValueError: If the vectors do not all have the same size.
+
+    :return: The metadata fields, including the fingerprint.
+    :rtype: Dict[str, str]
+    """
+    checksum = VectorChecksum()
+    vector_size = None
+    for word, vector in rows:
+        if vector_size is None:
+            vector_size = len(vector)
+        elif len(vector) != vector_size:
+            raise ValueError(f'Vector of "{word}" has {len(vector)} bytes, '
+                             f'expected {vector_size}.')
+        checksum.update(word, vector)
+
+    metadata = {
+        'version': METADATA_VERSION,
+        'model_sha256': model_sha256,
+        'dictionary_sha256': dictionary_sha256,
+        'dtype': dtype,
+        'dimension': str((vector_size or 0) // np.dtype(dtype).itemsize),
+        'normalization': NORMALIZATION,
+        'rows': str(checksum.rows),
+        'checksum': checksum.hexdigest(),
+    }
+    metadata['fingerprint'] = compute_fingerprint(metadata)
+    return metadata
+
+
+def write_metadata(connection: sqlite3.Connection, metadata: Metadata):
+    """
+    Replace the metadata table of a database.
+
+    :param connection: Connection to the database.
+    :type connection: sqlite3.Connection
+    :param metadata: The metadata fields.
+    :type metadata: Dict[str, str]
+    """
+    with connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS '
+                           'metadata (name TEXT PRIMARY KEY, value TEXT)')
+        connection.execute('DELETE FROM metadata')
+        connection.executemany(
+            'INSERT INTO metadata (name, value) VALUES (?, ?)',
+            sorted(metadata.items()))
+
+
+def read_metadata(connection: sqlite3.Connection) -> Optional[Metadata]:
+    """
+    Read the metadata table of a database.
+
+    :param connection: Connection to the database.
+    :type connection: sqlite3.Connection
+
+    :return: The metadata fields, or None for a database built without them.
+    :rtype: Optional[Dict[str, str]]
+    """
+    exists = connection.execute(
+        "SELECT 1 FROM sqlite_master "
+        "WHERE type='table' AND name='metadata'").fetchone()
+    if exists is None:
+        return None
+    return dict(connection.execute('SELECT name, value FROM metadata'))
+
+
+def check_shape(metadata: Metadata, rows: int, vector_bytes: int):
+    """
+    Compare the size of the vectors table with its metadata.
+
+    :param metadata: The metadata fields.
+    :type metadata: Dict[str, str]
+    :param rows: Number of rows in the vectors table.
+    :type rows: int
+    :param vector_bytes: Size of a stored vector in bytes.
+    :type vector_bytes: int
+
+    :raises ValueError: If the table does not match the metadata.
+    """
+    expected_bytes = (int(metadata['dimension'])
+                      * np.dtype(metadata['dtype']).itemsize)
+    if rows != int(metadata['rows']):
+        raise ValueError(f'Vector database has {rows} rows, its metadata '
+                         f'records {metadata["rows"]}.')
+    if rows and vector_bytes != expected_bytes:
+        raise ValueError(f'Vector database stores vectors of {vector_bytes} '
+                         f'bytes, its metadata records {expected_bytes}.')
+    if compute_fingerprint(metadata) != metadata['fingerprint']:
+        raise ValueError('Fingerprint of the vector database does not match '
+                         'its metadata.')
+
+
+def verify_database(connection: sqlite3.Connection, metadata: Metadata,
+                    full: bool = False):
+    """
+    Check a database against its metadata.
+
+    :param connection: Connection to the database.
+    :type connection: sqlite3.Connection
+    :param metadata: The metadata fields.
+    :type metadata: Dict[str, str]
+    :param full: Whether to recompute the checksum of all rows. Defaults to False.
+    :type full: bool, optional
+
+    :raises ValueError: If the database does not match the metadata.
+    """
+    rows = connection.execute('SELECT COUNT(*) FROM vectors').fetchone()[0]
+    sample = connection.execute(
+        'SELECT length(vector) FROM vectors LIMIT 1').fetchone()
+    check_shape(metadata, rows, sample[0] if sample else 0)
+
+    if full:
+        checksum = VectorChecksum()
+        for word, vector in connection.execute(
+                'SELECT word, vector FROM vectors'):
+            checksum.update(word, vector)
+        if checksum.hexdigest() != metadata['checksum']:
+            raise ValueError('Checksum of the vector database does not match '
+                             'its metadata.')
+
+
+def _parse_args(argv=None):
+    from .config import read_config  # pylint: disable=import-outside-toplevel
+
+    config = read_config()
+    parser = argparse.ArgumentParser(
+        prog='python -m datpl.integrity',
+        description='Verify or write the integrity metadata of the vector '
+                    'database.')
+    parser.add_argument('--database-path', type=str,
+                        default=config.get('Database', 'database_path',
+                                           fallback=None))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    verify = commands.add_parser('verify', help='Check the database.')
+    verify.add_argument('--full', action='store_true',
+                        help='Recompute the checksum of all rows.')
+    verify.add_argument('--expected-rows', type=int,
+                        help='Number of rows the database must have.')
+
+    stamp = commands.add_parser(
+        'stamp', help='Write metadata for a database built without it.')
+    stamp.add_argument('--model-path', type=str,
+                       help='Model file the vectors were extracted from.')
+    stamp.add_argument('--dict-path', type=str,
+                       help='Dictionary file the words were filtered with.')
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    connection = sqlite3.connect(args.database_path)
+
+    try:
+        if args.command == 'stamp':
+            metadata = build_metadata(
+                connection.execute('SELECT word, vector FROM vectors'),
+                model_sha256=file_hash(args.model_path)
+                if args.model_path else '',
+                dictionary_sha256=file_hash(args.dict_path)
+                if args.dict_path else '')
+            write_metadata(connection, metadata)
+            print(f'Fingerprint: {metadata["fingerprint"]}')
+            return 0
+
+        metadata = read_metadata(connection)
+        if metadata is None:
+            print('Error: the database has no metadata table.')
+            return 1
+        try:
+            verify_database(connection, metadata, full=args.full)
+            if (args.expected_rows is not None
+                    and int(metadata['rows']) != args.expected_rows):
+                raise ValueError(f'Vector database has {metadata["rows"]} '
+                                 f'rows, expected {args.expected_rows}.')
+        except ValueError as exc:
+            print(f'Error: {exc}')
+            return 1
+        print(f'Vector database is intact. '
+              f'Fingerprint: {metadata["fingerprint"]}')
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Approximate nearest-neighbour index over the word vectors.
+
+The index is an inverted file (IVF): the unit-normalized vectors are split
+into clusters with spherical k-means, and a query compares the query vector
+only with the words in the few clusters whose centroids are closest to it.
+
+    python -m datpl.neighbours build --database-path datpl/database/vectors.db
+    python -m datpl.neighbours query kot pies --k 10
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+DEFAULT_PROBES = 8
+
+Neighbours = List[Tuple[str, float]]
+
+
+def index_path(database_path: str) -> str:
+    """
+    Return the path of the neighbour index stored next to a vector database.
+
+    :param database_path: Path to the vectors.db database file.
+    :type database_path: str
+
+    :return: Path to the index file.
+    :rtype: str
+    """
+    return os.path.splitext(database_path)[0] + '.ivf.npz'
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray,
+            batch_size: int = 16384) -> np.ndarray:
+    """Return the index of the most similar centroid for each vector."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        labels[start:start + batch_size] = np.argmax(batch @ centroids.T,
+                                                     axis=1)
+    return labels
+
+
+class NeighbourIndex:
+    def __init__(self, words: List[str], vectors: np.ndarray,
+                 centroids: np.ndarray, offsets: np.ndarray):
+        """
+        Initialize NeighbourIndex instance. Use `build` or `load` to create one.
+
+        :param words: Indexed words, grouped by cluster.
+        :type words: List[str]
+        :param vectors: Unit-normalized vectors of the words, in the same order.
+        :type vectors: numpy.ndarray
+        :param centroids: Unit-normalized cluster centroids.
+        :type centroids: numpy.ndarray
+        :param offsets: Start of each cluster in `words`, followed by the number of words.
+        :type offsets: numpy.ndarray
+        """
+        self.words = list(words)
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.index = {word: i for i, word in enumerate(self.words)}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.index
+
+    @classmethod
+    def build(cls, words: List[str], matrix: np.ndarray,
+              n_lists: Optional[int] = None, iterations: int = 10,
+              seed: int = 0) -> 'NeighbourIndex':
+        """
+        Cluster the word vectors and build the index.
+
+        :param words: The words to index.
+        :type words: List[str]
+        :param matrix: A 2D array holding the vector of each word.
+        :type matrix: numpy.ndarray
+        :param n_lists: Number of clusters. Defaults to the square root of the number of words.
+        :type n_lists: int, optional
+        :param iterations: Number of k-means iterations. Defaults to 10.
+        :type iterations: int, optional
+        :param seed: Seed of the random generator. Defaults to 0.
+        :type seed: int, optional
+
+        :raises ValueError: If there are no words or the number of words and vectors differ.
+
+        :return: The built index.
+        :rtype: NeighbourIndex
+        """
+        if len(words) == 0 or len(words) != len(matrix):
+            raise ValueError('index needs one vector for each of at least '
+                             'one word')
+
+        vectors = _normalize(matrix)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+
+        # k-means is trained on a sample, every word is assigned afterwards
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), 256 * n_lists)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+
+        for _ in range(iterations):
+            labels = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            sums[empty] = sample[rng.choice(sample_size, empty.sum())]
+            centroids = _normalize(sums)
+
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+
+        return cls([words[i] for i in order], vectors[order],
+                   centroids, offsets)
+
+    @classmethod
+    def load(cls, path: str) -> 'NeighbourIndex':
+        """
+        Load an index saved with `save`.
+
+        :param path: Path to the index file.
+        :type path: str
+
+        :raises FileNotFoundError: If the index file does not exist.
+
+        :return: The loaded index.
+        :rtype: NeighbourIndex
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Neighbour index not found: {path}')
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['words'].tolist(), data['vectors'],
+                       data['centroids'], data['offsets'])
+
+    def save(self, path: str):
+        """
+        Save the index to a NumPy .npz file.
+
+        :param path: Path to the index file.
+        :type path: str
+        """
+        with open(path, 'wb') as index_file:
+            np.savez(index_file, words=np.array(self.words),
+                     vectors=self.vectors, centroids=self.centroids,
+                     offsets=self.offsets)
+
+    def query(self, vector: np.ndarray, k: int = 10,
+              n_probe: int = DEFAULT_PROBES,
+              exclude: Optional[str] = None) -> Neighbours:
+        """
+        Find the words most similar to a vector.
+
+        :param vector: The query vector.
+        :type vector: numpy.ndarray
+        :param k: Number of neighbours to return. Defaults to 10.
+        :type k: int, optional
+        :param n_probe: Number of clusters searched, more is slower but more accurate. Defaults to 8.
+        :type n_probe: int, optional
+        :param exclude: A word left out of the results. Defaults to None.
+        :type exclude: str, optional
+
+        :return: Pairs of (word, cosine distance), closest first.
+        :rtype: List[Tuple[str, float]]
+        """
+        query = _normalize(vector)
+        n_probe = min(n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)
+        candidates = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1])
+            for i in lists[:n_probe]])
+        if exclude is not None and exclude in self.index:
+            candidates = candidates[candidates != self.index[exclude]]
+        if len(candidates) == 0:
+            return []
+
+        similarities = self.vectors[candidates] @ query
+        k = min(k, len(candidates))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+
+        return [(self.words[candidates[i]], float(1 - similarities[i]))
+                for i in best]
+
+    def query_word(self, word: str, k: int = 10,
+                   n_probe: int = DEFAULT_PROBES) -> Neighbours:
+        """
+        Find the words most similar to an indexed word.
+
+        :param word: The query word.
+        :type word: str
+        :param k: Number of neighbours to return. Defaults to 10.
+        :type k: int, optional
+        :param n_probe: Number of clusters searched. Defaults to 8.
+        :type n_probe: int, optional
+
+        :return: Pairs of (word, cosine distance), closest first, or an empty list if the word is not indexed.
+        :rtype: List[Tuple[str, float]]
+        """
+        if word not in self.index:
+            return []
+        return self.query(self.vectors[self.index[word]], k=k,
+                          n_probe=n_probe, exclude=word)
+
+
+def build_index(database_path: str, output_path: Optional[str] = None,
+                n_lists: Optional[int] = None) -> str:
+    """
+    Build the neighbour index for a vector database and save it next to it.
+
+    :param database_path: Path to the vectors.db database file.
+    :type database_path: str
+    :param output_path: Path to the index file. Defaults to index_path(database_path).
+    :type output_path: str, optional
+    :param n_lists: Number of clusters. Defaults to the square root of the number of words.
+    :type n_lists: int, optional
+
+    :return: Path to the saved index.
+    :rtype: str
+    """
+    from .processing import DatabaseManager  # pylint: disable=import-outside-toplevel
+
+    vectors = DatabaseManager(database_path).load_vectors()
+    output_path = output_path or index_path(database_path)
+    NeighbourIndex.build(vectors.words, vectors.matrix,
+                         n_lists=n_lists).save(output_path)
+    return output_path
+
+
+def _parse_args(argv=None):
+    from .config import read_config  # pylint: disable=import-outside-toplevel
+
+    config = read_config()
+    parser = argparse.ArgumentParser(
+        prog='python -m datpl.neighbours',
+        description='Build or query the nearest-neighbour index.')
+    parser.add_argument('--database-path', type=str,
+                        default=config.get('Database', 'database_path',
+                                           fallback=None))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Build the index.')
+    build.add_argument('--lists', type=int, help='Number of clusters.')
+
+    query = commands.add_parser('query', help='Show the closest words.')
+    query.add_argument('words', nargs='+')
+    query.add_argument('--k', type=int, default=10)
+    query.add_argument('--probes', type=int, default=DEFAULT_PROBES)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+
+    if args.command == 'build':
+        print(f'Index saved in '
+              f'{build_index(args.database_path, n_lists=args.lists)}.')
+        return 0
+
+    index = NeighbourIndex.load(index_path(args.database_path))
+    for word in args.words:
+        neighbours = index.query_word(word, k=args.k, n_probe=args.probes)
+        print(f'{word}: ' + ', '.join(f'{neighbour} ({distance:.3f})'
+                                      for neighbour, distance in neighbours))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""Out-of-core scoring of data files larger than the available memory.
+
+    python -m datpl.out_of_core panel.csv --output results/panel.csv \\
+        --memory-budget 256
+
+The input is read in blocks of rows. Each block is validated and encoded as
+word IDs, which are appended to files in a temporary work directory. The
+responses are then scored block by block into memory-mapped distance and
+score arrays, and the results file is written from those arrays. Only one
+block is held in memory at a time. The block size is derived from the memory
+budget, so peak memory does not grow with the size of the input.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from . import xlsx
+from .analysis import DatResults
+from .config import read_config
+from .data_io import (
+    SUPPORTED_FILE_TYPES,
+    _generate_column_names,
+    _set_unique_id_column,
+    _stamp
+)
+from .decorators import instrument
+from .instrumentation import gauge
+from .pipeline import DatPipeline
+from .processing import EncodedResponses
+
+
+DEFAULT_MEMORY_BUDGET = 256 * 2 ** 20
+
+# rough per-participant cost of the pandas and Python objects of one row
+ROW_OVERHEAD_BYTES = 1024
+
+
+def block_size_for(memory_budget: int, minimum_words: int,
+                   words_per_row: int = 10, dimension: int = 100) -> int:
+    """
+    Compute how many participants fit in one block under a memory budget.
+
+    The estimate covers the raw row, the vectors read from the database for
+    the scored words, the gathered unit vectors and pairwise similarities of
+    the scoring step, and the formatted CSV output.
+
+    :param memory_budget: Memory available to one block, in bytes.
+    :type memory_budget: int
+    :param minimum_words: The minimum number of words used to compute DAT scores.
+    :type minimum_words: int
+    :param words_per_row: Number of words given by each participant. Defaults to 10.
+    :type words_per_row: int, optional
+    :param dimension: Length of the word vectors. Defaults to 100.
+    :type dimension: int, optional
+
+    :return: Number of participants per block, at least 1.
+    :rtype: int
+    """
+    pairs = minimum_words * (minimum_words - 1) // 2
+    # each scored word may be distinct: its vector is held as the fetched
+    # bytes, the dense matrix, the unit vector and the gathered copy
+    per_participant = (ROW_OVERHEAD_BYTES + 64 * words_per_row
+                       + 8 * minimum_words * (5 * dimension + minimum_words)
+                       + 48 * pairs)
+    return max(1, memory_budget // per_participant)
+
+
+def _read_header(path_to_file: str, file_extension: str,
+                 csv_separator: str, work_dir: Optional[str]) -> List[str]:
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    if file_extension == '.csv':
+        return list(pd.read_csv(path_to_file, sep=csv_separator, dtype=str,
+                                nrows=0).columns)
+    return next(xlsx.iter_rows(path_to_file, spill_strings=True,
+                               work_dir=work_dir), [])
+
+
+def iter_blocks(path_to_file: str, block_size: int, csv_separator: str = ';',
+                id_column=0,
+                work_dir: Optional[str] = None
+                ) -> Iterator[Dict[str, List[str]]]:
+    """
+    Read a data file in blocks of rows, in the format returned by read_data.
+
+    The shared strings table of a workbook is kept in a temporary file, so
+    memory use does not grow with the number of distinct values.
+
+    :param path_to_file: Path to the file containing the data.
+    :type path_to_file: str
+    :param block_size: Number of rows per block.
+    :type block_size: int
+    :param csv_separator: Separator for CSV files. Defaults to ';'.
+    :type csv_separator: str, optional
+    :param id_column: The name or index of the column containing unique IDs. Defaults to 0.
+    :type id_column: str or int, optional
+    :param work_dir: Directory for the temporary files of XLSX input. Defaults to the system temporary directory.
+    :type work_dir: str, optional
+
+    :raises ValueError: If the file type is not supported.
+
+    :return: Dictionaries of participants' word sequences.
+    :rtype: Iterator[Dict[str, List[str]]]
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    file_extension = os.path.splitext(path_to_file)[1]
+    if file_extension not in SUPPORTED_FILE_TYPES:
+        raise ValueError(
+            f'Unsupported file type. Supported types are '
+            f'{", ".join(SUPPORTED_FILE_TYPES)}')
+
+    if file_extension == '.csv':
+        chunks = pd.read_csv(path_to_file, sep=csv_separator, dtype=str,
+                             chunksize=block_size)
+    else:
+        rows = xlsx.iter_rows(path_to_file, spill_strings=True,
+                              work_dir=work_dir)
+        header = next(rows)
+        chunks = (_xlsx_block(header, block)
+                  for block in iter(lambda: list(islice(rows, block_size)),
+                                    []))
+
+    for df in chunks:
+        df = _set_unique_id_column(df, id_column)
+        yield dict(zip(df.index.tolist(), df.fillna('').values.tolist()))
+
+
+def _xlsx_block(header: List[str], rows: List[List[str]]):
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    # cells beyond the header are kept, as in read_data
+    width = max(len(header), max(len(row) for row in rows))
+    return pd.DataFrame([row + [''] * (width - len(row)) for row in rows],
+                        columns=xlsx.column_names(header, width), dtype=str)
+
+
+def _window(path: str, dtype, start: int, rows: int, columns: int = 1,
+            mode: str = 'r') -> np.ndarray:
+    """Map rows [start, start + rows) of a file holding a 2D array."""
+    dtype = np.dtype(dtype)
+    if rows == 0:
+        return np.empty((0, columns), dtype=dtype)
+    # a small mapping per block keeps its pages out of the resident set
+    # once it is released
+    return np.memmap(path, dtype=dtype, mode=mode,
+                     offset=start * columns * dtype.itemsize,
+                     shape=(rows, columns))
+
+
+class _Intermediates:
+    """Files of the work directory holding the encoded responses and results."""
+
+    def __init__(self, work_dir: str):
+        self.ids = os.path.join(work_dir, 'ids.jsonl')
+        self.counts = os.path.join(work_dir, 'counts.i32')
+        self.word_ids = os.path.join(work_dir, 'word_ids.i32')
+        self.distances = os.path.join(work_dir, 'distances.f32')
+        self.scores = os.path.join(work_dir, 'scores.f64')
+
+
+@instrument('score_out_of_core')
+def score_out_of_core(path_to_file: str, pipeline: DatPipeline,
+                      output_path: str,
+                      memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                      work_dir: Optional[str] = None,
+                      csv_separator: str = ';', id_column=0,
+                      block_size: Optional[int] = None) -> int:
+    """
+    Score a data file block by block, spilling intermediates to disk.
+
+    The vocabulary index of the pipeline is a fixed cost on top of the budget.
+    Use a pipeline created with preload=False, so the word vectors are read
+    per block instead of being held in memory.
+
+    :param path_to_file: Path to the file containing the data.
+    :type path_to_file: str
+    :param pipeline: The pipeline used to validate and score the responses.
+    :type pipeline: DatPipeline
+    :param output_path: Path to the results CSV file.
+    :type output_path: str
+    :param memory_budget: Memory available to one block, in bytes. Defaults to 256 MiB.
+    :type memory_budget: int, optional
+    :param work_dir: Directory for the memory-mapped intermediates, on local disk. Defaults to the system temporary directory.
+    :type work_dir: str, optional
+    :param csv_separator: Separator for CSV files. Defaults to ';'.
+    :type csv_separator: str, optional
+    :param id_column: The name or index of the column containing unique IDs. Defaults to 0.
+    :type id_column: str or int, optional
+    :param block_size: Number of participants per block. Defaults to a size derived from the memory budget.
+    :type block_size: int, optional
+
+    :return: Number of participants scored.
+    :rtype: int
+    """
+    size = pipeline.minimum_words
+    if block_size is None:
+        file_extension = os.path.splitext(path_to_file)[1]
+        words_per_row = max(1, len(_read_header(
+            path_to_file, file_extension, csv_separator, work_dir)) - 1)
+        dimension = pipeline.db.get_word_vectors(
+            pipeline.processor.words[:1]).matrix.shape[1]
+        block_size = block_size_for(memory_budget, size, words_per_row,
+                                    dimension)
+    gauge('out_of_core.block_size', block_size)
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        files = _Intermediates(tmp_dir)
+        participants = _spill_encoded(path_to_file, pipeline, files,
+                                      block_size, csv_separator, id_column,
+                                      tmp_dir)
+        _score_blocks(pipeline, files, participants, block_size)
+        _write_results(files, participants, size, output_path, block_size,
+                       pipeline.db.fingerprint())
+
+    return participants
+
+
+def _spill_encoded(path_to_file, pipeline, files, block_size,
+                   csv_separator, id_column, work_dir) -> int:
+    """Validate the input block by block, appending word IDs to disk."""
+    participants = 0
+    with open(files.ids, 'w', encoding='utf-8') as ids_file, \
+            open(files.counts, 'wb') as counts_file, \
+            open(files.word_ids, 'wb') as word_ids_file:
+        for block in iter_blocks(path_to_file, block_size,
+                                 csv_separator, id_column, work_dir):
+            encoded = pipeline.processor.encode_dataset(block)
+            ids_file.writelines(json.dumps(p_id) + '\n'
+                                for p_id in encoded.ids)
+            encoded.counts.astype(np.int32).tofile(counts_file)
+            encoded.word_ids.tofile(word_ids_file)
+            participants += len(encoded)
+    return participants
+
+
+def _score_blocks(pipeline, files, participants, block_size):
+    """Score the encoded responses into memory-mapped result arrays."""
+    pairs = max(1, pipeline.minimum_words * (pipeline.minimum_words - 1) // 2)
+    for path, itemsize in ((files.distances, 4 * pairs), (files.scores, 8)):
+        with open(path, 'wb') as result_file:
+            result_file.truncate(participants * itemsize)
+
+    start_word = 0
+    for start in range(0, participants, block_size):
+        rows = min(block_size, participants - start)
+        offsets = np.zeros(rows + 1, dtype=np.int64)
+        np.cumsum(_window(files.counts, np.int32, start, rows)[:, 0],
+                  out=offsets[1:])
+        words = int(offsets[-1])
+
+        encoded = EncodedResponses(
+            np.arange(rows), offsets,
+            np.array(_window(files.word_ids, np.int32, start_word, words)[:, 0]),
+            pipeline.processor.words, {})
+        results = pipeline.computer.dataset_compute_dat_score_encoded(encoded)
+
+        distances = _window(files.distances, np.float32, start, rows, pairs,
+                            mode='r+')
+        distances[:, :results.distances.shape[1]] = results.distances
+        distances.flush()
+        scores = _window(files.scores, np.float64, start, rows, mode='r+')
+        scores[:, 0] = results.scores
+        scores.flush()
+        del distances, scores
+        start_word += words
+
+
+def _write_results(files, participants, size, output_path, block_size,
+                   fingerprint):
+    """Write the results CSV from the memory-mapped arrays, block by block."""
+    pairs = size * (size - 1) // 2
+    columns = _generate_column_names(size)
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    with open(files.ids, 'r', encoding='utf-8') as ids_file, \
+            open(output_path, 'w', encoding='utf-8', newline='') as output:
+        for start in range(0, max(participants, 1), block_size):
+            ids = [json.loads(line) for line in islice(ids_file, block_size)]
+            block = DatResults(
+                ids,
+                np.array(_window(files.distances, np.float32, start,
+                                 len(ids), max(pairs, 1))[:, :pairs]),
+                np.array(_window(files.scores, np.float64, start,
+                                 len(ids))[:, 0]))
+            _stamp(block.to_dataframe(columns), fingerprint).to_csv(
+                output, index=False, header=start == 0)
+
+
+def _parse_args(argv=None):
+    config = read_config()
+
+    parser = argparse.ArgumentParser(
+        prog='python -m datpl.out_of_core',
+        description='Score a data file larger than the available memory.')
+    parser.add_argument('input', help='Data file to score.')
+    parser.add_argument('--output', type=str, required=True,
+                        help='Path to the results CSV file.')
+    parser.add_argument('--database-path', type=str,
+                        default=config.get('Database', 'database_path',
+                                           fallback=None))
+    parser.add_argument('--memory-budget', type=int,
+                        default=config.getint(
+                            'OutOfCore', 'memory_budget_mb',
+                            fallback=DEFAULT_MEMORY_BUDGET // 2 ** 20),
+                        help='Memory budget of one block, in MiB.')
+    parser.add_argument('--work-dir', type=str,
+                        default=config.get('OutOfCore', 'work_dir',
+                                           fallback=None) or None,
+                        help='Directory for the intermediate files.')
+    parser.add_argument('--minimum-words', type=int, default=7)
+    parser.add_argument('--csv-separator', type=str, default=';')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+
+    pipeline = DatPipeline(args.database_path,
+                           minimum_words=args.minimum_words, preload=False)
+    participants = score_out_of_core(
+        args.input, pipeline, args.output,
+        memory_budget=args.memory_budget * 2 ** 20,
+        work_dir=args.work_dir, csv_separator=args.csv_separator)
+    pipeline.close()
+
+    print(f'Scored {participants} participants. '
+          f'CSV file saved in {args.output}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
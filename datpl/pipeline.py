@@ -0,0 +1,167 @@
+import threading
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+
+from .analysis import DatComputer, DatResults
+from .cache import open_result_cache
+from .data_io import read_data, save_results
+from .decorators import instrument
+from .processing import DatabaseManager, DataProcessor
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# progress(validated, scored, total) - number of participants in each stage
+ProgressCallback = Callable[[int, int, int], None]
+
+
+class ScoringCancelled(Exception):
+    """Raised when a scoring run is cancelled before it completes."""
+
+
+class DatPipeline:
+    def __init__(self, database_path: str, minimum_words: int = 7,
+                 preload: bool = True, use_cache: bool = False,
+                 threads: int = 1,
+                 memory_budget: Optional[int] = None):
+        """
+        Initialize DatPipeline instance.
+
+        The pipeline keeps the vocabulary and, when preloaded, the word vectors
+        in memory so that consecutive scoring jobs skip the database scan.
+
+        :param database_path: Path to the vectors.db database file.
+        :type database_path: str
+        :param minimum_words: The minimum number of words used to compute DAT scores. Defaults to 7.
+        :type minimum_words: int, optional
+        :param preload: Whether to load all word vectors into memory. Defaults to True.
+        :type preload: bool, optional
+        :param use_cache: Whether to reuse results stored in the result cache next to the database. Defaults to False.
+        :type use_cache: bool, optional
+        :param threads: Number of threads scoring batches of participants. Defaults to 1.
+        :type threads: int, optional
+        :param memory_budget: Bytes available to the work buffers of batched scoring. Defaults to None (DatComputer's default).
+        :type memory_budget: int, optional
+        """
+        self.db = DatabaseManager(database_path)
+        if preload:
+            self.db.load_vectors()
+
+        self.processor = DataProcessor(words=self.db.get_words())
+        self.computer = DatComputer(self.db, workers=threads)
+        if memory_budget is not None:
+            self.computer.memory_budget = memory_budget
+        self.computer.minimum_words = minimum_words
+        self.cache = open_result_cache(self.db) if use_cache else None
+
+    @property
+    def minimum_words(self) -> int:
+        """
+        Get the minimum number of words used to compute DAT scores.
+
+        :return: The minimum number of words.
+        :rtype: int
+        """
+        return self.computer.minimum_words
+
+    @instrument('pipeline.score')
+    def score(self, dataset: Dict[str, List[str]],
+              chunk_size: int = DEFAULT_CHUNK_SIZE,
+              progress: Optional[ProgressCallback] = None,
+              cancel_event: Optional[threading.Event] = None
+              ) -> DatResults:
+        """
+        Validate and score a dataset of participants' answers.
+
+        The dataset is processed in chunks. After each chunk is validated and
+        after it is scored, the progress callback receives the number of
+        validated and scored participants and the dataset size. The run stops
+        between chunks once the cancel event is set.
+
+        :param dataset: A dictionary of participants' word sequences.
+        :type dataset: Dict[str, List[str]]
+        :param chunk_size: Number of participants per chunk. Defaults to 1000.
+        :type chunk_size: int, optional
+        :param progress: Callback reporting progress. Defaults to None.
+        :type progress: Callable[[int, int, int], None], optional
+        :param cancel_event: Event that cancels the run when set. Defaults to None.
+        :type cancel_event: threading.Event, optional
+
+        :raises ValueError: If the chunk size is smaller than 1.
+        :raises ScoringCancelled: If the cancel event is set before the run completes.
+
+        :return: The results of all participants, indexable by participant ID.
+        :rtype: DatResults
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk size must be greater than 0')
+
+        total = len(dataset)
+        validated = 0
+        scored = 0
+        parts = []
+        items = iter(dataset.items())
+
+        while validated < total:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ScoringCancelled(
+                    f'Scoring cancelled after {scored} of {total} '
+                    f'participants.')
+
+            chunk = dict(islice(items, chunk_size))
+            if self.cache is None:
+                # validated words are kept as integer IDs, not strings
+                encoded_chunk = self.processor.encode_dataset(chunk)
+            else:
+                processed_chunk = self.processor.process_dataset(chunk)
+            validated += len(chunk)
+            if progress is not None:
+                progress(validated, scored, total)
+
+            if self.cache is None:
+                parts.append(self.computer.dataset_compute_dat_score_encoded(
+                    encoded_chunk))
+            else:
+                valid_responses = self.processor.extract_valid_words(
+                    processed_chunk)
+                parts.append(self.computer.dataset_compute_dat_score(
+                    valid_responses, cache=self.cache))
+            scored = validated
+            if progress is not None:
+                progress(validated, scored, total)
+
+        if not parts:
+            return self.computer.dataset_compute_dat_score({})
+        return DatResults.concat(parts)
+
+    def score_file(self, path_to_file: str, csv_separator: str = ';',
+                   id_column=0, output_path: Optional[str] = None) -> str:
+        """
+        Read, score and save the results for a single data file.
+
+        :param path_to_file: Path to the file containing the data.
+        :type path_to_file: str
+        :param csv_separator: Separator for CSV files. Defaults to ';'.
+        :type csv_separator: str, optional
+        :param id_column: The name or index of the column containing unique IDs. Defaults to 0.
+        :type id_column: str or int, optional
+        :param output_path: Path to the CSV file. Defaults to a time-stamped file in the 'results' folder.
+        :type output_path: str, optional
+
+        :return: The path to the saved CSV file.
+        :rtype: str
+        """
+        dataset = read_data(path_to_file, csv_separator=csv_separator,
+                            id_column=id_column)
+        results = self.score(dataset)
+        return save_results(results, minimum_words=self.minimum_words,
+                            output_path=output_path,
+                            fingerprint=self.db.fingerprint())
+
+    def close(self):
+        """
+        Close the database connection and the result cache.
+        """
+        self.db.disconnect()
+        if self.cache is not None:
+            self.cache.close()
@@ -1,12 +1,168 @@
+import hashlib
+import os
 import sqlite3
+import threading
 import re
+from array import array
 from typing import Tuple, Optional, List, Dict
 from collections import OrderedDict
 
 import numpy as np
 
+from .decorators import instrument
+from .instrumentation import count
+from .integrity import Metadata, check_shape, read_metadata, verify_database
+from .neighbours import NeighbourIndex, index_path
+
 ParsedWords = Dict[str, List[str]]
 
+# SQLite limits the number of parameters of a single query
+QUERY_BATCH_SIZE = 500
+
+
+class WordVectors:
+    def __init__(self, words: List[str], matrix: np.ndarray):
+        """
+        Initialize WordVectors instance - an in-memory copy of the vector store.
+
+        :param words: The words stored in the database, in row order.
+        :type words: List[str]
+        :param matrix: A 2D array holding one word vector per row.
+        :type matrix: numpy.ndarray
+        """
+        self.words = words
+        self.matrix = matrix
+        self.index = {word: i for i, word in enumerate(words)}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.index
+
+    def get(self, word: str) -> Optional[np.ndarray]:
+        """
+        Return the vector for a given word.
+
+        :param word: The word to retrieve the vector for.
+        :type word: str
+
+        :return: The word vector as a NumPy array if found, else None.
+        :rtype: Optional[numpy.ndarray]
+        """
+        row = self.index.get(word)
+        if row is None:
+            return None
+        return self.matrix[row]
+
+    def ids(self, words: List[str]) -> np.ndarray:
+        """
+        Return the row numbers of the given words.
+
+        :param words: The words to look up.
+        :type words: List[str]
+
+        :raises ValueError: If a word is not in the store.
+
+        :return: An int32 array with the row of each word.
+        :rtype: numpy.ndarray
+        """
+        try:
+            return np.array([self.index[word] for word in words],
+                            dtype=np.int32)
+        except KeyError as exc:
+            raise ValueError(f'No vector for word: {exc.args[0]}') from exc
+
+    def subset(self, words: List[str]) -> 'WordVectors':
+        """
+        Return a compact copy holding only the given words, in the given order.
+
+        Words missing from the store are skipped.
+
+        :param words: The words to keep.
+        :type words: List[str]
+
+        :return: The vectors of the given words.
+        :rtype: WordVectors
+        """
+        words = [word for word in words if word in self.index]
+        return WordVectors(words, self.matrix[self.ids(words)])
+
+    def normalized(self) -> 'WordVectors':
+        """
+        Return a copy with every vector scaled to unit length.
+
+        :return: The unit-length vectors.
+        :rtype: WordVectors
+        """
+        matrix = np.asarray(self.matrix, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        return WordVectors(self.words, matrix)
+
+
+
+class EncodedResponses:
+    def __init__(self, ids: List, offsets: np.ndarray, word_ids: np.ndarray,
+                 vocabulary: List[str], invalid_words: Dict[str, List[str]]):
+        """
+        Initialize EncodedResponses instance - validated responses as word IDs.
+
+        The valid words of participant 'i' are
+        vocabulary[word_ids[offsets[i]:offsets[i + 1]]] (a CSR-style layout).
+
+        :param ids: Participant IDs.
+        :type ids: List
+        :param offsets: An int32 array of N + 1 offsets into word_ids.
+        :type offsets: numpy.ndarray
+        :param word_ids: An int32 array of the valid words as positions in the vocabulary.
+        :type word_ids: numpy.ndarray
+        :param vocabulary: The list of valid words the IDs refer to.
+        :type vocabulary: List[str]
+        :param invalid_words: Invalid words of the participants who gave any.
+        :type invalid_words: Dict[str, List[str]]
+        """
+        self.ids = np.asarray(ids, dtype=object)
+        self.offsets = offsets
+        self.word_ids = word_ids
+        self.vocabulary = vocabulary
+        self.invalid_words = invalid_words
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        Get the number of valid words of each participant.
+
+        :return: An array with one count per participant.
+        :rtype: numpy.ndarray
+        """
+        return np.diff(self.offsets)
+
+    def valid_words(self, row: int) -> List[str]:
+        """
+        Decode the valid words of a single participant.
+
+        :param row: Position of the participant.
+        :type row: int
+
+        :return: The valid words.
+        :rtype: List[str]
+        """
+        return [self.vocabulary[word_id] for word_id in
+                self.word_ids[self.offsets[row]:self.offsets[row + 1]]]
+
+    def decode(self) -> Dict[str, List[str]]:
+        """
+        Decode all responses into the format returned by DataProcessor.extract_valid_words.
+
+        :return: A dictionary containing participant IDs and their valid words.
+        :rtype: Dict[str, List[str]]
+        """
+        return {p_id: self.valid_words(row)
+                for row, p_id in enumerate(self.ids)}
 
 
 class DatabaseManager:
@@ -14,32 +170,81 @@ class DatabaseManager:
         """
         Initialize  DatabaseManager instance.
 
+        The manager can be shared by threads. Each thread reads the database
+        through its own connection, and the loaded vector store is never
+        modified, so it is read without locking.
+
+        The first connection reads the integrity metadata and checks the row
+        count and the vector size against it.
+
         :param db_path: Path to the SQLite database file.
         :type db_path: str
         """
         self.db_path = db_path
-        self.connection = None
+        self._local = threading.local()
+        self.vectors: Optional[WordVectors] = None
+        self.neighbour_index: Optional[NeighbourIndex] = None
+        self._metadata: Optional[Metadata] = None
+        self._metadata_read = False
+        self._metadata_lock = threading.Lock()
+
+    @property
+    def connection(self) -> Optional[sqlite3.Connection]:
+        """
+        Get the database connection of the current thread.
+
+        :return: The connection, or None if the thread is not connected.
+        :rtype: Optional[sqlite3.Connection]
+        """
+        return getattr(self._local, 'connection', None)
+
+    @connection.setter
+    def connection(self, value: Optional[sqlite3.Connection]):
+        """
+        Set the database connection of the current thread.
+
+        :param value: The connection, or None.
+        :type value: Optional[sqlite3.Connection]
+        """
+        self._local.connection = value
 
     def connect(self):
         """
         Establish a connection to the SQLite database.
 
         :raises ConnectionError: If there is an error connecting to the database.
+        :raises ValueError: If the database does not match its integrity metadata.
         """
         try:
             self.connection = sqlite3.connect(self.db_path)
         except sqlite3.Error as exc:
             raise ConnectionError(
                 f"Error connecting to the database: {str(exc)}") from exc
+        if not self._metadata_read:
+            self._read_metadata()
+
+    def _read_metadata(self):
+        with self._metadata_lock:
+            if self._metadata_read:
+                return
+            metadata = read_metadata(self.connection)
+            count('sql.queries')
+            if metadata is not None:
+                # cheap check of the row count and the vector size
+                verify_database(self.connection, metadata)
+                count('sql.queries', 2)
+            self._metadata = metadata
+            self._metadata_read = True
 
     def disconnect(self):
         """
-        Close the connection to the database.
+        Close the connection of the current thread to the database.
         """
         if self.connection:
             self.connection.close()
             self.connection = None
 
+    @instrument('get_words')
     def get_words(self) -> List[str]:
         """
         Retrieve and return the list of words from the vector database.
@@ -47,11 +252,15 @@ class DatabaseManager:
         :return: A list of words stored in the database.
         :rtype: List[str]
         """
+        if self.vectors is not None:
+            return list(self.vectors.words)
+
         if not self.connection:
             self.connect()
 
         cursor = self.connection.cursor()
         cursor.execute('SELECT word FROM vectors')
+        count('sql.queries')
         words = [row[0] for row in cursor.fetchall()]
 
         self.disconnect()
@@ -67,10 +276,17 @@ class DatabaseManager:
         :return: The word vector as a NumPy array if found, else None.
         :rtype: Optional[numpy.ndarray]
         """
+        # called once per word, so lookups served from memory are not
+        # counted; bulk reads go through get_word_vectors
+        if self.vectors is not None:
+            return self.vectors.get(word)
+        count('vector_store.misses')
+
         if not self.connection:
             self.connect()
         cursor = self.connection.cursor()
         cursor.execute('''SELECT vector FROM vectors WHERE word=?''', (word,))
+        count('sql.queries')
         result = cursor.fetchone()
 
         if result is not None:
@@ -79,6 +295,158 @@ class DatabaseManager:
 
         return None
 
+    @instrument('get_word_vectors')
+    def get_word_vectors(self, words: List[str]) -> WordVectors:
+        """
+        Retrieve the vectors of many words in one bulk read.
+
+        Served from memory when the vector store is loaded, otherwise read with
+        a few 'IN' queries instead of one query per word.
+
+        :param words: The words to retrieve the vectors for.
+        :type words: List[str]
+
+        :return: A compact store holding the words found in the database, in the given order.
+        :rtype: WordVectors
+        """
+        words = list(dict.fromkeys(words))
+
+        if self.vectors is not None:
+            count('vector_store.hits', len(words))
+            return self.vectors.subset(words)
+        count('vector_store.misses', len(words))
+
+        if not self.connection:
+            self.connect()
+        cursor = self.connection.cursor()
+
+        found = {}
+        for start in range(0, len(words), QUERY_BATCH_SIZE):
+            batch = words[start:start + QUERY_BATCH_SIZE]
+            cursor.execute(
+                f'SELECT word, vector FROM vectors '
+                f'WHERE word IN ({",".join("?" * len(batch))})', batch)
+            count('sql.queries')
+            found.update(cursor.fetchall())
+
+        found_words = [word for word in words if word in found]
+        if not found_words:
+            return WordVectors([], np.empty((0, 0)))
+        matrix = np.frombuffer(b''.join(found[word] for word in found_words))
+        return WordVectors(found_words,
+                           matrix.reshape(len(found_words), -1))
+
+    @instrument('load_vectors')
+    def load_vectors(self) -> WordVectors:
+        """
+        Load the whole vector store into memory.
+
+        Once loaded, words and vectors are served from memory and
+        no further queries are sent to the database.
+
+        :return: The in-memory vector store.
+        :rtype: WordVectors
+        """
+        metadata = self.metadata()
+        # the metadata may have been read earlier, or in another thread
+        if not self.connection:
+            self.connect()
+
+        cursor = self.connection.cursor()
+        cursor.execute('SELECT word, vector FROM vectors')
+        count('sql.queries')
+        rows = cursor.fetchall()
+
+        words = [row[0] for row in rows]
+        if rows:
+            matrix = np.frombuffer(b''.join(row[1] for row in rows))
+            matrix = matrix.reshape(len(rows), -1)
+        else:
+            matrix = np.empty((0, 0))
+
+        self.disconnect()
+        if metadata is not None:
+            # all rows are read anyway, so the check is free here
+            check_shape(metadata, len(rows), matrix.shape[1] * matrix.itemsize)
+        self.vectors = WordVectors(words, matrix)
+        return self.vectors
+
+    def metadata(self) -> Optional[Metadata]:
+        """
+        Read the integrity metadata written when the database was built.
+
+        The metadata is read and checked once, on the first connection, and
+        kept for the lifetime of the manager.
+
+        :return: The metadata fields, or None for a database built without them.
+        :rtype: Optional[Dict[str, str]]
+        """
+        if not self._metadata_read:
+            if not self.connection:
+                self.connect()
+            else:
+                self._read_metadata()
+        return self._metadata
+
+    def verify(self, full: bool = False) -> bool:
+        """
+        Check the database against its integrity metadata.
+
+        By default only the row count and the vector size are compared, which
+        takes two indexed queries. A full check recomputes the checksum of
+        all rows.
+
+        :param full: Whether to recompute the checksum of all rows. Defaults to False.
+        :type full: bool, optional
+
+        :raises ValueError: If the database does not match its metadata.
+
+        :return: True if the database was verified, False if it has no metadata.
+        :rtype: bool
+        """
+        metadata = self.metadata()
+        if metadata is None:
+            return False
+        if not self.connection:
+            self.connect()
+        verify_database(self.connection, metadata, full=full)
+        return True
+
+    def fingerprint(self) -> str:
+        """
+        Return a fingerprint identifying the vectors stored in the database.
+
+        The fingerprint is read from the integrity metadata. For databases
+        built without metadata it is derived from the file's size and
+        modification time, so it changes whenever the file is rebuilt.
+
+        :return: A hexadecimal digest.
+        :rtype: str
+        """
+        metadata = self.metadata()
+        if metadata is not None:
+            return metadata['fingerprint']
+
+        stat = os.stat(self.db_path)
+        return hashlib.sha256(
+            f'{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()
+
+    def load_neighbour_index(self, path: Optional[str] = None) -> NeighbourIndex:
+        """
+        Load the nearest-neighbour index built for the database.
+
+        :param path: Path to the index file. Defaults to the '.ivf.npz' file next to the database.
+        :type path: str, optional
+
+        :raises FileNotFoundError: If the index file does not exist.
+
+        :return: The loaded index.
+        :rtype: NeighbourIndex
+        """
+        self.neighbour_index = NeighbourIndex.load(
+            path or index_path(self.db_path))
+        return self.neighbour_index
+
 
 class DataProcessor:
     def __init__(self, words: List[str]):
@@ -90,6 +458,28 @@ class DataProcessor:
         """
         self.words = words
 
+    @property
+    def words(self) -> List[str]:
+        """
+        Get the list of valid words.
+
+        :return: The list of valid words.
+        :rtype: List[str]
+        """
+        return self._words
+
+    @words.setter
+    def words(self, value: List[str]):
+        """
+        Set the list of valid words and rebuild the lookup set used for validation.
+
+        :param value: A list of valid Polish words.
+        :type value: List[str]
+        """
+        self._words = value
+        # word -> position in the list, also used as the word ID when encoding
+        self._vocabulary = {word: i for i, word in enumerate(value)}
+
     @staticmethod
     def clean(word: str) -> str:
         """
@@ -121,7 +511,7 @@ class DataProcessor:
         """
         cleaned = self.clean(word)
 
-        if cleaned in self.words:
+        if cleaned in self._vocabulary:
             return cleaned, ''  # valid word
         return '', cleaned  # invalid word
 
@@ -145,6 +535,7 @@ class DataProcessor:
 
         return {'valid_words': valid_list, 'invalid_words': invalid_list}
 
+    @instrument('process_dataset')
     def process_dataset(self, data) -> Dict[str, ParsedWords]:
         """
         Clean and validate a dataset of DAT responses.
@@ -166,6 +557,58 @@ class DataProcessor:
 
         return processed_dataset
 
+    @instrument('encode_dataset')
+    def encode_dataset(self, data) -> EncodedResponses:
+        """
+        Clean and validate a dataset of DAT responses into a compact integer encoding.
+
+        Valid words are stored as their positions in the list of valid words,
+        which avoids keeping a list of strings per participant. Validation
+        follows process_dataset.
+
+        :param data: A dictionary of participants' word sequences, where each participant is identified by a unique key.
+        :type data: Dict[str, List[str]]
+
+        :return: The encoded valid words and a side table of invalid words.
+        :rtype: EncodedResponses
+        """
+        offsets = array('i', [0])
+        word_ids = array('i')
+        invalid_words = {}
+
+        for p_id, response in data.items():
+            invalid = []
+            for word in OrderedDict.fromkeys(response):
+                cleaned = self.clean(word)
+                word_id = self._vocabulary.get(cleaned)
+                if word_id is not None:
+                    word_ids.append(word_id)
+                elif cleaned:
+                    invalid.append(cleaned)
+            offsets.append(len(word_ids))
+            if invalid:
+                invalid_words[p_id] = invalid
+
+        return EncodedResponses(list(data),
+                                np.frombuffer(offsets, dtype=np.int32),
+                                np.frombuffer(word_ids, dtype=np.int32),
+                                self.words, invalid_words)
+
+    @staticmethod
+    def collect_vocabulary(dataset: Dict[str, ParsedWords]) -> List[str]:
+        """
+        Collect the distinct valid words used across the processed dataset.
+
+        :param dataset: The processed dataset containing valid and invalid words.
+        :type dataset: Dict
+
+        :return: The distinct valid words, in order of first appearance.
+        :rtype: List[str]
+        """
+        return list(OrderedDict.fromkeys(
+            word for response in dataset.values()
+            for word in response['valid_words']))
+
     @staticmethod
     def extract_valid_words(
             dataset: Dict[str, ParsedWords]) -> Dict[str, List[str]]:
@@ -0,0 +1,539 @@
+"""Streaming reader for XLSX workbooks.
+
+The first worksheet is parsed directly from the XML in the workbook archive,
+one row at a time, without openpyxl cell objects or a pandas DataFrame.
+Cell values are returned as strings, like `pd.read_excel(dtype=str)`. Cells
+with a date or time number format are converted as openpyxl does, e.g. to
+'2020-01-02 00:00:00', '12:30:00' or '1 day, 2:00:00'. Unlike openpyxl,
+characters escaped as '_xHHHH_' in strings are decoded, as Excel shows them.
+
+The shared strings table of a workbook holds every distinct text value, so it
+grows with the input. For workbooks larger than memory it can be spilled to a
+temporary file and read through a memory map.
+
+A columnar copy of each parsed workbook can be cached on disk. It is keyed by
+the modification time and content hash of the workbook, so repeated runs on
+the same file skip the parse.
+"""
+import datetime
+import hashlib
+import io
+import json
+import mmap
+import os
+import posixpath
+import re
+import sys
+import tempfile
+import zipfile
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.etree.ElementTree import fromstring, iterparse
+
+import numpy as np
+
+from .integrity import file_hash
+
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = \
+    '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+CACHE_VERSION = 3
+
+# built-in number formats with dates or times, the others are numbers
+BUILTIN_DATE_FORMATS = {
+    14: 'mm-dd-yy', 15: 'd-mmm-yy', 16: 'd-mmm', 17: 'mmm-yy',
+    18: 'h:mm AM/PM', 19: 'h:mm:ss AM/PM', 20: 'h:mm', 21: 'h:mm:ss',
+    22: 'm/d/yy h:mm', 45: 'mm:ss', 46: '[h]:mm:ss', 47: 'mmss.0',
+}
+
+# quoted text and bracketed sections other than elapsed [h], [m] and [s]
+FORMAT_LITERAL_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+DATE_FORMAT_RE = re.compile(r'(?<![_\\])[dmhysDMHYS]')
+TIMEDELTA_FORMAT_RE = re.compile(
+    r'\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?', re.I)
+
+ESCAPED_CHAR_RE = re.compile(r'_x([0-9A-Fa-f]{4})_')
+
+WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+MAC_EPOCH = datetime.datetime(1904, 1, 1)
+
+# lookups between releasing the pages of a spilled shared strings table
+SPILL_RELEASE_INTERVAL = 2 ** 14
+
+# XML cannot contain NUL characters, so no cell value contains the separator
+CELL_SEPARATOR = '\x00'
+
+Columns = Tuple[List[str], List[List[str]]]
+
+
+def default_cache_dir() -> str:
+    """
+    Return the directory of the workbook cache.
+
+    :return: The DATPL_CACHE_DIR environment variable, or ~/.cache/datpl/xlsx.
+    :rtype: str
+    """
+    return os.environ.get('DATPL_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'datpl', 'xlsx')
+
+
+def _first_sheet_path(archive: zipfile.ZipFile) -> str:
+    """Resolve the archive member holding the first worksheet."""
+    workbook = archive.read('xl/workbook.xml')
+    relationships = archive.read('xl/_rels/workbook.xml.rels')
+
+    sheet = next(element for _, element in iterparse(io.BytesIO(workbook))
+                 if element.tag == f'{MAIN_NS}sheet')
+    relationship_id = sheet.get(f'{REL_NS}id')
+    for _, element in iterparse(io.BytesIO(relationships)):
+        if (element.tag == f'{PACKAGE_REL_NS}Relationship'
+                and element.get('Id') == relationship_id):
+            target = element.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    raise ValueError('The workbook has no worksheet.')
+
+
+def _iter_shared_strings(archive: zipfile.ZipFile) -> Iterator[str]:
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return
+
+    with archive.open('xl/sharedStrings.xml') as xml_file:
+        root = None
+        for event, element in iterparse(xml_file, events=('start', 'end')):
+            if root is None:
+                root = element
+            elif event == 'end' and element.tag == f'{MAIN_NS}si':
+                yield _string_item(element)
+                # parsed items would otherwise stay attached to the root
+                root.clear()
+
+
+class _SpilledStrings:
+    def __init__(self, archive: zipfile.ZipFile,
+                 work_dir: Optional[str] = None):
+        """
+        Initialize _SpilledStrings instance - a shared strings table on disk.
+
+        The UTF-8 encoded strings are written one after another to a
+        temporary file, their end offsets to another. Both are read through
+        memory maps, whose pages are dropped from the resident set every few
+        thousand lookups.
+
+        :param archive: The workbook archive.
+        :type archive: zipfile.ZipFile
+        :param work_dir: Directory of the temporary files. Defaults to the system temporary directory.
+        :type work_dir: str, optional
+        """
+        self._maps = []
+        self._lookups = 0
+        with tempfile.TemporaryFile(dir=work_dir) as data_file, \
+                tempfile.TemporaryFile(dir=work_dir) as ends_file:
+            end = 0
+            ends = array('q')
+            for text in _iter_shared_strings(archive):
+                encoded = text.encode('utf-8')
+                data_file.write(encoded)
+                end += len(encoded)
+                ends.append(end)
+                if len(ends) == 2 ** 16:
+                    ends_file.write(ends.tobytes())
+                    del ends[:]
+            ends_file.write(ends.tobytes())
+
+            # the mappings outlive the files; an empty file cannot be mapped
+            self._data = self._map(data_file)
+            self._ends = self._map(ends_file)
+
+    def _map(self, temporary_file) -> bytes:
+        temporary_file.flush()
+        if not temporary_file.tell():
+            return b''
+        mapping = mmap.mmap(temporary_file.fileno(), 0,
+                            access=mmap.ACCESS_READ)
+        self._maps.append(mapping)
+        return mapping
+
+    def __len__(self) -> int:
+        return len(self._ends) // 8
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < len(self):
+            raise IndexError('shared string index out of range')
+        self._lookups += 1
+        if self._lookups % SPILL_RELEASE_INTERVAL == 0:
+            self._release()
+
+        # the offsets are written by array('q') in the native byte order
+        end = int.from_bytes(self._ends[8 * index:8 * index + 8],
+                             sys.byteorder)
+        start = (int.from_bytes(self._ends[8 * index - 8:8 * index],
+                                sys.byteorder) if index else 0)
+        return self._data[start:end].decode('utf-8')
+
+    def _release(self):
+        # the pages stay in the page cache, but no longer count against
+        # the memory of the process
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            for mapping in self._maps:
+                mapping.madvise(mmap.MADV_DONTNEED)
+
+    def close(self):
+        """
+        Release the memory maps of the table.
+        """
+        for mapping in self._maps:
+            mapping.close()
+        self._maps = []
+        self._data = self._ends = b''
+
+
+def _unescape(text: str) -> str:
+    """Decode characters written as '_xHHHH_', e.g. '_x000D_' for '\\r'."""
+    if '_x' not in text:
+        return text
+
+    def replace(match):
+        code = int(match.group(1), 16)
+        # NUL separates the cells of a cached column, so it is left escaped
+        return chr(code) if code else match.group(0)
+
+    return ESCAPED_CHAR_RE.sub(replace, text)
+
+
+def _string_item(element) -> str:
+    # rich text is split into runs, phonetic hints (rPh) are skipped
+    parts = []
+    for child in element:
+        if child.tag == f'{MAIN_NS}t':
+            parts.append(child.text or '')
+        elif child.tag == f'{MAIN_NS}r':
+            parts.extend(text.text or ''
+                         for text in child.iter(f'{MAIN_NS}t'))
+    return _unescape(''.join(parts))
+
+
+class _DateStyles:
+    def __init__(self, archive: zipfile.ZipFile):
+        """
+        Initialize _DateStyles instance - the cell styles holding dates.
+
+        A style holds dates if its number format contains date or time
+        codes, and durations if it shows elapsed hours, minutes or seconds,
+        e.g. '[h]:mm:ss'. The rules follow openpyxl.
+
+        :param archive: The workbook archive.
+        :type archive: zipfile.ZipFile
+        """
+        self.epoch = WINDOWS_EPOCH
+        self.dates = set()
+        self.durations = set()
+
+        workbook = fromstring(archive.read('xl/workbook.xml'))
+        properties = workbook.find(f'{MAIN_NS}workbookPr')
+        if (properties is not None
+                and properties.get('date1904') in ('1', 'true')):
+            self.epoch = MAC_EPOCH
+
+        if 'xl/styles.xml' not in archive.namelist():
+            return
+        styles = fromstring(archive.read('xl/styles.xml'))
+        formats: Dict[int, str] = dict(BUILTIN_DATE_FORMATS)
+        for number_format in styles.iter(f'{MAIN_NS}numFmt'):
+            formats[int(number_format.get('numFmtId'))] = \
+                number_format.get('formatCode', '')
+
+        cell_styles = styles.find(f'{MAIN_NS}cellXfs')
+        if cell_styles is None:
+            return
+        for index, style in enumerate(cell_styles.iter(f'{MAIN_NS}xf')):
+            code = formats.get(int(style.get('numFmtId', 0)), '')
+            # only the format of positive numbers is looked at
+            code = code.split(';')[0]
+            if DATE_FORMAT_RE.search(FORMAT_LITERAL_RE.sub('', code)):
+                self.dates.add(index)
+            if TIMEDELTA_FORMAT_RE.search(code):
+                self.durations.add(index)
+
+    def format(self, value: str, style: int) -> str:
+        """
+        Convert the serial number of a date cell to a string.
+
+        :param value: The stored number, in days since the epoch.
+        :type value: str
+        :param style: Index of the cell style.
+        :type style: int
+
+        :return: The date, time or duration, or the number if it is out of range.
+        :rtype: str
+        """
+        days = float(value)
+        try:
+            if style in self.durations:
+                duration = datetime.timedelta(days=days)
+                if duration.microseconds:
+                    # rounded to milliseconds
+                    duration = datetime.timedelta(
+                        seconds=duration.total_seconds() // 1,
+                        microseconds=round(duration.microseconds, -3))
+                return str(duration)
+
+            day, fraction = divmod(days, 1)
+            time = datetime.timedelta(
+                milliseconds=round(fraction * 86400 * 1000))
+            if 0 <= days < 1 and time.days == 0:
+                return str((datetime.datetime.min + time).time())
+            # the 1900 date system counts a nonexistent 29 February 1900
+            if 0 < days < 60 and self.epoch == WINDOWS_EPOCH:
+                day += 1
+            return str(self.epoch + datetime.timedelta(days=day) + time)
+        except (OverflowError, ValueError):
+            return _number(value)
+
+
+def _column_index(reference: str) -> int:
+    """Convert the letters of a cell reference like 'AB12' to a 0-based index."""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def _number(value: str) -> str:
+    # integral numbers are written without a fractional part, like pandas
+    try:
+        return str(int(value))
+    except ValueError:
+        number = float(value)
+        return str(int(number)) if number.is_integer() else str(number)
+
+
+def _cell_value(cell, strings: Sequence[str], styles: _DateStyles) -> str:
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return _unescape(''.join(text.text or ''
+                                 for text in cell.iter(f'{MAIN_NS}t')))
+
+    value = cell.find(f'{MAIN_NS}v')
+    if value is None or value.text is None:
+        return ''
+    if cell_type == 's':
+        return strings[int(value.text)]
+    if cell_type == 'n':
+        style = int(cell.get('s', 0))
+        if style in styles.dates:
+            return styles.format(value.text, style)
+        return _number(value.text)
+    if cell_type == 'b':
+        return str(value.text == '1')
+    if cell_type == 'e':
+        return ''
+    return value.text
+
+
+def iter_rows(path_to_file: str, spill_strings: bool = False,
+              work_dir: Optional[str] = None) -> Iterator[List[str]]:
+    """
+    Read the rows of the first worksheet of a workbook lazily.
+
+    Empty cells are returned as empty strings and empty rows are skipped.
+
+    :param path_to_file: Path to the .xlsx file.
+    :type path_to_file: str
+    :param spill_strings: Whether to keep the shared strings table in a temporary file instead of in memory. Defaults to False.
+    :type spill_strings: bool, optional
+    :param work_dir: Directory of the spilled shared strings. Defaults to the system temporary directory.
+    :type work_dir: str, optional
+
+    :raises ValueError: If the file is not a valid workbook.
+
+    :return: The cell values of each row, as strings.
+    :rtype: Iterator[List[str]]
+    """
+    try:
+        archive = zipfile.ZipFile(path_to_file)
+    except zipfile.BadZipFile as exc:
+        raise ValueError(f'Not a valid XLSX file: {path_to_file}') from exc
+
+    with archive:
+        if spill_strings:
+            strings = _SpilledStrings(archive, work_dir)
+        else:
+            strings = list(_iter_shared_strings(archive))
+        try:
+            yield from _iter_sheet_rows(archive, strings, _DateStyles(archive))
+        finally:
+            if spill_strings:
+                strings.close()
+
+
+def _iter_sheet_rows(archive: zipfile.ZipFile, strings: Sequence[str],
+                     styles: _DateStyles) -> Iterator[List[str]]:
+    with archive.open(_first_sheet_path(archive)) as xml_file:
+        sheet_data = None
+        for event, element in iterparse(xml_file, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == f'{MAIN_NS}sheetData':
+                    sheet_data = element
+                continue
+            if element.tag != f'{MAIN_NS}row':
+                continue
+            row = []
+            for cell in element.iter(f'{MAIN_NS}c'):
+                reference = cell.get('r')
+                index = (_column_index(reference) if reference
+                         else len(row))
+                row.extend([''] * (index - len(row)))
+                row.append(_cell_value(cell, strings, styles))
+            # parsed rows would otherwise stay attached to sheetData
+            if sheet_data is not None:
+                sheet_data.clear()
+            else:
+                element.clear()
+            if any(row):
+                yield row
+
+
+def column_names(header: List[str], width: int) -> List[str]:
+    """
+    Name the columns of a worksheet, like pd.read_excel.
+
+    Columns without a header cell, including those of rows wider than the
+    header, are named 'Unnamed: <index>'.
+
+    :param header: The cell values of the header row.
+    :type header: List[str]
+    :param width: Number of columns, at least the length of the header.
+    :type width: int
+
+    :return: One name per column.
+    :rtype: List[str]
+    """
+    header = header + [''] * (width - len(header))
+    return [name or f'Unnamed: {index}' for index, name in enumerate(header)]
+
+
+def _parse_columns(path_to_file: str) -> Columns:
+    rows = iter_rows(path_to_file)
+    header = next(rows, [])
+    columns = [[] for _ in header]
+    for parsed, row in enumerate(rows):
+        # a row wider than the ones before adds columns padded with ''
+        columns.extend([''] * parsed for _ in range(len(row) - len(columns)))
+        row.extend([''] * (len(columns) - len(row)))
+        for column, value in zip(columns, row):
+            column.append(value)
+    return column_names(header, len(columns)), columns
+
+
+def _cache_file(path_to_file: str, cache_dir: str) -> str:
+    name = hashlib.sha256(
+        os.path.abspath(path_to_file).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, f'{name}.npz')
+
+
+def _load_cache(cache_file: str) -> Optional[Tuple[dict, Columns]]:
+    try:
+        with np.load(cache_file, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != CACHE_VERSION:
+                return None
+            header = meta['header']
+            columns = [
+                data[f'column_{i}'].tobytes().decode('utf-8').split(
+                    CELL_SEPARATOR) if meta['rows'] else []
+                for i in range(len(header))]
+    except (OSError, ValueError, KeyError):
+        return None
+    return meta, (header, columns)
+
+
+def _save_cache(cache_file: str, meta: dict, columns: Columns):
+    header, values = columns
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    arrays = {
+        f'column_{i}': np.frombuffer(
+            CELL_SEPARATOR.join(column).encode('utf-8'), dtype=np.uint8)
+        for i, column in enumerate(values)}
+    meta = dict(meta, version=CACHE_VERSION, header=header,
+                rows=len(values[0]) if values else 0)
+
+    # written to a temporary file first, so readers never see a partial cache
+    temporary = f'{cache_file}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as output:
+        np.savez(output, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(temporary, cache_file)
+
+
+def clear_cache(cache_dir: Optional[str] = None) -> int:
+    """
+    Remove the cached copies of parsed workbooks.
+
+    :param cache_dir: Directory of the workbook cache. Defaults to default_cache_dir().
+    :type cache_dir: str, optional
+
+    :return: Number of removed files.
+    :rtype: int
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith(('.npz', '.tmp')):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+def read_columns(path_to_file: str,
+                 cache_dir: Optional[str] = None) -> Columns:
+    """
+    Read the first worksheet of a workbook into columns of strings.
+
+    With a cache directory, the columns are stored after the first parse. A
+    later call returns the stored copy if the workbook has the same
+    modification time and size, or else the same content hash.
+
+    :param path_to_file: Path to the .xlsx file.
+    :type path_to_file: str
+    :param cache_dir: Directory of the workbook cache. Defaults to None, no caching.
+    :type cache_dir: str, optional
+
+    :return: The header and the values of each column.
+    :rtype: Tuple[List[str], List[List[str]]]
+    """
+    if cache_dir is None:
+        return _parse_columns(path_to_file)
+
+    stat = os.stat(path_to_file)
+    cache_file = _cache_file(path_to_file, cache_dir)
+    cached = _load_cache(cache_file)
+    if cached is not None:
+        meta, columns = cached
+        if (meta['mtime_ns'], meta['size']) == (stat.st_mtime_ns,
+                                                stat.st_size):
+            return columns
+
+    content_hash = file_hash(path_to_file)
+    if cached is not None and meta['sha256'] == content_hash:
+        # touched or copied without changes
+        columns = cached[1]
+    else:
+        columns = _parse_columns(path_to_file)
+
+    try:
+        _save_cache(cache_file, {'mtime_ns': stat.st_mtime_ns,
+                                 'size': stat.st_size,
+                                 'sha256': content_hash}, columns)
+    except OSError:
+        # a read-only cache directory only costs the speed-up
+        pass
+    return columns
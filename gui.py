@@ -1,54 +1,149 @@
 """Simple GUI for calculating DAT scores."""
+import queue
+import threading
 import tkinter as tk
-from tkinter import filedialog
-from datpl.processing import DatabaseManager, DataProcessor
+from tkinter import filedialog, messagebox, ttk
+from datpl.config import read_config
 from datpl.data_io import read_data, save_results
-from datpl.analysis import DatComputer
+from datpl.pipeline import DatPipeline, ScoringCancelled
 
 
-def calculate_dat(data_file, database_path):
-    """Basic DAT calculation for the GUI
+POLL_INTERVAL_MS = 100
+
+# keep a parsed copy of XLSX files on disk only if enabled in config.ini
+XLSX_CACHE = read_config().getboolean('Data', 'xlsx_cache', fallback=False)
+
+# pipelines stay loaded between runs, keyed by the database path
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(database_path):
+    """Return the pipeline for a database, loading it on first use.
 
     Args:
-        data_file (str): File with words to be scored.
         database_path (str): Path to vectors.db database file.
     """
-    # initialize objects for data processing
-    dataset = read_data(data_file, id_column=0)
-    db_manager = DatabaseManager(database_path)
-    data_cleaner = DataProcessor(words=db_manager.get_words())
+    with _pipelines_lock:
+        if database_path not in _pipelines:
+            _pipelines[database_path] = DatPipeline(database_path)
+        return _pipelines[database_path]
 
-    # validate dataset against the database
-    processed_dataset = data_cleaner.process_dataset(dataset)
 
-    # assign to a variable the final dataset (containing only correct words)
-    valid_responses = data_cleaner.extract_valid_words(processed_dataset)
+def calculate_dat(data_file, database_path, progress=None, cancel_event=None):
+    """Basic DAT calculation for the GUI
 
-    # initialize the main class instance for scoring DAT
-    model = DatComputer(db_manager)
+    Args:
+        data_file (str): File with words to be scored.
+        database_path (str): Path to vectors.db database file.
+        progress (callable, optional): Called with the number of validated
+            and scored participants and the dataset size.
+        cancel_event (threading.Event, optional): Cancels the run when set.
 
-    # compute the DAT score
-    results = model.dataset_compute_dat_score(valid_responses)
-    db_manager.disconnect()
+    Returns:
+        str: Path to the saved CSV file.
+    """
+    # load the vocabulary and the word vectors (only on the first run)
+    pipeline = get_pipeline(database_path)
+
+    dataset = read_data(data_file, id_column=0, use_cache=XLSX_CACHE)
+
+    # validate and score the dataset chunk by chunk
+    results = pipeline.score(dataset, progress=progress,
+                             cancel_event=cancel_event)
 
     # obtain a csv file with the final DAT score and distances between word pairs
-    save_results(results, minimum_words=model.minimum_words)
+    return save_results(results, minimum_words=pipeline.minimum_words,
+                        fingerprint=pipeline.db.fingerprint())
 
 
 window = tk.Tk()
 window.title("Calculate DAT")
 
+progress_queue = queue.Queue()
+cancel_event = threading.Event()
+
+
+def calculate_dat_worker(data_file, database_path):
+    """Run the DAT calculation in a worker thread, reporting through the queue."""
+    def report_progress(validated, scored, total):
+        progress_queue.put(("progress", validated, scored, total))
+
+    try:
+        progress_queue.put(("status", "Loading data..."))
+        output_path = calculate_dat(data_file, database_path,
+                                    progress=report_progress,
+                                    cancel_event=cancel_event)
+        progress_queue.put(("done", output_path))
+    except ScoringCancelled:
+        progress_queue.put(("cancelled",))
+    except Exception as exc:  # shown to the user in the main thread
+        progress_queue.put(("error", str(exc)))
+
 
 def run_calculate_dat():
-    """Run the DAT calculation and print a message."""
+    """Start the DAT calculation without blocking the window."""
     data_file = data_file_path.get()
     database_path = database_file_path.get()
 
-    calculate_dat(data_file, database_path)
-
-    tk.messagebox.showinfo(
-        "Calculation Complete", "DAT calculation completed successfully!"
-    )
+    cancel_event.clear()
+    progress_bar["value"] = 0
+    calculate_button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
+
+    threading.Thread(target=calculate_dat_worker,
+                     args=(data_file, database_path), daemon=True).start()
+    window.after(POLL_INTERVAL_MS, poll_progress)
+
+
+def cancel_calculate_dat():
+    """Ask the worker to stop after the current chunk."""
+    cancel_event.set()
+    cancel_button.config(state=tk.DISABLED)
+    status_label.config(text="Cancelling...")
+
+
+def poll_progress():
+    """Apply the messages sent by the worker and keep polling until it ends."""
+    while True:
+        try:
+            message = progress_queue.get_nowait()
+        except queue.Empty:
+            break
+
+        kind = message[0]
+        if kind == "status":
+            status_label.config(text=message[1])
+        elif kind == "progress":
+            _, validated, scored, total = message
+            progress_bar["maximum"] = max(2 * total, 1)
+            progress_bar["value"] = validated + scored
+            status_label.config(
+                text=f"Validated {validated}/{total}, scored {scored}/{total}")
+        else:
+            finish_calculate_dat(message)
+            return
+
+    window.after(POLL_INTERVAL_MS, poll_progress)
+
+
+def finish_calculate_dat(message):
+    """Restore the buttons and print a message."""
+    calculate_button.config(state=tk.NORMAL)
+    cancel_button.config(state=tk.DISABLED)
+
+    kind = message[0]
+    if kind == "done":
+        status_label.config(text=f"Saved {message[1]}")
+        messagebox.showinfo(
+            "Calculation Complete", "DAT calculation completed successfully!"
+        )
+    elif kind == "cancelled":
+        progress_bar["value"] = 0
+        status_label.config(text="Calculation cancelled.")
+    else:
+        status_label.config(text="Calculation failed.")
+        messagebox.showerror("Calculation Failed", message[1])
 
 
 def select_data_file():
@@ -88,4 +183,15 @@ database_button.pack()
 calculate_button = tk.Button(window, text="Calculate DAT", command=run_calculate_dat)
 calculate_button.pack()
 
+progress_bar = ttk.Progressbar(window, orient=tk.HORIZONTAL, length=250,
+                               mode="determinate")
+progress_bar.pack()
+
+status_label = tk.Label(window, text="")
+status_label.pack()
+
+cancel_button = tk.Button(window, text="Cancel", state=tk.DISABLED,
+                          command=cancel_calculate_dat)
+cancel_button.pack()
+
 window.mainloop()
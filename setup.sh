@@ -13,7 +13,7 @@ DATABASE_PATH="$TARGET_DIR/$DATABASE_FILE"
 TABLE_NAME='vectors'
 EXPECTED_ROW_COUNT=143605
 schema_check_passed=false
-row_count_check_passed=false
+integrity_check_passed=false
 
 
 cleanup_files() {
@@ -30,7 +30,7 @@ download_model() {
 
 setup_database() {
     echo "Creating the database. Please wait..."
-    python datpl/database/create_database.py \
+    python -m datpl.database.create_database \
         --database-path "$TARGET_DIR/$DATABASE_FILE" \
         --dict-path "$TARGET_DIR/$DICTIONARY_FILE" \
         --model-path "$TARGET_DIR/$GLOVE_FILE"
@@ -56,22 +56,19 @@ schema_test() {
     fi
 }
 
-row_count_test() {
-    ROW_COUNT=$(sqlite3 "$DATABASE_PATH" "SELECT COUNT(*) FROM $TABLE_NAME")
-
-    if [ "$ROW_COUNT" -eq "$EXPECTED_ROW_COUNT" ]; then
-        echo "Row count in the database is as expected."
-        row_count_check_passed=true
+integrity_test() {
+    # compares the rows with the metadata written by the build
+    if python -m datpl.integrity --database-path "$DATABASE_PATH" \
+        verify --full --expected-rows "$EXPECTED_ROW_COUNT"; then
+        integrity_check_passed=true
     else
-        echo "Error: Row count in the database is not as expected."
-        echo "Expected row count: $EXPECTED_ROW_COUNT"
-        echo "Actual row count: $ROW_COUNT"
+        echo "Error: The database does not match its metadata."
     fi
-
 }
+
 run_tests() {
     schema_test
-    row_count_test
+    integrity_test
 }
 
 
@@ -81,7 +78,7 @@ setup_database
 run_tests
 
 # Perform cleanup only if both checks pass
-if [ "$schema_check_passed" = true ] && [ "$row_count_check_passed" = true ]; then
+if [ "$schema_check_passed" = true ] && [ "$integrity_check_passed" = true ]; then
     cleanup_files
     echo "Setup completed successfully."
 else
@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import tempfile
+
+import pytest
+import numpy as np
+
+
+TEST_VECTORS = {
+    "jabłko": [0.1, 0.2, 0.3, 0.4, 0.5],
+    "banan": [0.5, 0.1, 0.4, 0.2, 0.3],
+    "wiśnia": [0.9, 0.1, 0.1, 0.3, 0.2],
+    "gruszka": [0.2, 0.8, 0.3, 0.1, 0.4],
+    "samochód": [0.7, 0.2, 0.9, 0.1, 0.1],
+    "chmura": [0.1, 0.1, 0.2, 0.9, 0.8],
+    "kot": [0.3, 0.6, 0.1, 0.5, 0.9],
+    "młotek": [0.8, 0.9, 0.2, 0.4, 0.1],
+}
+
+
+@pytest.fixture(autouse=True)
+def xlsx_cache_dir(tmp_path, monkeypatch):
+    """Keep the cache of parsed workbooks out of the home directory."""
+    cache_dir = tmp_path / 'xlsx_cache'
+    monkeypatch.setenv('DATPL_CACHE_DIR', str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture
+def vectors_db():
+    """A small vectors.db with the same schema as the real database."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'vectors.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE '
+                     'vectors (word VARCHAR(40) PRIMARY KEY, vector BLOB)')
+        conn.executemany(
+            'INSERT INTO vectors (word, vector) VALUES (?, ?)',
+            [(word, np.array(vector).tobytes())
+             for word, vector in TEST_VECTORS.items()])
+        conn.commit()
+        conn.close()
+        yield db_path
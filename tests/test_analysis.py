@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+import numpy as np
 
-from datpl.analysis import DatComputer
+from datpl.analysis import DatComputer, DatResult, DatResults
+from datpl.processing import WordVectors
 
 
 valid_words = ["jabłko", "banan", "wiśnia", "gruszka"]
@@ -17,6 +21,15 @@ class MockDatabaseManager:
         }
         return word_vectors.get(word, [])
 
+    def fingerprint(self):
+        return 'mock-fingerprint'
+
+    def get_word_vectors(self, words):
+        words = [word for word in words if self.get_word_vector(word)]
+        return WordVectors(words, np.array(
+            [self.get_word_vector(word) for word in words]).reshape(
+                len(words), -1))
+
 
 @pytest.fixture
 def dat_computer_instance():
@@ -75,3 +88,307 @@ def test_dataset_compute_dat_score(dat_computer_instance):
     assert len(result["participant2"].distances) == 0  # Empty list
     assert result["participant2"].score is None  # Not enough words
 
+
+
+def test_dataset_compute_dat_score_matches_dat(dat_computer_instance):
+    dat_computer_instance.minimum_words = 3
+    dataset = {
+        "participant1": ["jabłko", "banan", "wiśnia", "gruszka"],
+        "participant2": ["gruszka", "wiśnia", "jabłko"],
+    }
+    result = dat_computer_instance.dataset_compute_dat_score(dataset)
+
+    for p_id, answer in dataset.items():
+        distances = dat_computer_instance.dat(answer)
+        assert result[p_id].distances == pytest.approx(distances, abs=1e-6)
+        assert result[p_id].score == pytest.approx(
+            dat_computer_instance.compute_dat_score(distances))
+
+
+def test_dat_results_columns(dat_computer_instance):
+    dat_computer_instance.minimum_words = 3
+    dataset = {
+        "participant1": ["jabłko", "banan", "wiśnia"],
+        "participant2": ["banan"],
+    }
+    result = dat_computer_instance.dataset_compute_dat_score(dataset)
+
+    assert isinstance(result, DatResults)
+    assert list(result) == ["participant1", "participant2"]
+    assert len(result) == 2
+    assert result.distances.shape == (2, 3)
+    assert result.distances.dtype == np.float32
+    assert np.isnan(result.scores[1])
+    assert result.minimum_words == 3
+    assert [r.score is None for r in result.values()] == [False, True]
+
+
+def test_dat_results_from_dict_and_concat():
+    results = DatResults.from_dict({
+        "a1": DatResult([0.5, 0.6, 0.7], 60.0),
+        "a2": DatResult([], None),
+    }, pairs=3)
+    joined = DatResults.concat([results, results.from_dict(
+        {"a3": DatResult([0.1, 0.2, 0.3], 20.0)}, pairs=3)])
+
+    assert list(joined) == ["a1", "a2", "a3"]
+    assert joined["a2"] == DatResult([], None)
+    assert joined["a3"].distances == pytest.approx([0.1, 0.2, 0.3])
+    assert joined["a3"].score == 20.0
+
+    with pytest.raises(ValueError):
+        DatResults(["a1"], np.zeros((2, 3), dtype=np.float32), np.zeros(2))
+
+
+def test_dat_results_carry_fingerprint(dat_computer_instance):
+    dat_computer_instance.minimum_words = 3
+    data = {"p1": ["jabłko", "banan", "wiśnia"]}
+
+    results = dat_computer_instance.dataset_compute_dat_score(data)
+    assert results.fingerprint == 'mock-fingerprint'
+    assert DatResults.concat([results, results]).fingerprint == \
+        'mock-fingerprint'
+
+    other = DatResults(['p2'], results.distances, results.scores, 'other')
+    assert DatResults.concat([results, other]).fingerprint is None
+
+
+def test_dat_results_to_dataframe():
+    results = DatResults(["a1", "a2"],
+                         np.array([[0.5, 0.6, 0.7], [np.nan] * 3],
+                                  dtype=np.float32),
+                         np.array([60.0, np.nan]))
+    df = results.to_dataframe()
+
+    assert list(df.columns) == ['ID', 'W1-W2', 'W1-W3', 'W2-W3', 'DAT']
+    assert list(df['ID']) == ["a1", "a2"]
+    assert np.shares_memory(df['W1-W2'].to_numpy(), results.distances)
+
+
+def test_dat_results_to_arrow():
+    pytest.importorskip('pyarrow')
+    results = DatResults(["a1"], np.array([[0.5, 0.6, 0.7]], dtype=np.float32),
+                         np.array([60.0]))
+    table = results.to_arrow()
+
+    assert table.column_names == ['ID', 'distances', 'DAT']
+    assert table.column('distances').to_pylist() == [
+        pytest.approx([0.5, 0.6, 0.7])]
+
+
+def test_dataset_compute_dat_variants(dat_computer_instance):
+    dataset = {
+        "participant1": ["jabłko", "banan", "wiśnia", "gruszka"],
+        "participant2": ["banan", "gruszka", "jabłko"],
+        "participant3": ["wiśnia"],
+    }
+    variants = dat_computer_instance.dataset_compute_dat_variants(
+        dataset, cutoffs=[2, 3, 4])
+
+    for n in [2, 3, 4]:
+        dat_computer_instance.minimum_words = n
+        expected = dat_computer_instance.dataset_compute_dat_score(dataset)
+        np.testing.assert_allclose(variants[f'DAT_{n}'], expected.scores,
+                                   equal_nan=True)
+
+    assert list(variants['words']) == [4, 3, 1]
+    assert variants['DAT_all'][0] == pytest.approx(variants['DAT_4'][0])
+    assert variants['DAT_all'][1] == pytest.approx(variants['DAT_3'][1])
+    assert np.isnan(variants['DAT_all'][2])
+
+    dat_computer_instance.minimum_words = 3
+    distances = dat_computer_instance.dat(dataset["participant2"])
+    assert variants['distance_min'][1] == pytest.approx(min(distances))
+    assert variants['distance_median'][1] == pytest.approx(
+        np.median(distances))
+    assert variants['distance_std'][1] == pytest.approx(np.std(distances))
+
+    df = variants.to_dataframe()
+    assert list(df.columns) == ['ID', 'DAT_2', 'DAT_3', 'DAT_4', 'DAT_all',
+                                'distance_min', 'distance_median',
+                                'distance_std', 'words']
+
+
+def test_dataset_compute_dat_variants_reuses_buffers(dat_computer_instance):
+    dataset = {
+        f"participant{i}": valid_words[i % 4:] + valid_words[:i % 4]
+        for i in range(10)}
+    expected = dat_computer_instance.dataset_compute_dat_variants(
+        dataset, cutoffs=[2, 3, 4])
+
+    # batches of three participants
+    dat_computer_instance.memory_budget = 3 * 8 * (20 + 4 * 16 + 6 + 1)
+
+    first = dat_computer_instance.dataset_compute_dat_variants(
+        dataset, cutoffs=[2, 3, 4])
+    buffers = dat_computer_instance._local.buffers['variants'][2]
+    second = dat_computer_instance.dataset_compute_dat_variants(
+        dataset, cutoffs=[2, 3, 4])
+
+    assert dat_computer_instance._local.buffers['variants'][2] is buffers
+    assert len(buffers['gathered']) == 3
+    for name in expected.columns:
+        np.testing.assert_allclose(first[name], expected[name])
+        np.testing.assert_allclose(second[name], expected[name])
+
+
+def test_dataset_compute_dat_variants_invalid_cutoff(dat_computer_instance):
+    with pytest.raises(ValueError):
+        dat_computer_instance.dataset_compute_dat_variants({}, cutoffs=[1])
+
+
+def test_dataset_compute_dat_score_with_vocabulary_vectors(
+        dat_computer_instance):
+    dat_computer_instance.minimum_words = 3
+    dataset = {"participant1": ["jabłko", "banan", "wiśnia"]}
+    vectors = dat_computer_instance.vocabulary_vectors(
+        ["wiśnia", "banan", "jabłko", "banan"])
+
+    assert vectors.words == ["wiśnia", "banan", "jabłko"]
+    result = dat_computer_instance.dataset_compute_dat_score(
+        dataset, vectors=vectors)
+    expected = dat_computer_instance.dataset_compute_dat_score(dataset)
+    np.testing.assert_allclose(result.distances, expected.distances)
+
+
+def test_dataset_compute_dat_score_encoded(dat_computer_instance):
+    from datpl.processing import DataProcessor
+
+    dat_computer_instance.minimum_words = 3
+    processor = DataProcessor(valid_words)
+    dataset = {
+        "participant1": ["jabłko", "banan", "wiśnia", "gruszka"],
+        "participant2": ["gruszka", "kiwi", "banan"],
+        "participant3": ["wiśnia", "gruszka", "banan"],
+    }
+    result = dat_computer_instance.dataset_compute_dat_score_encoded(
+        processor.encode_dataset(dataset))
+    expected = dat_computer_instance.dataset_compute_dat_score(
+        processor.extract_valid_words(processor.process_dataset(dataset)))
+
+    assert list(result) == list(dataset)
+    np.testing.assert_allclose(result.distances, expected.distances)
+    np.testing.assert_allclose(result.scores, expected.scores)
+    assert result["participant2"].score is None
+
+
+def test_workers_property(dat_computer_instance):
+    assert dat_computer_instance.workers == 1
+
+    dat_computer_instance.workers = 4
+    assert dat_computer_instance.workers == 4
+
+    with pytest.raises(ValueError):
+        dat_computer_instance.workers = "invalid"
+
+    with pytest.raises(ValueError):
+        dat_computer_instance.workers = 0
+
+
+def test_dataset_compute_dat_score_threaded(dat_computer_instance,
+                                            monkeypatch):
+    from datpl.processing import DataProcessor
+
+    monkeypatch.setattr('datpl.analysis.MIN_THREAD_BATCH_SIZE', 2)
+    dat_computer_instance.minimum_words = 3
+    processor = DataProcessor(valid_words)
+    rng = np.random.default_rng(0)
+    encoded = processor.encode_dataset({
+        f"participant{i}": list(rng.choice(valid_words + ["kiwi"], 4))
+        for i in range(50)})
+    expected = dat_computer_instance.dataset_compute_dat_score_encoded(
+        encoded)
+
+    dat_computer_instance.workers = 4
+    result = dat_computer_instance.dataset_compute_dat_score_encoded(encoded)
+
+    np.testing.assert_array_equal(result.distances, expected.distances)
+    np.testing.assert_array_equal(result.scores, expected.scores)
+
+
+def test_score_buffers_kept_across_calls(dat_computer_instance):
+    from datpl.processing import DataProcessor
+
+    dat_computer_instance.minimum_words = 3
+    processor = DataProcessor(valid_words)
+    encoded = processor.encode_dataset({
+        f"participant{i}": valid_words[i % 4:] + valid_words[:i % 4]
+        for i in range(10)})
+    expected = dat_computer_instance.dataset_compute_dat_score_encoded(
+        encoded)
+    buffers = dat_computer_instance._local.buffers['score_0'][2]
+
+    # a smaller chunk is scored on the buffers of the previous one
+    chunk = dat_computer_instance.dataset_compute_dat_score_encoded(
+        processor.encode_dataset({"participant1": valid_words}))
+    assert dat_computer_instance._local.buffers['score_0'][2] is buffers
+    np.testing.assert_allclose(chunk.scores, expected.scores[:1])
+
+    # other threads get their own buffers
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(dat_computer_instance.dataset_compute_dat_score_encoded,
+                    encoded).result()
+    assert dat_computer_instance._local.buffers['score_0'][2] is buffers
+
+    # buffers larger than the budget are replaced
+    dat_computer_instance.memory_budget = 3 * 8 * (15 + 9 + 3 + 1)
+    result = dat_computer_instance.dataset_compute_dat_score_encoded(encoded)
+    held = dat_computer_instance._local.buffers['score_0'][2]
+    assert len(held['gathered']) == 3
+    np.testing.assert_allclose(result.scores, expected.scores)
+
+
+def test_memory_budget_property(dat_computer_instance):
+    dat_computer_instance.memory_budget = 2 ** 20
+    assert dat_computer_instance.memory_budget == 2 ** 20
+
+    with pytest.raises(ValueError):
+        dat_computer_instance.memory_budget = 1.5
+
+    with pytest.raises(ValueError):
+        dat_computer_instance.memory_budget = 0
+
+
+def test_batch_size(dat_computer_instance):
+    # 8 bytes * (7 * 100 + 7 * 7 + 21 + 1) per participant
+    dat_computer_instance.memory_budget = 6168 * 100
+    assert dat_computer_instance.batch_size(7, 100) == 100
+    assert dat_computer_instance.batch_size(7, 100, itemsize=4) == 200
+    assert dat_computer_instance.batch_size(7, 300) < 100
+
+    dat_computer_instance.workers = 4
+    assert dat_computer_instance.batch_size(7, 100) == 25
+
+    dat_computer_instance.memory_budget = 1
+    assert dat_computer_instance.batch_size(7, 100) == 1
+
+    dat_computer_instance.memory_budget = 2 ** 40
+    assert dat_computer_instance.batch_size(7, 100) == 4096
+
+
+def test_dataset_compute_dat_score_small_memory_budget(
+        dat_computer_instance):
+    from datpl.instrumentation import profile_run, INSTRUMENTATION
+    from datpl.processing import DataProcessor
+
+    dat_computer_instance.minimum_words = 3
+    processor = DataProcessor(valid_words)
+    encoded = processor.encode_dataset({
+        f"participant{i}": valid_words[i % 4:] + valid_words[:i % 4]
+        for i in range(10)})
+    expected = dat_computer_instance.dataset_compute_dat_score_encoded(
+        encoded)
+
+    # room for the buffers of three participants
+    dat_computer_instance.memory_budget = 3 * 8 * (15 + 9 + 3 + 1)
+    with profile_run():
+        result = dat_computer_instance.dataset_compute_dat_score_encoded(
+            encoded)
+    report = INSTRUMENTATION.report()
+
+    np.testing.assert_allclose(result.distances, expected.distances)
+    np.testing.assert_allclose(result.scores, expected.scores)
+    assert report['gauges']['scoring.batch_size'] == 3
+    assert report['gauges']['scoring.buffer_bytes.peak'] <= \
+        dat_computer_instance.memory_budget
+    assert report['counters']['scoring.batches'] == 4
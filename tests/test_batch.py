@@ -0,0 +1,161 @@
+import os
+import tempfile
+
+import pytest
+import pandas as pd
+
+from datpl.batch import (
+    expand_inputs,
+    output_path_for,
+    output_paths_for,
+    run_batch,
+    main
+)
+
+
+test_data = {
+    'ID': ['a1', 'a2'],
+    'W1': ['jabłko', 'kot'],
+    'W2': ['banan', 'chmura'],
+    'W3': ['wiśnia', 'xyz'],
+}
+
+
+@pytest.fixture
+def data_dir():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ['first', 'second', 'third']:
+            pd.DataFrame(test_data).to_csv(
+                os.path.join(tmp_dir, f'{name}.csv'), sep=';', index=False)
+        yield tmp_dir
+
+
+def test_expand_inputs(data_dir):
+    files = expand_inputs([os.path.join(data_dir, '*.csv'),
+                           os.path.join(data_dir, 'first.csv')])
+    assert [os.path.basename(f) for f in files] == [
+        'first.csv', 'second.csv', 'third.csv']
+
+    with pytest.raises(FileNotFoundError, match='No files match'):
+        expand_inputs([os.path.join(data_dir, '*.xlsx')])
+
+
+def test_expand_inputs_glob_characters_in_name(data_dir):
+    path = os.path.join(data_dir, 'wave[1].csv')
+    pd.DataFrame(test_data).to_csv(path, sep=';', index=False)
+
+    assert expand_inputs([path]) == [path]
+
+
+def test_output_path_for():
+    assert output_path_for('data/dat-data.xlsx', 'out') == os.path.join(
+        'out', 'dat-data_dat_distances.csv')
+
+
+def test_output_paths_for_same_stem():
+    paths = output_paths_for(['a/x.csv', 'b/x.xlsx', 'b/x.csv', 'c/y.csv'],
+                             'out')
+    assert paths == [os.path.join('out', name) for name in [
+        'x_dat_distances.csv', 'x_2_dat_distances.csv',
+        'x_3_dat_distances.csv', 'y_dat_distances.csv']]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch_same_stem(data_dir, vectors_db, workers):
+    nested = os.path.join(data_dir, 'nested')
+    os.makedirs(nested)
+    pd.DataFrame(test_data).head(1).to_csv(
+        os.path.join(nested, 'first.csv'), sep=';', index=False)
+    files = [os.path.join(data_dir, 'first.csv'),
+             os.path.join(nested, 'first.csv')]
+
+    reports = run_batch(files, vectors_db,
+                        output_dir=os.path.join(data_dir, 'out'),
+                        workers=workers, minimum_words=3, progress=False)
+
+    outputs = {report.input_path: report.output_path for report in reports}
+    assert len(set(outputs.values())) == 2
+    assert len(pd.read_csv(outputs[files[0]])) == 2
+    assert len(pd.read_csv(outputs[files[1]])) == 1
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch_continues_after_failure(data_dir, vectors_db, workers,
+                                           capsys):
+    broken = os.path.join(data_dir, 'broken.xlsx')
+    with open(broken, 'w', encoding='utf-8') as broken_file:
+        broken_file.write('not a workbook')
+    files = [broken, os.path.join(data_dir, 'first.csv')]
+
+    reports = run_batch(files, vectors_db,
+                        output_dir=os.path.join(data_dir, 'out'),
+                        workers=workers, minimum_words=3)
+
+    by_input = {report.input_path: report for report in reports}
+    assert 'Not a valid XLSX file' in by_input[broken].error
+    assert by_input[files[1]].error is None
+    assert by_input[files[1]].participants == 2
+    assert os.path.isfile(by_input[files[1]].output_path)
+    assert f'{broken}: failed' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch(data_dir, vectors_db, workers):
+    output_dir = os.path.join(data_dir, 'out')
+    files = expand_inputs([os.path.join(data_dir, '*.csv')])
+
+    reports = run_batch(files, vectors_db, output_dir=output_dir,
+                        workers=workers, minimum_words=3, progress=False)
+
+    assert sorted(report.input_path for report in reports) == files
+    for report in reports:
+        assert report.participants == 2
+        df = pd.read_csv(report.output_path)
+        assert list(df['ID']) == ['a1', 'a2']
+        assert df['DAT'].notna().tolist() == [True, False]
+
+
+@pytest.mark.parametrize('xlsx_cache', [False, True])
+def test_run_batch_xlsx_cache(data_dir, vectors_db, xlsx_cache_dir,
+                              xlsx_cache):
+    xlsx_path = os.path.join(data_dir, 'first.xlsx')
+    pd.DataFrame(test_data).to_excel(xlsx_path, index=False)
+
+    reports = run_batch([xlsx_path], vectors_db,
+                        output_dir=os.path.join(data_dir, 'out'),
+                        minimum_words=3, progress=False,
+                        xlsx_cache=xlsx_cache)
+
+    assert reports[0].participants == 2
+    assert os.path.isdir(xlsx_cache_dir) == xlsx_cache
+
+
+def test_main(data_dir, vectors_db, capsys):
+    output_dir = os.path.join(data_dir, 'out')
+    exit_code = main([os.path.join(data_dir, 'first.csv'),
+                      '--database-path', vectors_db,
+                      '--output-dir', output_dir,
+                      '--minimum-words', '3'])
+
+    assert exit_code == 0
+    assert os.path.isfile(os.path.join(output_dir,
+                                       'first_dat_distances.csv'))
+    out = capsys.readouterr().out
+    assert '[1/1]' in out
+    assert 'Scored 2 participants from 1 files' in out
+
+
+def test_main_reports_failed_files(data_dir, vectors_db, capsys):
+    broken = os.path.join(data_dir, 'broken.xlsx')
+    with open(broken, 'w', encoding='utf-8') as broken_file:
+        broken_file.write('not a workbook')
+
+    exit_code = main([broken, os.path.join(data_dir, 'first.csv'),
+                      '--database-path', vectors_db,
+                      '--output-dir', os.path.join(data_dir, 'out'),
+                      '--minimum-words', '3', '--workers', '1'])
+
+    assert exit_code == 1
+    captured = capsys.readouterr()
+    assert 'Scored 2 participants from 1 files' in captured.out
+    assert '1 files failed.' in captured.err
@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+
+from datpl.benchmark import (
+    compare,
+    main,
+    make_synthetic_dataset,
+    run_benchmarks,
+    synthetic_words
+)
+from datpl.processing import DataProcessor
+
+
+def test_synthetic_words():
+    words = synthetic_words(1000)
+    assert len(set(words)) == 1000
+    assert all(DataProcessor.clean(word) == word for word in words)
+
+
+def test_make_synthetic_dataset_is_reproducible():
+    words = synthetic_words(100)
+    dataset = make_synthetic_dataset(words, 20, 7, seed=1)
+
+    assert dataset == make_synthetic_dataset(words, 20, 7, seed=1)
+    assert len(dataset) == 20
+    assert all(len(response) == 7 for response in dataset.values())
+
+    processed = DataProcessor(words).process_dataset(dataset)
+    invalid = sum(len(r['invalid_words']) for r in processed.values())
+    assert invalid > 0
+
+
+def test_run_benchmarks():
+    report = run_benchmarks([30], [7, 10], vocabulary_size=200,
+                            dimension=10, memory=True, threads=2)
+
+    benchmarks = {record['benchmark'] for record in report['results']}
+    assert benchmarks == {'get_word_vector[sqlite]', 'get_word_vector[memory]',
+                          'read_data[csv]', 'read_data[xlsx]',
+                          'read_data[xlsx,cached]', 'process_dataset',
+                          'encode_dataset',
+                          'dataset_compute_dat_score_encoded[threads=1]',
+                          'dataset_compute_dat_score_encoded[threads=2]',
+                          'dataset_compute_dat_score', 'save_results'}
+    assert len(report['results']) == 2 + 9 * 2
+    for record in report['results']:
+        assert record['seconds'] > 0
+        assert record['peak_bytes'] > 0
+
+    comparison = compare(report, report)
+    assert len(comparison) == len(report['results'])
+    assert all(entry['speedup'] == 1 for entry in comparison)
+
+
+def test_main_writes_json(capsys):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, 'bench.json')
+        main(['--participants', '10', '--words', '7',
+              '--vocabulary-size', '100', '--dimension', '5',
+              '--no-memory', '--output', output])
+        with open(output, encoding='utf-8') as json_file:
+            report = json.load(json_file)
+
+    assert report['parameters']['vocabulary_size'] == 100
+    assert all(record['peak_bytes'] is None for record in report['results'])
+    assert 'process_dataset' in capsys.readouterr().out
@@ -0,0 +1,95 @@
+import os
+import tempfile
+
+import pytest
+import numpy as np
+
+from datpl.analysis import DatComputer
+from datpl.cache import ResultCache, cache_path, open_result_cache
+from datpl.instrumentation import profile_run
+from datpl.processing import DatabaseManager
+
+
+@pytest.fixture
+def cache_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        yield os.path.join(tmp_dir, 'vectors.results.db')
+
+
+def test_cache_path():
+    assert cache_path(os.path.join('db', 'vectors.db')) == os.path.join(
+        'db', 'vectors.results.db')
+
+
+def test_key(cache_file):
+    cache = ResultCache(cache_file, 'fingerprint')
+    key = cache.key(['a', 'b', 'c', 'd'], 3)
+
+    assert key == cache.key(['a', 'b', 'c', 'e'], 3)
+    assert key != cache.key(['a', 'b', 'c', 'd'], 4)
+    assert key != cache.key(['b', 'a', 'c'], 3)
+    assert key != ResultCache(cache_file, 'other').key(['a', 'b', 'c'], 3)
+
+
+def test_put_and_get(cache_file):
+    cache = ResultCache(cache_file, 'fingerprint')
+    cache.put_many([(b'k1', np.array([0.5, 0.25]), 37.5),
+                    (b'k2', np.array([0.1, 0.3]), np.nan)])
+
+    found = cache.get_many([b'k1', b'k2', b'k3'])
+    cache.close()
+
+    assert set(found) == {b'k1', b'k2'}
+    np.testing.assert_array_equal(found[b'k1'][0], [0.5, 0.25])
+    assert found[b'k1'][1] == 37.5
+    assert np.isnan(found[b'k2'][1])
+
+
+def test_new_fingerprint_clears_cache(cache_file):
+    cache = ResultCache(cache_file, 'old')
+    cache.put_many([(b'k1', np.array([0.5]), 50.0)])
+    assert len(cache) == 1
+    cache.close()
+
+    assert len(ResultCache(cache_file, 'old')) == 1
+    assert len(ResultCache(cache_file, 'new')) == 0
+
+
+def test_dataset_compute_dat_score_with_cache(vectors_db):
+    db_manager = DatabaseManager(vectors_db)
+    model = DatComputer(db_manager)
+    model.minimum_words = 3
+    cache = open_result_cache(db_manager)
+    dataset = {
+        'p1': ['jabłko', 'banan', 'kot'],
+        'p2': ['chmura', 'kot', 'młotek', 'wiśnia'],
+        'p3': ['chmura'],
+    }
+    expected = model.dataset_compute_dat_score(dataset)
+
+    with profile_run() as instrumentation:
+        first = model.dataset_compute_dat_score(dataset, cache=cache)
+        dataset['p4'] = ['gruszka', 'samochód', 'kot']
+        second = model.dataset_compute_dat_score(dataset, cache=cache)
+
+    assert instrumentation.counters['result_cache.hits'] == 2
+    assert instrumentation.counters['result_cache.misses'] == 3
+    for results in (first, second):
+        np.testing.assert_array_equal(results.distances[:3],
+                                      expected.distances)
+        np.testing.assert_array_equal(results.scores[:3], expected.scores)
+    assert second['p4'].score is not None
+    assert len(cache) == 3
+    cache.close()
+
+
+def test_rebuilt_database_invalidates_cache(vectors_db):
+    db_manager = DatabaseManager(vectors_db)
+    cache = open_result_cache(db_manager)
+    cache.put_many([(b'k1', np.array([0.5]), 50.0)])
+    cache.close()
+
+    stat = os.stat(vectors_db)
+    os.utime(vectors_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert len(open_result_cache(db_manager)) == 0
@@ -0,0 +1,90 @@
+import os
+import threading
+
+import pytest
+
+from datpl.daemon import DatDaemon, main, send_job
+from datpl.pipeline import DatPipeline
+
+
+@pytest.fixture
+def daemon(vectors_db):
+    server = DatDaemon(DatPipeline(vectors_db, minimum_words=3), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _send(daemon, job):
+    host, port = daemon.server_address
+    return send_job(job, host=host, port=port, timeout=10)
+
+
+def test_ping(daemon):
+    response = _send(daemon, {'action': 'ping'})
+    assert response['status'] == 'ok'
+    assert response['words'] == 8
+    assert response['fingerprint'] == daemon.pipeline.db.fingerprint()
+    assert response['elapsed_ms'] >= 0
+    assert response['roundtrip_ms'] >= response['elapsed_ms']
+
+
+def test_score_responses(daemon):
+    response = _send(daemon, {'responses': {
+        'p1': ['jabłko', 'banan', 'kot'],
+        'p2': ['jabłko'],
+    }})
+    assert response['status'] == 'ok'
+    assert len(response['results']['p1']['distances']) == 3
+    assert isinstance(response['results']['p1']['score'], float)
+    assert response['results']['p2'] == {'distances': [], 'score': None}
+
+
+def test_score_path(daemon, tmp_path, monkeypatch):
+    data_path = tmp_path / 'data.csv'
+    data_path.write_text('ID;W1;W2;W3\np1;jabłko;banan;kot\n',
+                         encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+
+    response = _send(daemon, {'path': str(data_path)})
+    assert response['status'] == 'ok'
+    assert os.path.isabs(response['output_path'])
+    assert os.path.isfile(response['output_path'])
+
+    output_path = str(tmp_path / 'out' / 'data.csv')
+    response = _send(daemon, {'path': str(data_path),
+                              'output_path': output_path})
+    assert response['output_path'] == output_path
+    assert os.path.isfile(output_path)
+
+
+def test_score_command_output_dir(daemon, tmp_path, monkeypatch, capsys):
+    data_path = tmp_path / 'data.csv'
+    data_path.write_text('ID;W1;W2;W3\np1;jabłko;banan;kot\n',
+                         encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    host, port = daemon.server_address
+
+    assert main(['--host', host, '--port', str(port), 'score',
+                 'data.csv', '--output-dir', 'out']) == 0
+
+    output_path = str(tmp_path / 'out' / 'data_dat_distances.csv')
+    assert os.path.isfile(output_path)
+    assert f'CSV file saved in {output_path}.' in capsys.readouterr().out
+
+
+def test_invalid_job(daemon):
+    response = _send(daemon, {'action': 'score'})
+    assert response['status'] == 'error'
+    assert 'requires either' in response['message']
+
+    response = _send(daemon, {'action': 'unknown'})
+    assert response['status'] == 'error'
+
+
+def test_send_job_without_daemon():
+    with pytest.raises(ConnectionError, match='Could not reach'):
+        send_job({'action': 'ping'}, port=1, timeout=1)
@@ -3,9 +3,10 @@ import tempfile
 import shutil
 
 import pytest
+import numpy as np
 import pandas as pd
 
-from datpl.analysis import DatResult
+from datpl.analysis import DatResult, DatResults
 from datpl.data_io import (
     read_data,
     save_results,
@@ -165,3 +166,52 @@ def test_save_results(capsys, results_folder):
 
     expected_message = f'CSV file saved in {output_path}.\n'
     assert captured.out == expected_message
+
+
+def test_save_results_to_output_path(capsys):
+    data = {'1': DatResult([0.5, 0.6, 0.7], 0.8)}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'nested', 'out.csv')
+
+        assert save_results(data, 3, output_path=output_path) == output_path
+        assert os.path.isfile(output_path)
+    assert capsys.readouterr().out == f'CSV file saved in {output_path}.\n'
+
+
+def test_save_csv_file_without_score():
+    data = {
+        'a1': DatResult([0.5, 0.6, 0.7], 0.8),
+        'a2': DatResult([], None),
+    }
+    columns = ['ID', 'W1-W2', 'W1-W3', 'W2-W3', 'DAT']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'output.csv')
+        _save_csv_file(output_path, data, columns)
+
+        df = pd.read_csv(output_path)
+
+    assert list(df.columns) == columns
+    assert df.iloc[1, 1:].isna().all()
+
+
+def test_save_results_with_fingerprint(capsys):
+    data = {'1': DatResult([0.5, 0.6, 0.7], 0.8)}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'out.csv')
+        save_results(data, 3, output_path=output_path, fingerprint='abc')
+        df = pd.read_csv(output_path)
+
+    assert list(df.columns) == ['ID', 'W1-W2', 'W1-W3', 'W2-W3', 'DAT',
+                                'vectors_fingerprint']
+    assert df['vectors_fingerprint'].tolist() == ['abc']
+
+
+def test_save_results_uses_fingerprint_of_results(capsys):
+    results = DatResults(['1'], np.array([[0.5, 0.6, 0.7]], dtype=np.float32),
+                         np.array([0.8]), fingerprint='abc')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'out.csv')
+        save_results(results, 3, output_path=output_path)
+        df = pd.read_csv(output_path)
+
+    assert df['vectors_fingerprint'].tolist() == ['abc']
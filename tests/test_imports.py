@@ -0,0 +1,50 @@
+import json
+import pathlib
+import subprocess
+import sys
+
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ['pandas', 'scipy']
+
+# cumulative import time of the whole package, NumPy included, in microseconds
+IMPORT_TIME_BUDGET_US = 1_500_000
+
+
+def _run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def _import_times(module):
+    """Parse `python -X importtime` output into {module: cumulative_us}."""
+    stderr = _run_python('-X', 'importtime', '-c', f'import {module}').stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_package_import_skips_heavy_dependencies():
+    code = ('import sys, json\n'
+            'import datpl.processing, datpl.analysis, datpl.data_io\n'
+            'import datpl.pipeline, datpl.daemon, datpl.config\n'
+            f'print(json.dumps([m for m in {HEAVY_MODULES!r} '
+            'if m in sys.modules]))')
+    assert json.loads(_run_python('-c', code).stdout) == []
+
+
+def test_daemon_client_skips_numpy():
+    code = 'import sys, datpl.daemon; print("numpy" in sys.modules)'
+    assert _run_python('-c', code).stdout.strip() == 'False'
+
+
+def test_import_time_budget():
+    times = _import_times('datpl.pipeline')
+
+    assert not set(HEAVY_MODULES) & set(times)
+    assert times['datpl.pipeline'] < IMPORT_TIME_BUDGET_US
@@ -0,0 +1,129 @@
+import json
+import os
+import pstats
+import tempfile
+
+import pytest
+
+from datpl.decorators import instrument
+from datpl.instrumentation import (
+    INSTRUMENTATION,
+    Instrumentation,
+    count,
+    gauge,
+    profile_run
+)
+from datpl.pipeline import DatPipeline
+
+
+@instrument('square')
+def square(value):
+    return value * value
+
+
+def test_instrument_disabled_by_default():
+    assert not INSTRUMENTATION.enabled
+    INSTRUMENTATION.start()
+    INSTRUMENTATION.stop()
+
+    assert square(3) == 9
+    count('events')
+    assert INSTRUMENTATION.stages == {}
+    assert INSTRUMENTATION.counters == {}
+
+
+def test_instrument_records_stage():
+    with profile_run() as instrumentation:
+        square(2)
+        square(3)
+
+    report = instrumentation.report()
+    assert report['stages']['square']['calls'] == 2
+    assert report['stages']['square']['total_s'] >= 0
+    assert not INSTRUMENTATION.enabled
+
+
+def test_instrument_records_failing_calls():
+    @instrument('failing')
+    def failing():
+        raise RuntimeError
+
+    with profile_run() as instrumentation:
+        with pytest.raises(RuntimeError):
+            failing()
+
+    assert instrumentation.stages['failing'][0] == 1
+
+
+def test_report_cache_hit_rate_and_gauges():
+    instrumentation = Instrumentation()
+    instrumentation.start()
+    instrumentation.count('cache.hits', 3)
+    instrumentation.count('cache.misses')
+    instrumentation.gauge('bytes.peak', 10)
+    instrumentation.gauge('bytes.peak', 5)
+    instrumentation.gauge('chunk', 10)
+    instrumentation.gauge('chunk', 5)
+    instrumentation.stop()
+
+    report = instrumentation.report()
+    assert report['caches']['cache'] == {
+        'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+    assert report['gauges'] == {'bytes.peak': 10, 'chunk': 5}
+
+
+def test_report_cache_without_lookups():
+    instrumentation = Instrumentation()
+    instrumentation.start()
+    instrumentation.count('cache.hits', 0)
+    instrumentation.stop()
+
+    assert instrumentation.report()['caches']['cache'] == {
+        'hits': 0, 'misses': 0, 'hit_rate': None}
+
+
+def test_profile_run_with_result_cache_and_short_responses(vectors_db):
+    pipeline = DatPipeline(vectors_db, minimum_words=7, use_cache=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'report.json')
+        # no participant has enough words, so no cache lookups are counted
+        with profile_run(json_path):
+            pipeline.score({'p1': ['jabłko', 'banan', 'kot']})
+
+        with open(json_path, encoding='utf-8') as json_file:
+            report = json.load(json_file)
+
+    pipeline.close()
+    assert report['caches']['result_cache']['hit_rate'] is None
+
+
+def test_profile_run_exports(vectors_db):
+    pipeline = DatPipeline(vectors_db, minimum_words=3, preload=False)
+    dataset = {'p1': ['jabłko', 'banan', 'kot'], 'p2': ['chmura']}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'report.json')
+        pstats_path = os.path.join(tmp_dir, 'run.pstats')
+
+        with profile_run(json_path, pstats_path):
+            pipeline.score(dataset)
+            gauge('participants', len(dataset))
+
+        with open(json_path, encoding='utf-8') as json_file:
+            report = json.load(json_file)
+        stats = pstats.Stats(pstats_path)
+
+    pipeline.close()
+    assert report['stages']['encode_dataset']['calls'] == 1
+    # per-word helpers are not instrumented
+    assert 'clean' not in report['stages']
+    assert report['stages']['dataset_compute_dat_score_encoded']['calls'] == 1
+    # the vectors of all words are fetched in one bulk read
+    assert report['counters']['sql.queries'] == 1
+    assert report['caches']['vector_store']['hit_rate'] == 0
+    assert report['gauges']['participants'] == 2
+    # one scored participant, three words of five dimensions
+    assert report['gauges']['scoring.batch_size'] == 1
+    assert report['gauges']['scoring.buffer_bytes.peak'] == 8 * (15 + 9 + 3 + 1)
+    assert stats.total_calls > 0
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from datpl.database.create_database import create_vectors_database
+from datpl.integrity import (
+    VectorChecksum,
+    build_metadata,
+    compute_fingerprint,
+    main,
+    read_metadata
+)
+from datpl.processing import DatabaseManager
+
+from .conftest import TEST_VECTORS
+
+
+ROWS = [(word, np.array(vector).tobytes())
+        for word, vector in TEST_VECTORS.items()]
+
+
+@pytest.fixture
+def stamped_db(vectors_db):
+    assert main(['--database-path', vectors_db, 'stamp']) == 0
+    return vectors_db
+
+
+def _execute(db_path, query, parameters=()):
+    conn = sqlite3.connect(db_path)
+    conn.execute(query, parameters)
+    conn.commit()
+    conn.close()
+
+
+def test_checksum_is_order_independent():
+    forward, backward = VectorChecksum(), VectorChecksum()
+    for word, vector in ROWS:
+        forward.update(word, vector)
+    for word, vector in reversed(ROWS):
+        backward.update(word, vector)
+
+    assert forward.hexdigest() == backward.hexdigest()
+    assert forward.rows == len(ROWS)
+
+
+def test_build_metadata():
+    metadata = build_metadata(ROWS, model_sha256='m', dictionary_sha256='d')
+
+    assert metadata['dimension'] == '5'
+    assert metadata['dtype'] == 'float64'
+    assert metadata['rows'] == '8'
+    assert metadata['normalization'] == 'none'
+    assert metadata['fingerprint'] == compute_fingerprint(metadata)
+
+    changed = build_metadata(ROWS[:-1] + [('młotek', bytes(40))],
+                             model_sha256='m', dictionary_sha256='d')
+    assert changed['checksum'] != metadata['checksum']
+    assert changed['fingerprint'] != metadata['fingerprint']
+
+
+def test_build_metadata_mixed_sizes():
+    with pytest.raises(ValueError, match='bytes'):
+        build_metadata(ROWS + [('pies', bytes(8))])
+
+
+def test_database_manager_metadata(stamped_db):
+    db_manager = DatabaseManager(stamped_db)
+
+    assert db_manager.metadata()['rows'] == '8'
+    assert db_manager.fingerprint() == db_manager.metadata()['fingerprint']
+    assert db_manager.verify()
+    assert db_manager.verify(full=True)
+
+    # the fingerprint does not depend on the file's modification time
+    os.utime(stamped_db, ns=(0, 0))
+    assert DatabaseManager(stamped_db).fingerprint() == \
+        db_manager.fingerprint()
+    db_manager.disconnect()
+
+
+@pytest.mark.parametrize('read_metadata_first', ['fingerprint', 'verify'])
+def test_load_vectors_after_metadata(stamped_db, read_metadata_first):
+    db_manager = DatabaseManager(stamped_db)
+    getattr(db_manager, read_metadata_first)()
+    db_manager.disconnect()
+    db_manager.get_words()
+
+    assert len(db_manager.load_vectors()) == 8
+
+
+def test_load_vectors_in_another_thread(stamped_db):
+    db_manager = DatabaseManager(stamped_db)
+    assert db_manager.verify()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        vectors = pool.submit(db_manager.load_vectors).result()
+
+    assert len(vectors) == 8
+    db_manager.disconnect()
+
+
+def test_legacy_database(vectors_db):
+    db_manager = DatabaseManager(vectors_db)
+
+    assert db_manager.metadata() is None
+    assert not db_manager.verify()
+    assert len(db_manager.fingerprint()) == 64
+    db_manager.disconnect()
+
+
+def test_verify_detects_missing_rows(stamped_db):
+    _execute(stamped_db, "DELETE FROM vectors WHERE word='kot'")
+    db_manager = DatabaseManager(stamped_db)
+
+    with pytest.raises(ValueError, match='7 rows'):
+        db_manager.verify()
+    with pytest.raises(ValueError, match='7 rows'):
+        db_manager.load_vectors()
+    db_manager.disconnect()
+
+
+@pytest.mark.parametrize('read', [
+    lambda db_manager: db_manager.get_words(),
+    lambda db_manager: db_manager.get_word_vectors(['kot']),
+    lambda db_manager: db_manager.get_word_vector('kot'),
+    lambda db_manager: db_manager.fingerprint(),
+])
+def test_first_connection_verifies(stamped_db, read):
+    _execute(stamped_db, "DELETE FROM vectors WHERE word='kot'")
+    db_manager = DatabaseManager(stamped_db)
+
+    with pytest.raises(ValueError, match='7 rows'):
+        read(db_manager)
+    db_manager.disconnect()
+
+
+def test_full_verify_detects_changed_vectors(stamped_db):
+    _execute(stamped_db, "UPDATE vectors SET vector=? WHERE word='kot'",
+             (bytes(40),))
+    db_manager = DatabaseManager(stamped_db)
+
+    assert db_manager.verify()
+    with pytest.raises(ValueError, match='Checksum'):
+        db_manager.verify(full=True)
+    db_manager.disconnect()
+
+
+def test_verify_command(stamped_db, capsys):
+    assert main(['--database-path', stamped_db, 'verify', '--full',
+                 '--expected-rows', '8']) == 0
+    assert 'intact' in capsys.readouterr().out
+
+    assert main(['--database-path', stamped_db, 'verify',
+                 '--expected-rows', '9']) == 1
+    assert 'expected 9' in capsys.readouterr().out
+
+
+def test_create_database_writes_metadata(tmp_path):
+    dict_path = tmp_path / 'words.txt'
+    dict_path.write_text('kot\npies\n', encoding='utf-8')
+    model_path = tmp_path / 'model.txt'
+    model_path.write_text('kot 0.1 0.2 0.3\nmysz 0.4 0.5 0.6\n'
+                          'pies 0.7 0.8 0.9\n', encoding='utf-8')
+    database_path = str(tmp_path / 'vectors.db')
+
+    create_vectors_database(database_path, str(dict_path), str(model_path),
+                            neighbour_index=False)
+
+    conn = sqlite3.connect(database_path)
+    metadata = read_metadata(conn)
+    conn.close()
+    assert metadata['rows'] == '2'
+    assert metadata['dimension'] == '3'
+    assert len(metadata['model_sha256']) == 64
+    assert DatabaseManager(database_path).verify(full=True)
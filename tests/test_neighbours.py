@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+import pytest
+import numpy as np
+
+from datpl.analysis import DatComputer
+from datpl.neighbours import NeighbourIndex, build_index, index_path
+from datpl.processing import DatabaseManager
+
+from .conftest import TEST_VECTORS
+
+
+@pytest.fixture(scope='module')
+def random_vectors():
+    rng = np.random.default_rng(42)
+    words = [f'w{i}' for i in range(2000)]
+    return words, rng.standard_normal((2000, 16))
+
+
+def _brute_force(words, matrix, word, k):
+    normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    similarities = normalized @ normalized[words.index(word)]
+    order = [i for i in np.argsort(-similarities) if words[i] != word]
+    return [words[i] for i in order[:k]]
+
+
+def test_index_path():
+    assert index_path(os.path.join('db', 'vectors.db')) == os.path.join(
+        'db', 'vectors.ivf.npz')
+
+
+def test_query_word_recall(random_vectors):
+    words, matrix = random_vectors
+    index = NeighbourIndex.build(words, matrix, n_lists=20)
+
+    assert len(index) == len(words)
+    assert index.offsets[-1] == len(words)
+
+    found = 0
+    for word in words[:50]:
+        neighbours = index.query_word(word, k=10, n_probe=6)
+        assert len(neighbours) == 10
+        assert word not in [neighbour for neighbour, _ in neighbours]
+        distances = [distance for _, distance in neighbours]
+        assert distances == sorted(distances)
+        expected = _brute_force(words, matrix, word, 10)
+        found += len(set(expected) & {n for n, _ in neighbours})
+    assert found / 500 > 0.8
+
+
+def test_exhaustive_search_is_exact(random_vectors):
+    words, matrix = random_vectors
+    index = NeighbourIndex.build(words, matrix, n_lists=10)
+
+    neighbours = index.query_word('w7', k=5, n_probe=10)
+    assert [n for n, _ in neighbours] == _brute_force(words, matrix, 'w7', 5)
+    assert index.query_word('missing') == []
+
+
+def test_save_and_load(random_vectors):
+    words, matrix = random_vectors
+    index = NeighbourIndex.build(words, matrix, n_lists=10)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'vectors.ivf.npz')
+        index.save(path)
+        loaded = NeighbourIndex.load(path)
+
+    assert loaded.words == index.words
+    assert loaded.query_word('w3', k=5) == index.query_word('w3', k=5)
+
+    with pytest.raises(FileNotFoundError):
+        NeighbourIndex.load('missing.ivf.npz')
+
+
+def test_build_with_invalid_input():
+    with pytest.raises(ValueError):
+        NeighbourIndex.build([], np.empty((0, 3)))
+
+
+def test_dat_computer_nearest_neighbours(vectors_db):
+    assert build_index(vectors_db, n_lists=2) == index_path(vectors_db)
+
+    db_manager = DatabaseManager(vectors_db)
+    model = DatComputer(db_manager)
+    neighbours = model.nearest_neighbours(['kot', 'nieznane'], k=3)
+
+    assert db_manager.neighbour_index is not None
+    assert neighbours['nieznane'] == []
+    assert len(neighbours['kot']) <= 3
+    assert all(word in TEST_VECTORS and word != 'kot'
+               for word, _ in neighbours['kot'])
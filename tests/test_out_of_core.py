@@ -0,0 +1,107 @@
+import os
+
+import pandas as pd
+import pytest
+
+from datpl.data_io import read_data, save_results
+from datpl.out_of_core import block_size_for, iter_blocks, score_out_of_core
+from datpl.pipeline import DatPipeline
+
+
+@pytest.fixture
+def pipeline(vectors_db):
+    dat_pipeline = DatPipeline(vectors_db, minimum_words=3, preload=False)
+    yield dat_pipeline
+    dat_pipeline.close()
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    rows = [
+        ["p1", "jabłko", "banan", "kot"],
+        ["p2", "chmura", "nic", ""],
+        ["p3", "Wiśnia!", "młotek", "samochód"],
+        ["p4", "gruszka", "kot", "chmura"],
+        ["p5", "banan", "banan", "jabłko"],
+    ]
+    path = tmp_path / "data.csv"
+    pd.DataFrame(rows, columns=["id", "W1", "W2", "W3"]).to_csv(
+        path, sep=";", index=False)
+    return str(path)
+
+
+def test_block_size_for():
+    assert block_size_for(2 ** 20, 7) > block_size_for(2 ** 20, 10)
+    assert block_size_for(2 ** 30, 7) >= 1024 * block_size_for(2 ** 20, 7)
+    assert block_size_for(1, 7) == 1
+
+
+def test_iter_blocks(data_file):
+    blocks = list(iter_blocks(data_file, block_size=2))
+
+    assert [len(block) for block in blocks] == [2, 2, 1]
+    assert blocks[0]["p2"] == ["chmura", "nic", ""]
+    assert blocks[2] == {"p5": ["banan", "banan", "jabłko"]}
+
+
+def test_iter_blocks_xlsx_keeps_unnamed_columns(tmp_path):
+    path = str(tmp_path / "wide.xlsx")
+    openpyxl = pytest.importorskip("openpyxl")
+    book = openpyxl.Workbook()
+    book.active.append(["ID", "W1", "W2"])
+    book.active.append(["a1", "kot", "pies", "extra"])
+    book.active.append(["a2", "dom"])
+    book.save(path)
+
+    blocks = list(iter_blocks(path, block_size=1))
+
+    assert blocks == [{"a1": ["kot", "pies", "extra"]}, {"a2": ["dom", ""]}]
+    assert list(iter_blocks(path, block_size=2)) == [
+        {"a1": ["kot", "pies", "extra"], "a2": ["dom", "", ""]}]
+
+
+def test_iter_blocks_unsupported_file_type():
+    with pytest.raises(ValueError):
+        next(iter_blocks("data.txt", block_size=2))
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 10])
+def test_score_out_of_core_matches_in_memory(pipeline, data_file, tmp_path,
+                                             block_size):
+    expected_path = str(tmp_path / "expected.csv")
+    save_results(pipeline.score(read_data(data_file)), minimum_words=3,
+                 output_path=expected_path,
+                 fingerprint=pipeline.db.fingerprint())
+    output_path = str(tmp_path / "out" / "results.csv")
+
+    participants = score_out_of_core(data_file, pipeline, output_path,
+                                     work_dir=str(tmp_path),
+                                     block_size=block_size)
+
+    assert participants == 5
+    pd.testing.assert_frame_equal(pd.read_csv(output_path),
+                                  pd.read_csv(expected_path))
+    # the intermediates are removed
+    assert sorted(os.listdir(tmp_path)) == ["data.csv", "expected.csv", "out"]
+
+
+def test_score_out_of_core_xlsx(pipeline, data_file, tmp_path):
+    xlsx_path = str(tmp_path / "data.xlsx")
+    pd.read_csv(data_file, sep=";", dtype=str).to_excel(xlsx_path, index=False)
+    output_path = str(tmp_path / "results.csv")
+
+    score_out_of_core(data_file, pipeline, str(tmp_path / "expected.csv"))
+    score_out_of_core(xlsx_path, pipeline, output_path, block_size=2)
+
+    pd.testing.assert_frame_equal(pd.read_csv(output_path),
+                                  pd.read_csv(tmp_path / "expected.csv"))
+
+
+def test_score_out_of_core_empty_file(pipeline, tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("id;W1;W2;W3\n", encoding="utf-8")
+    output_path = str(tmp_path / "results.csv")
+
+    assert score_out_of_core(str(path), pipeline, output_path) == 0
+    assert list(pd.read_csv(output_path).columns) == [
+        "ID", "W1-W2", "W1-W3", "W2-W3", "DAT", "vectors_fingerprint"]
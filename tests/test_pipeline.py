@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from datpl.pipeline import DatPipeline, ScoringCancelled
+
+from .conftest import TEST_VECTORS
+
+
+@pytest.fixture
+def pipeline(vectors_db):
+    dat_pipeline = DatPipeline(vectors_db, minimum_words=3)
+    yield dat_pipeline
+    dat_pipeline.close()
+
+
+def test_pipeline_loads_vocabulary(pipeline):
+    assert sorted(pipeline.processor.words) == sorted(TEST_VECTORS)
+    assert pipeline.db.vectors is not None
+    assert pipeline.minimum_words == 3
+
+
+def test_pipeline_score(pipeline):
+    dataset = {
+        "p1": ["Jabłko", "banan", "kot!", "xyz"],
+        "p2": ["chmura", "nic"],
+    }
+    results = pipeline.score(dataset)
+
+    assert len(results["p1"].distances) == 3
+    assert isinstance(results["p1"].score, float)
+    assert results["p2"].score is None
+
+
+def test_pipeline_without_preload(vectors_db):
+    dat_pipeline = DatPipeline(vectors_db, minimum_words=3, preload=False)
+    preloaded = DatPipeline(vectors_db, minimum_words=3)
+    dataset = {"p1": ["jabłko", "banan", "kot"]}
+
+    assert dat_pipeline.db.vectors is None
+    assert dat_pipeline.score(dataset)["p1"].score == pytest.approx(
+        preloaded.score(dataset)["p1"].score)
+    dat_pipeline.close()
+    preloaded.close()
+
+
+def test_pipeline_score_reports_progress(pipeline):
+    dataset = {f"p{i}": ["jabłko", "banan", "kot"] for i in range(5)}
+    calls = []
+
+    results = pipeline.score(dataset, chunk_size=2,
+                             progress=lambda *args: calls.append(args))
+
+    assert list(results) == list(dataset)
+    assert calls == [(2, 0, 5), (2, 2, 5), (4, 2, 5), (4, 4, 5),
+                     (5, 4, 5), (5, 5, 5)]
+
+
+def test_pipeline_score_cancel(pipeline):
+    dataset = {f"p{i}": ["jabłko", "banan", "kot"] for i in range(5)}
+    cancel_event = threading.Event()
+
+    def cancel_after_first_chunk(validated, scored, total):
+        if scored:
+            cancel_event.set()
+
+    with pytest.raises(ScoringCancelled, match='after 2 of 5'):
+        pipeline.score(dataset, chunk_size=2,
+                       progress=cancel_after_first_chunk,
+                       cancel_event=cancel_event)
+
+
+def test_pipeline_with_result_cache(vectors_db):
+    dataset = {"p1": ["jabłko", "banan", "kot"], "p2": ["chmura"]}
+    dat_pipeline = DatPipeline(vectors_db, minimum_words=3, use_cache=True)
+
+    first = dat_pipeline.score(dataset)
+    second = dat_pipeline.score(dataset)
+
+    assert len(dat_pipeline.cache) == 1
+    assert first["p1"] == second["p1"]
+    dat_pipeline.close()
@@ -1,4 +1,6 @@
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 
 import pytest
@@ -6,6 +8,8 @@ import numpy as np
 
 from datpl.processing import DataProcessor, DatabaseManager
 
+from .conftest import TEST_VECTORS
+
 
 valid_words = ["jabłko", "banan", "wiśnia", "gruszka"]
 
@@ -69,6 +73,15 @@ def test_extract_valid_words(data_processor_instance):
 TEST_DB_PATH = ':memory:'
 
 
+def _connection_without_metadata(cursor=None):
+    """Mock a connection to a database built without a metadata table."""
+    connection = Mock()
+    connection.execute.return_value.fetchone.return_value = None
+    if cursor is not None:
+        connection.cursor.return_value = cursor
+    return connection
+
+
 @pytest.fixture
 def database_manager():
     db_manager = DatabaseManager(TEST_DB_PATH)
@@ -78,6 +91,7 @@ def database_manager():
 
 @patch('datpl.processing.sqlite3.connect')
 def test_database_manager_connect(mock_connect, database_manager):
+    mock_connect.return_value = _connection_without_metadata()
     database_manager.connect()
     assert database_manager.connection is not None
     mock_connect.assert_called_with(TEST_DB_PATH)
@@ -106,8 +120,7 @@ def test_database_manager_get_words(mock_connect, database_manager):
     mock_cursor = Mock()
     mock_cursor.fetchall.return_value = [('word1',), ('word2',), ('word3',)]
 
-    mock_connection = Mock()
-    mock_connection.cursor.return_value = mock_cursor
+    mock_connection = _connection_without_metadata(mock_cursor)
     mock_connect.return_value = mock_connection
 
     words = database_manager.get_words()
@@ -124,8 +137,7 @@ def test_database_manager_get_word_vector(mock_connect, database_manager):
     mock_cursor = Mock()
     mock_cursor.fetchone.return_value = (np.array([1.0, 2.0, 3.0]).tobytes(),)
 
-    mock_connection = Mock()
-    mock_connection.cursor.return_value = mock_cursor
+    mock_connection = _connection_without_metadata(mock_cursor)
     mock_connect.return_value = mock_connection
 
     word = "test_word"
@@ -145,8 +157,7 @@ def test_database_manager_get_non_existing_word_vector(
     mock_cursor = Mock()
     mock_cursor.fetchone.return_value = None
 
-    mock_connection = Mock()
-    mock_connection.cursor.return_value = mock_cursor
+    mock_connection = _connection_without_metadata(mock_cursor)
     mock_connect.return_value = mock_connection
 
     non_existing_word = "non_existing_word"
@@ -156,3 +167,100 @@ def test_database_manager_get_non_existing_word_vector(
     mock_connect.assert_called_with(TEST_DB_PATH)
     mock_cursor.execute.assert_called_with(
         'SELECT vector FROM vectors WHERE word=?', (non_existing_word,))
+
+
+def test_database_manager_load_vectors(vectors_db):
+    db_manager = DatabaseManager(vectors_db)
+    vectors = db_manager.load_vectors()
+
+    assert len(vectors) == 8
+    assert "kot" in vectors
+    assert db_manager.connection is None
+    np.testing.assert_array_equal(db_manager.get_word_vector("kot"),
+                                  [0.3, 0.6, 0.1, 0.5, 0.9])
+    assert db_manager.get_word_vector("missing") is None
+    assert sorted(db_manager.get_words()) == sorted(vectors.words)
+
+
+def test_data_processor_words_setter(data_processor_instance):
+    data_processor_instance.words = ["kot"]
+    assert data_processor_instance.validate("kot") == ("kot", "")
+    assert data_processor_instance.validate("jabłko") == ("", "jabłko")
+
+
+def test_database_manager_get_word_vectors(vectors_db):
+    db_manager = DatabaseManager(vectors_db)
+    subset = db_manager.get_word_vectors(["kot", "missing", "jabłko", "kot"])
+    db_manager.disconnect()
+
+    assert subset.words == ["kot", "jabłko"]
+    assert subset.matrix.shape == (2, 5)
+    np.testing.assert_array_equal(subset.ids(["jabłko", "kot"]), [1, 0])
+    np.testing.assert_array_equal(subset.get("kot"),
+                                  [0.3, 0.6, 0.1, 0.5, 0.9])
+
+    db_manager.load_vectors()
+    in_memory = db_manager.get_word_vectors(["kot", "missing", "jabłko"])
+    assert in_memory.words == subset.words
+    np.testing.assert_array_equal(in_memory.matrix, subset.matrix)
+
+
+def test_word_vectors_ids_and_normalized():
+    from datpl.processing import WordVectors
+
+    vectors = WordVectors(["a", "b"], np.array([[3.0, 4.0], [0.0, 2.0]]))
+    np.testing.assert_allclose(vectors.normalized().matrix,
+                               [[0.6, 0.8], [0.0, 1.0]])
+    assert vectors.ids(["b", "a", "b"]).dtype == np.int32
+    with pytest.raises(ValueError, match="No vector for word: c"):
+        vectors.ids(["c"])
+
+
+def test_collect_vocabulary(data_processor_instance):
+    dataset = data_processor_instance.process_dataset({
+        "participant1": ["jabłko", "banan", "pear"],
+        "participant2": ["Banan", "gruszka"],
+    })
+    assert data_processor_instance.collect_vocabulary(dataset) == [
+        "jabłko", "banan", "gruszka"]
+
+
+def test_encode_dataset(data_processor_instance):
+    dataset = {
+        "participant1": ["jabłko", "banan", "pear", "banan"],
+        "participant2": ["1@3"],
+        "participant3": ["Gruszka", "wiśnia"],
+    }
+    encoded = data_processor_instance.encode_dataset(dataset)
+
+    assert list(encoded.ids) == list(dataset)
+    assert encoded.offsets.dtype == np.int32
+    assert encoded.word_ids.dtype == np.int32
+    assert list(encoded.offsets) == [0, 2, 2, 4]
+    assert list(encoded.counts) == [2, 0, 2]
+    assert list(encoded.word_ids) == [0, 1, 3, 2]
+    assert encoded.invalid_words == {"participant1": ["pear"]}
+
+    expected = data_processor_instance.extract_valid_words(
+        data_processor_instance.process_dataset(dataset))
+    assert encoded.decode() == expected
+
+
+def test_database_manager_connection_per_thread(vectors_db):
+    db_manager = DatabaseManager(vectors_db)
+    barrier = threading.Barrier(4)
+
+    def read(_):
+        barrier.wait()
+        vectors = {word: db_manager.get_word_vector(word)
+                   for word in TEST_VECTORS}
+        return vectors, db_manager.connection
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(read, range(4)))
+
+    for vectors, _ in results:
+        for word, vector in vectors.items():
+            np.testing.assert_array_equal(vector, TEST_VECTORS[word])
+    assert len({id(connection) for _, connection in results}) == 4
+    assert db_manager.connection is None
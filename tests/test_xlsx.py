@@ -0,0 +1,255 @@
+import datetime
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from datpl.data_io import read_data
+from datpl.xlsx import (
+    clear_cache,
+    default_cache_dir,
+    iter_rows,
+    read_columns
+)
+
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data',
+                         'dat-data.xlsx')
+
+WORKBOOK = (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships"><sheets><sheet name="data" sheetId="1" r:id="rId1"/>'
+    '</sheets></workbook>')
+RELATIONSHIPS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'relationships"><Relationship Id="rId1" Target="worksheets/data.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/worksheet"/></Relationships>')
+SHARED_STRINGS = (
+    '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<si><t>ID</t></si><si><t>W1</t></si><si><t>W2</t></si>'
+    '<si><r><t>jab</t></r><r><t>łko</t></r><rPh><t>x</t></rPh></si></sst>')
+SHEET = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+    'main"><sheetData>'
+    '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c>'
+    '<c r="C1" t="s"><v>2</v></c></row>'
+    '<row r="2"><c r="A2"><v>7</v></c><c r="C2" t="s"><v>3</v></c></row>'
+    '<row r="4"><c r="A4"><v>1.5</v></c><c r="B4" t="inlineStr">'
+    '<is><t>kot</t></is></c><c r="C4" t="b"><v>1</v></c></row>'
+    '</sheetData></worksheet>')
+
+
+STYLES = (
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+    'main"><cellXfs count="2"><xf numFmtId="0"/><xf numFmtId="14"/>'
+    '</cellXfs></styleSheet>')
+DATE_SHEET = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+    'main"><sheetData><row r="1"><c r="A1" s="1"><v>1</v></c>'
+    '<c r="B1"><v>1</v></c></row></sheetData></worksheet>')
+ESCAPED_STRINGS = (
+    '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<si><t>a_x000D_b</t></si><si><t>_x005F_x0041_</t></si></sst>')
+ESCAPED_SHEET = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+    'main"><sheetData><row r="1"><c r="A1" t="s"><v>0</v></c>'
+    '<c r="B1" t="s"><v>1</v></c><c r="C1" t="inlineStr"><is>'
+    '<t>k_x0041_t</t></is></c><c r="D1" t="inlineStr"><is><t>_x0000_</t>'
+    '</is></c></row></sheetData></worksheet>')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/workbook.xml', WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', RELATIONSHIPS)
+        archive.writestr('xl/sharedStrings.xml', SHARED_STRINGS)
+        archive.writestr('xl/worksheets/data.xml', SHEET)
+    return path
+
+
+def test_iter_rows(workbook):
+    assert list(iter_rows(workbook)) == [
+        ['ID', 'W1', 'W2'],
+        ['7', '', 'jabłko'],
+        ['1.5', 'kot', 'True'],
+    ]
+
+
+def test_iter_rows_dates_match_pandas(tmp_path):
+    path = str(tmp_path / 'dates.xlsx')
+    openpyxl = pytest.importorskip('openpyxl')
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(['ID', 'date', 'datetime', 'time', 'number'])
+    sheet.append(['a1', datetime.datetime(2020, 1, 2),
+                  datetime.datetime(2020, 1, 2, 13, 45, 30),
+                  datetime.time(12, 30), 2.5])
+    sheet.append(['a2', 44000.5, 3, 0.25, 0.1])
+    sheet['B3'].number_format = 'yyyy-mm-dd hh:mm'
+    sheet['C3'].number_format = '[h]:mm:ss'
+    sheet['D3'].number_format = '"day" 0.00'
+    sheet['E3'].number_format = '0.00%'
+    book.save(path)
+
+    rows = list(iter_rows(path))
+    expected = pd.read_excel(path, dtype=str)
+
+    assert rows[1] == ['a1', '2020-01-02 00:00:00', '2020-01-02 13:45:30',
+                       '12:30:00', '2.5']
+    assert rows[1:] == expected.values.tolist()
+
+
+def test_iter_rows_1904_dates(tmp_path):
+    path = str(tmp_path / 'mac.xlsx')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/workbook.xml', WORKBOOK.replace(
+            '<sheets>', '<workbookPr date1904="1"/><sheets>'))
+        archive.writestr('xl/_rels/workbook.xml.rels', RELATIONSHIPS)
+        archive.writestr('xl/styles.xml', STYLES)
+        archive.writestr('xl/worksheets/data.xml', DATE_SHEET)
+
+    assert list(iter_rows(path)) == [['1904-01-02 00:00:00', '1']]
+
+
+def test_iter_rows_unescapes_characters(tmp_path):
+    path = str(tmp_path / 'escaped.xlsx')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/workbook.xml', WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', RELATIONSHIPS)
+        archive.writestr('xl/sharedStrings.xml', ESCAPED_STRINGS)
+        archive.writestr('xl/worksheets/data.xml', ESCAPED_SHEET)
+
+    assert list(iter_rows(path)) == [['a\rb', '_x0041_', 'kAt', '_x0000_']]
+
+
+def test_iter_rows_spilled_strings(workbook, tmp_path):
+    work_dir = tmp_path / 'work'
+    work_dir.mkdir()
+
+    assert list(iter_rows(workbook, spill_strings=True,
+                          work_dir=str(work_dir))) == list(iter_rows(workbook))
+    # the temporary files are removed while the table is mapped
+    assert not os.listdir(work_dir)
+
+
+def test_iter_rows_spilled_strings_matches_pandas():
+    expected = pd.read_excel(DATA_FILE, dtype=str).fillna('')
+
+    rows = list(iter_rows(DATA_FILE, spill_strings=True))
+    assert rows[0] == list(expected.columns)
+    assert [row + [''] * (len(rows[0]) - len(row)) for row in rows[1:]] == \
+        expected.values.tolist()
+
+
+def test_iter_rows_invalid_file(tmp_path):
+    path = tmp_path / 'broken.xlsx'
+    path.write_bytes(b'not a workbook')
+
+    with pytest.raises(ValueError, match='Not a valid XLSX file'):
+        next(iter_rows(str(path)))
+
+
+def test_read_columns_matches_pandas():
+    header, columns = read_columns(DATA_FILE)
+    expected = pd.read_excel(DATA_FILE, dtype=str).fillna('')
+
+    assert header == list(expected.columns)
+    assert columns == [expected[column].tolist() for column in header]
+
+
+@pytest.fixture
+def wide_workbook(tmp_path):
+    """Rows with words beyond the header and a column without a header."""
+    path = str(tmp_path / 'wide.xlsx')
+    openpyxl = pytest.importorskip('openpyxl')
+    book = openpyxl.Workbook()
+    book.active.append(['ID', 'W1', None, 'W3'])
+    book.active.append(['a1', 'kot', 'pies', 'las'])
+    book.active.append(['a2', 'dom'])
+    book.active.append(['a3', 'kot', 'pies', 'las', 'extra'])
+    book.save(path)
+    return path
+
+
+def test_read_columns_keeps_unnamed_columns(wide_workbook):
+    header, columns = read_columns(wide_workbook)
+    expected = pd.read_excel(wide_workbook, dtype=str).fillna('')
+
+    assert header == ['ID', 'W1', 'Unnamed: 2', 'W3', 'Unnamed: 4']
+    assert header == list(expected.columns)
+    assert columns == [expected[column].tolist() for column in header]
+
+
+def test_read_data_keeps_unnamed_columns(wide_workbook):
+    assert read_data(wide_workbook) == {
+        'a1': ['kot', 'pies', 'las', ''],
+        'a2': ['dom', '', '', ''],
+        'a3': ['kot', 'pies', 'las', 'extra'],
+    }
+
+
+def test_read_columns_cache(workbook, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    expected = read_columns(workbook, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(path_to_file):
+        raise AssertionError('parsed a cached workbook')
+
+    monkeypatch.setattr('datpl.xlsx._parse_columns', fail)
+    assert read_columns(workbook, cache_dir) == expected
+
+    # same content with a new modification time is found by its hash
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert read_columns(workbook, cache_dir) == expected
+
+
+def test_read_columns_cache_invalidated(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path = str(tmp_path / 'data.xlsx')
+    pd.DataFrame({'ID': ['a1'], 'W1': ['kot']}).to_excel(path, index=False)
+    read_columns(path, cache_dir)
+
+    pd.DataFrame({'ID': ['a1'], 'W1': ['pies']}).to_excel(path, index=False)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert read_columns(path, cache_dir) == (['ID', 'W1'], [['a1'], ['pies']])
+
+
+def test_read_data_uses_cache(workbook, xlsx_cache_dir):
+    assert default_cache_dir() == str(xlsx_cache_dir)
+
+    data = read_data(workbook, use_cache=True)
+
+    assert data == {'7': ['', 'jabłko'], '1.5': ['kot', 'True']}
+    assert len(os.listdir(xlsx_cache_dir)) == 1
+    assert read_data(workbook, id_column='W2', use_cache=True) == {
+        'jabłko': ['7', ''], 'True': ['1.5', 'kot']}
+
+
+def test_read_data_without_cache(workbook, xlsx_cache_dir):
+    # the cache is opt-in
+    read_data(workbook)
+    read_data(workbook, id_column=None, use_cache=False)
+
+    assert not os.path.exists(xlsx_cache_dir)
+
+
+def test_clear_cache(workbook, xlsx_cache_dir):
+    assert clear_cache() == 0
+
+    read_data(workbook, use_cache=True)
+    assert clear_cache() == 1
+    assert not os.listdir(xlsx_cache_dir)
+
+
+def test_read_data_missing_id_column(workbook):
+    with pytest.raises(ValueError, match='not found'):
+        read_data(workbook, id_column='Name')